@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Compact the persisted bash history before any shell reads it.
+
+Every shell appends to ~/.persist/.bash_history after each prompt, so the
+file only grows, and every new shell reads all of it.  This keeps the last
+copy of each command (like ``erasedups``), drops entries older than
+LLM_HISTORY_MAX_AGE_DAYS if set, and keeps the newest
+LLM_HISTORY_MAX_ENTRIES.  Timestamps written for HISTTIMEFORMAT are kept.
+
+With LLM_HISTORY_SHARDS=1, each profile's shells append to their own shard,
+~/.persist/history/<profile>.bash_history, so containers of different
+profiles never write to the same file.  .bashrc points HISTFILE at the shard
+and first loads HISTORY_VIEW.  This script writes that view: the other
+shards and the old shared file, merged by time and compacted.
+
+Shells of other containers may append while a file is compacted.  A lock
+file keeps two compactions apart.  Bash does not lock, so lines appended
+after the file was read are copied over before the compacted file replaces
+it.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+HISTORY_FILE = ".bash_history"
+SHARD_DIR = "history"
+HISTORY_VIEW = Path(".local/state/bash_history.merged")
+DEFAULT_MAX_ENTRIES = 100_000
+# Smaller files are left alone; reading them costs nothing worth saving.
+MIN_COMPACT_BYTES = 64 * 1024
+_TIMESTAMP = re.compile(r"#(\d+)")
+
+Entry = tuple[int | None, str]
+
+
+def parse(text: str) -> list[Entry]:
+    """Split a history file into (timestamp, command) entries.
+
+    With timestamps, everything up to the next timestamp line is one entry,
+    as bash reads it; without, each line is one.
+    """
+    lines = text.splitlines()
+    if not any(_TIMESTAMP.fullmatch(line) for line in lines):
+        return [(None, line) for line in lines if line]
+    entries: list[Entry] = []
+    stamp: int | None = None
+    command: list[str] = []
+    for line in lines:
+        match = _TIMESTAMP.fullmatch(line)
+        if match:
+            if command:
+                entries.append((stamp, "\n".join(command)))
+            stamp, command = int(match.group(1)), []
+        else:
+            command.append(line)
+    if command:
+        entries.append((stamp, "\n".join(command)))
+    return entries
+
+
+def compact(entries: list[Entry], max_entries: int, min_stamp: int | None) -> list[Entry]:
+    """Keep the newest copy of each command, then the newest *max_entries*."""
+    seen: set[str] = set()
+    kept: list[Entry] = []
+    for stamp, command in reversed(entries):
+        if command in seen or not command.strip():
+            continue
+        if min_stamp is not None and stamp is not None and stamp < min_stamp:
+            continue
+        seen.add(command)
+        kept.append((stamp, command))
+        if len(kept) == max_entries:
+            break
+    kept.reverse()
+    return kept
+
+
+def render(entries: list[Entry]) -> str:
+    parts = []
+    for stamp, command in entries:
+        if stamp is not None:
+            parts.append(f"#{stamp}\n")
+        parts.append(f"{command}\n")
+    return "".join(parts)
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[bool]:
+    """Hold an exclusive lock beside *path*; yields False if someone else has it."""
+    lock_path = path.with_name(f"{path.name}.lock")
+    with open(lock_path, "a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def compact_file(path: Path, max_entries: int, min_stamp: int | None) -> tuple[int, int] | None:
+    """Compact *path* in place; returns the entry counts before and after, or None if skipped."""
+    # Compact the file a symlink (the LINKS.txt entry) points at.
+    path = path.resolve()
+    try:
+        if path.stat().st_size < MIN_COMPACT_BYTES:
+            return None
+    except FileNotFoundError:
+        return None
+    with locked(path) as acquired:
+        if not acquired:
+            return None
+        data = path.read_bytes()
+        entries = parse(data.decode(errors="surrogateescape"))
+        kept = compact(entries, max_entries, min_stamp)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(render(kept).encode(errors="surrogateescape"))
+        # Copy over whatever shells appended meanwhile, then swap.
+        copied = len(data)
+        with open(path, "rb") as source, open(tmp_path, "ab") as target:
+            while True:
+                source.seek(copied)
+                tail = source.read()
+                if not tail:
+                    break
+                target.write(tail)
+                copied += len(tail)
+        os.chmod(tmp_path, path.stat().st_mode & 0o777)
+        tmp_path.replace(path)
+    return len(entries), len(kept)
+
+
+def write_view(sources: list[Path], view: Path, max_entries: int, min_stamp: int | None) -> int:
+    """Merge *sources* by time into *view*; returns the number of entries."""
+    entries: list[Entry] = []
+    for source in sources:
+        try:
+            entries.extend(parse(source.read_text(errors="surrogateescape")))
+        except FileNotFoundError:
+            continue
+    # Untimed entries (from before HISTTIMEFORMAT) sort first.
+    entries.sort(key=lambda entry: entry[0] or 0)
+    kept = compact(entries, max_entries, min_stamp)
+    view.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = view.with_name(f".{view.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(render(kept), errors="surrogateescape")
+    tmp_path.replace(view)
+    return len(kept)
+
+
+def main() -> int:
+    home = Path.home()
+    persist_dir = home / ".persist"
+    max_entries = int(os.environ.get("LLM_HISTORY_MAX_ENTRIES") or DEFAULT_MAX_ENTRIES)
+    max_age_days = os.environ.get("LLM_HISTORY_MAX_AGE_DAYS")
+    min_stamp = int(time.time()) - int(max_age_days) * 86400 if max_age_days else None
+    started = time.monotonic()
+
+    shared = persist_dir / HISTORY_FILE
+    profile = os.environ.get("LLM_PROFILE")
+    if os.environ.get("LLM_HISTORY_SHARDS") == "1" and profile:
+        shard_dir = persist_dir / SHARD_DIR
+        shard_dir.mkdir(exist_ok=True)
+        shard = shard_dir / f"{profile}{HISTORY_FILE}"
+        shard.touch()
+        targets = [shard]
+        others = sorted(path for path in shard_dir.glob(f"*{HISTORY_FILE}") if path != shard)
+        sources = [shared, *others]
+    else:
+        targets, sources = [shared], []
+
+    for target in targets:
+        counts = compact_file(target, max_entries, min_stamp)
+        if counts is not None:
+            print(f"History {target.name}: {counts[0]} -> {counts[1]} entries")
+    if sources:
+        merged = write_view(sources, home / HISTORY_VIEW, max_entries, min_stamp)
+        print(f"History view: {merged} entries from {len(sources)} files")
+    print(f"History compaction took {(time.monotonic() - started) * 1000:.0f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,83 +2,85 @@
 
 set -xeuo pipefail
 
-# Detect Docker subnet and add to allowed networks in nftables
-# 1. Get the default gateway IP
-gateway=$(ip -j route ls default | jq -r '.[0].gateway')
-if [ -z "$gateway" ] || [ "$gateway" = "null" ]; then
-    echo "ERROR: Could not determine default gateway" >&2
-    exit 1
-fi
-
-# 2. Find the most specific non-default route that contains the gateway
-#    - Filter out the default route
-#    - Extract CIDR notation (dst field)
-#    - Sort by prefix length (longest/most specific first)
-#    - Take the first one
-docker_subnet=$(ip -j route show match "$gateway" | \
-    jq -r '.[] | select(.dst != "default") | .dst' | \
-    awk -F/ '{ print ($2 ? $2 : 32), $0 }' | \
-    sort -t' ' -k1 -nr | \
-    head -1 | \
-    awk '{ print $2 }')
+# Phase timings for `llmbox run --timings`: when LLM_TIMINGS_FILE is set,
+# append one JSON object per phase start.  "t" is CLOCK_BOOTTIME seconds
+# from /proc/uptime, which is monotonic and shared with the host kernel.
+mark() {
+    [ -n "${LLM_TIMINGS_FILE:-}" ] || return 0
+    local up _
+    read -r up _ </proc/uptime
+    printf '{"phase":"%s","t":%s}\n' "$1" "$up" >>"$LLM_TIMINGS_FILE"
+}
 
-if [ -z "$docker_subnet" ]; then
-    echo "ERROR: Could not determine Docker subnet for gateway $gateway" >&2
-    exit 1
-fi
+# A profile snapshot sets the variables of the launch it was committed from
+# to empty values, since an image cannot unset them, and lists them in
+# LLM_SNAPSHOT_UNSET (see llmbox's snapshots.py).  Unset those still empty.
+for variable in ${LLM_SNAPSHOT_UNSET:-}; do
+    [ -n "${!variable:-}" ] || unset "$variable" 2>/dev/null || true
+done
+unset LLM_SNAPSHOT_UNSET
 
-echo "Detected Docker subnet: $docker_subnet (gateway: $gateway)"
+# A container committed as a profile snapshot (llmbox profile commit) keeps
+# the previous run's pool markers; start without them.
+rm -f /run/llmbox-ready /run/llmbox-claimed
 
-# Resolve Docker host IP (host.docker.internal) and allow it in nftables
-host_ip=""
-host_ip=$(getent ahostsv4 host.docker.internal | awk 'NR==1 { print $1 }' || true)
-if [ -z "$host_ip" ]; then
-    echo "ERROR: Could not resolve host.docker.internal" >&2
-    exit 1
-fi
+# Network detection, firewall, proxy and self-checks; see llm-init.py.
+/llm-init.py
 
-echo "Detected Docker host IP: $host_ip (host.docker.internal)"
+mark ownership
 
-# Load nftables rules, then add the Docker subnet to the allowed set
-nft -f /root/rules.nft
-nft add element inet llm_egress allowed_ipv4 "{ $docker_subnet }"
-nft add element inet llm_egress allowed_ipv4 "{ $host_ip }"
+# Only fixes what Docker created as root for the mounts; never enters them.
+/fix-ownership.py "$LLM_HOME_DIR" "$LLM_USER"
 
-# Start tinyproxy
-/usr/sbin/tinyproxy -c /etc/tinyproxy/tinyproxy.conf
-
-# Verify sudo permissions are restricted
-if runuser -u "$LLM_USER" -- sudo -n true; then
-    echo "User should not be able to run arbitrary sudo commands" >&2
-    exit 1
-fi
-
-# Verify network is restricted
-result=0
-curl --noproxy '*' https://www.google.com || result=$?
-if [ "$result" -ne 7 ]; then
-    echo "Should not be able to connect to Google" >&2
-    exit 1
-fi
-
-(chown -hR "$LLM_USER:$LLM_USER" "$LLM_HOME_DIR" &)
+mark links
 
 # Process LINKS.txt symlinks before updating agents so that persisted
 # configs (e.g. .bashrc, .claude.json) are in place first.
-runuser -u "$LLM_USER" -g "$LLM_USER" -- /process-links.sh
+runuser -u "$LLM_USER" -g "$LLM_USER" -- /process-links.py
+
+mark history
 
-# Update coding agents with tmux UI (blocking)
+# Before any shell reads the history; see compact-history.py.
+runuser -u "$LLM_USER" -g "$LLM_USER" -- /compact-history.py
+
+# Update coding agents.  In background mode the shell starts right away and
+# the prompt shows progress; warm pool members always update up front, since
+# nobody is waiting on them.
 if [ "${LLM_UPDATE_AGENTS:-1}" = "1" ]; then
-    runuser -u "$LLM_USER" -g "$LLM_USER" -- bash -lc '/update-agents.sh'
+    if [ "${LLM_UPDATE_MODE:-foreground}" = "background" ] && [ -z "${LLM_POOL_TTL:-}" ]; then
+        # Same privileges as the session (see start-session.sh).
+        setpriv \
+            --bounding-set -net_admin,-setpcap \
+            --inh-caps -all \
+            --ambient -all \
+            -- \
+            runuser -u "$LLM_USER" -g "$LLM_USER" -- \
+            setsid bash -lc '/update-agents.sh --background' </dev/null >/dev/null 2>&1 &
+    else
+        # tmux UI (blocking)
+        mark update-agents
+        runuser -u "$LLM_USER" -g "$LLM_USER" -- bash -lc '/update-agents.sh'
+    fi
+fi
+
+if [ -n "${LLM_POOL_TTL:-}" ]; then
+    # Warm pool member (see llmbox pool): setup is done, so report ready
+    # through the health check and wait for llmbox run to claim this
+    # container with `docker exec /start-session.sh`.  Give up after the TTL;
+    # --rm then removes the container.
+    set +x
+    mark parked
+    touch /run/llmbox-ready
+    deadline=$((SECONDS + LLM_POOL_TTL))
+    while [ ! -e /run/llmbox-claimed ]; do
+        if [ "$SECONDS" -ge "$deadline" ]; then
+            echo "Not claimed within ${LLM_POOL_TTL}s; retiring"
+            exit 0
+        fi
+        sleep 1
+    done
+    # The session runs as an exec; keep the container alive underneath it.
+    exec sleep infinity
 fi
 
-# runuser sets up the environment for us.  Otherwise we'd have to
-# bootstrap stuff like HOME ourselves.
-exec setpriv \
-    --bounding-set -net_admin,-setpcap \
-    --inh-caps -all \
-    --ambient -all \
-    -- \
-    runuser -u "$LLM_USER" -g "$LLM_USER" \
-    -- \
-    bash -lc 'cd && exec "$@"' -- "$@"
+exec /start-session.sh "$@"
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Give the container user ownership of its home directory, cheaply.
+
+Replaces a background ``chown -hR`` of the whole home, which also walked
+every bind-mounted repository (and rewrote ownership on the host).  This
+never descends into a mount: mount points come from /proc/self/mountinfo,
+and any directory on another device than the home is skipped too.  Only
+entries whose owner is actually wrong are changed, and symlinks are changed
+rather than followed.
+
+A marker in MARKER_PATH records that the home was verified, and with which
+mounts.  The image build writes it, so a container normally:
+
+- skips the home entirely when its mounts are the ones recorded, for example
+  in a profile snapshot started with the same volumes;
+- otherwise checks only the directories between the home and each mount
+  point, which Docker creates as root when it mounts a volume there.
+
+Without a marker the whole home, minus mounts, is checked.
+
+The mount points of package caches listed in LLM_CACHE_DIRS are handed to
+the user on every start, since a new cache volume or directory can be owned
+by root or by the host user.  Their contents are left alone.
+
+Usage: fix-ownership.py HOME USER
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pwd
+import re
+import stat
+import sys
+import time
+from pathlib import Path
+
+MARKER_PATH = Path("/var/lib/llmbox/home-ownership.json")
+
+
+def _unescape(field: str) -> str:
+    # mountinfo escapes space, tab, newline and backslash as \\ooo octal.
+    return re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), field)
+
+
+def mounts_under(home: Path, mountinfo: Path = Path("/proc/self/mountinfo")) -> set[Path]:
+    """Return the mount points strictly inside *home*."""
+    mounts: set[Path] = set()
+    for line in mountinfo.read_text().splitlines():
+        fields = line.split()
+        if len(fields) < 5:
+            continue
+        point = Path(_unescape(fields[4]))
+        if point != home and point.is_relative_to(home):
+            mounts.add(point)
+    return mounts
+
+
+def _layout(home: Path, uid: int, gid: int, mounts: set[Path]) -> str:
+    digest = hashlib.sha256(f"{home}\0{uid}:{gid}".encode())
+    for point in sorted(mounts):
+        digest.update(b"\0" + str(point).encode())
+    return digest.hexdigest()
+
+
+class Fixer:
+    def __init__(self, uid: int, gid: int) -> None:
+        self.uid = uid
+        self.gid = gid
+        self.checked = 0
+        self.fixed = 0
+
+    def fix(self, path: str, st: os.stat_result) -> None:
+        self.checked += 1
+        if st.st_uid != self.uid or st.st_gid != self.gid:
+            os.lchown(path, self.uid, self.gid)
+            self.fixed += 1
+
+    def walk(self, home: Path, mounts: set[Path]) -> None:
+        """Fix *home* and everything below it that is on the home's filesystem."""
+        root_st = os.lstat(home)
+        self.fix(str(home), root_st)
+        skip = {str(point) for point in mounts}
+        stack = [str(home)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.path in skip:
+                        continue
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    if st.st_dev != root_st.st_dev:
+                        continue
+                    self.fix(entry.path, st)
+                    if stat.S_ISDIR(st.st_mode):
+                        stack.append(entry.path)
+
+    def fix_mount_parents(self, home: Path, mounts: set[Path]) -> None:
+        """Fix the home and the directories leading from it to each mount point."""
+        paths = {home}
+        for point in mounts:
+            paths.update(parent for parent in point.parents if parent.is_relative_to(home))
+        for path in sorted(paths - mounts):
+            try:
+                self.fix(str(path), os.lstat(path))
+            except FileNotFoundError:
+                continue
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) != 3:
+        print(f"usage: {argv[0]} HOME USER", file=sys.stderr)
+        return 2
+    home = Path(argv[1])
+    user = pwd.getpwnam(argv[2])
+    started = time.monotonic()
+    mounts = mounts_under(home)
+    layout = _layout(home, user.pw_uid, user.pw_gid, mounts)
+
+    try:
+        marker = json.loads(MARKER_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        marker = None
+    fixer = Fixer(user.pw_uid, user.pw_gid)
+    if isinstance(marker, dict) and marker.get("layout") == layout:
+        scope = "unchanged, skipped"
+    elif isinstance(marker, dict) and marker.get("owner") == f"{user.pw_uid}:{user.pw_gid}":
+        scope = "mount parents"
+        fixer.fix_mount_parents(home, mounts)
+    else:
+        scope = "full"
+        fixer.walk(home, mounts)
+    for point in os.environ.get("LLM_CACHE_DIRS", "").split(":"):
+        if point:
+            try:
+                fixer.fix(point, os.lstat(point))
+            except FileNotFoundError:
+                continue
+
+    MARKER_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = MARKER_PATH.with_name(f".{MARKER_PATH.name}.{os.getpid()}")
+    tmp_path.write_text(
+        json.dumps({"owner": f"{user.pw_uid}:{user.pw_gid}", "layout": layout}) + "\n"
+    )
+    tmp_path.replace(MARKER_PATH)
+    elapsed = time.monotonic() - started
+    print(
+        f"Home ownership ({scope}): fixed {fixer.fixed} of {fixer.checked} paths"
+        f" in {elapsed:.3f}s, {len(mounts)} mounts not entered"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
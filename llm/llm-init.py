@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Container network and proxy setup, run by entrypoint.sh as root.
+
+1. Find the Docker subnet and host IP.  LLM_DOCKER_SUBNET and
+   LLM_DOCKER_HOST_IP are used when llmbox passes them; otherwise one
+   ``ip -j route`` call gives both the default gateway and the routes, and
+   host.docker.internal comes from /etc/hosts.
+2. Load /root/rules.nft and add both addresses to the allowed set in a
+   single ``nft -f -`` transaction, so the firewall never exists without
+   them.
+3. Start dnsmasq as a caching resolver on 127.0.0.1 and point
+   /etc/resolv.conf at it.  The servers Docker put there become dnsmasq's
+   upstreams, which the firewall lets only dnsmasq reach.
+4. Start the proxy and the blocklist watcher while checking, concurrently,
+   that the user cannot sudo and that direct connections are blocked.  The
+   LLM_PROXY_* variables tune the proxy.  tinyproxy gets tinyproxy.conf
+   rendered from its template; LLM_PROXY_ENGINE=llmproxy runs llmproxy.py
+   instead, on the same address and as the same user.
+5. With LLM_CACHE_PROXY set (``cache_proxy.enabled``), point dnf's Fedora
+   repositories at the host's package cache.  npm, pip and uv find it
+   through variables llmbox passes.
+
+Any failure exits non-zero, which stops the container.  Phase marks go to
+LLM_TIMINGS_FILE like entrypoint.sh's, and the total time is printed.
+"""
+
+from __future__ import annotations
+
+import errno
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import string
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RULES_PATH = Path("/root/rules.nft")
+TINYPROXY_TEMPLATE = Path("/etc/tinyproxy/tinyproxy.conf.in")
+TINYPROXY_CONF = Path("/etc/tinyproxy/tinyproxy.conf")
+# Proxy settings used when llmbox passes no LLM_PROXY_* variable.
+PROXY_DEFAULTS = {
+    "engine": "tinyproxy",
+    "max_clients": "100",
+    "timeout": "600",
+    "log_level": "Connect",
+    "connect_ports": "443,80",
+}
+ENGINES = frozenset({"tinyproxy", "llmproxy"})
+LOG_LEVELS = frozenset({"Critical", "Error", "Warning", "Notice", "Connect", "Info"})
+DEFAULT_DENY_MARKER = Path("/etc/tinyproxy/filter/default-deny")
+WATCH_LOG = Path("/var/log/tinyproxy/blocklist-watch.log")
+PROXY_PID_FILE = Path("/run/tinyproxy.pid")
+LLMPROXY_LOG = Path("/var/log/tinyproxy/llmproxy.log")
+LLMPROXY_RUN_DIR = Path("/run/llmproxy")
+PROXY_ADDRESS = ("127.0.0.1", 8888)
+RESOLV_CONF = Path("/etc/resolv.conf")
+UPSTREAM_RESOLV_CONF = Path("/run/dnsmasq/resolv.conf")
+RESOLVER_ADDRESS = "127.0.0.1"
+CACHE_REPO_FILE = Path("/etc/dnf/repos.override.d/99-llmbox-cache.repo")
+# Each repository's path under the cache's fedora mirror.  The empty proxy
+# makes dnf connect to the host directly instead of through tinyproxy.
+CACHE_REPOS = {
+    "fedora": "releases/$releasever/Everything/$basearch/os/",
+    "updates": "updates/$releasever/Everything/$basearch/",
+}
+PROXY_START_TIMEOUT = 30.0
+# Must be refused by the firewall; any answer means egress is open.
+PROBE_HOST = ("www.google.com", 443)
+PROBE_TIMEOUT = 10.0
+# Connection errors that mean the firewall rejected the probe, as curl's exit 7.
+_BLOCKED_ERRNOS = {errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EPERM}
+
+
+class InitError(Exception):
+    pass
+
+
+def mark(phase: str) -> None:
+    path = os.environ.get("LLM_TIMINGS_FILE")
+    if not path:
+        return
+    uptime = Path("/proc/uptime").read_text().split()[0]
+    with open(path, "a") as handle:
+        handle.write(json.dumps({"phase": phase, "t": float(uptime)}) + "\n")
+
+
+def docker_subnet(routes: list[dict], gateway: str) -> str:
+    """Return the most specific non-default route that contains *gateway*."""
+    address = ipaddress.ip_address(gateway)
+    networks = []
+    for route in routes:
+        dst = route.get("dst")
+        if not dst or dst == "default":
+            continue
+        try:
+            network = ipaddress.ip_network(dst, strict=False)
+        except ValueError:
+            continue
+        if address in network:
+            networks.append(network)
+    if not networks:
+        raise InitError(f"Could not determine Docker subnet for gateway {gateway}")
+    return str(max(networks, key=lambda network: network.prefixlen))
+
+
+def detect_network() -> tuple[str, str]:
+    subnet = os.environ.get("LLM_DOCKER_SUBNET")
+    host_ip = os.environ.get("LLM_DOCKER_HOST_IP")
+    if not subnet:
+        output = subprocess.run(
+            ["ip", "-j", "-4", "route", "show"], check=True, capture_output=True, text=True
+        ).stdout
+        routes = json.loads(output)
+        gateway = next(
+            (route.get("gateway") for route in routes if route.get("dst") == "default"), None
+        )
+        if not gateway:
+            raise InitError("Could not determine default gateway")
+        subnet = docker_subnet(routes, gateway)
+        print(f"Detected Docker subnet: {subnet} (gateway: {gateway})")
+    if not host_ip:
+        try:
+            host_ip = str(socket.getaddrinfo("host.docker.internal", None, socket.AF_INET)[0][4][0])
+        except (socket.gaierror, IndexError) as exc:
+            raise InitError("Could not resolve host.docker.internal") from exc
+        print(f"Detected Docker host IP: {host_ip} (host.docker.internal)")
+    return subnet, host_ip
+
+
+def apply_firewall(subnet: str, host_ip: str) -> None:
+    ruleset = RULES_PATH.read_text()
+    ruleset += f"\nadd element inet llm_egress allowed_ipv4 {{ {subnet}, {host_ip} }}\n"
+    subprocess.run(["nft", "-f", "-"], input=ruleset, text=True, check=True)
+
+
+def _nameservers(text: str) -> list[str]:
+    return [
+        fields[1]
+        for fields in map(str.split, text.splitlines())
+        if fields[:1] == ["nameserver"] and len(fields) > 1
+    ]
+
+
+def start_resolver() -> None:
+    current = RESOLV_CONF.read_text()
+    upstream = [server for server in _nameservers(current) if server != RESOLVER_ADDRESS]
+    if upstream:
+        UPSTREAM_RESOLV_CONF.parent.mkdir(exist_ok=True)
+        UPSTREAM_RESOLV_CONF.write_text("".join(f"nameserver {server}\n" for server in upstream))
+        # Keep the search and options lines.  Written in place, since Docker
+        # bind-mounts the file.
+        kept = [line for line in current.splitlines() if line.split()[:1] != ["nameserver"]]
+        header = f"# Lookups are cached by dnsmasq; upstreams are in {UPSTREAM_RESOLV_CONF}."
+        RESOLV_CONF.write_text("\n".join([header, f"nameserver {RESOLVER_ADDRESS}", *kept]) + "\n")
+    elif not UPSTREAM_RESOLV_CONF.exists():
+        # Only a restarted container has no upstream left in resolv.conf.
+        raise InitError(f"No upstream nameservers in {RESOLV_CONF}")
+    else:
+        upstream = _nameservers(UPSTREAM_RESOLV_CONF.read_text())
+    # Returns once dnsmasq is listening and has gone to the background.
+    subprocess.run(["dnsmasq"], check=True)
+    print(f"DNS cache on {RESOLVER_ADDRESS}, upstream: {', '.join(upstream)}")
+
+
+def _positive(name: str, value: str, limit: int | None = None) -> str:
+    if not value.isdigit() or int(value) == 0 or (limit is not None and int(value) > limit):
+        raise InitError(f"Invalid {name}: {value!r}")
+    return value
+
+
+def proxy_options(environ: dict[str, str]) -> dict[str, str]:
+    """The validated proxy settings from the LLM_PROXY_* variables in *environ*."""
+    options = {
+        name: environ.get(f"LLM_PROXY_{name.upper()}") or default
+        for name, default in PROXY_DEFAULTS.items()
+    }
+    if options["engine"] not in ENGINES:
+        raise InitError(f"Invalid proxy engine: {options['engine']!r}")
+    if options["log_level"] not in LOG_LEVELS:
+        raise InitError(f"Invalid proxy log level: {options['log_level']!r}")
+    _positive("proxy max clients", options["max_clients"])
+    _positive("proxy timeout", options["timeout"])
+    ports = [
+        _positive("connect port", port.strip(), 65535)
+        for port in options["connect_ports"].split(",")
+    ]
+    options["connect_ports"] = ",".join(ports)
+    return options
+
+
+def render_proxy_conf(options: dict[str, str], default_deny: bool) -> str:
+    """Fill in tinyproxy.conf.in from proxy_options()."""
+    return string.Template(TINYPROXY_TEMPLATE.read_text()).substitute(
+        max_clients=options["max_clients"],
+        timeout=options["timeout"],
+        log_level=options["log_level"],
+        connect_ports="\n".join(
+            f"ConnectPort {port}" for port in options["connect_ports"].split(",")
+        ),
+        filter_default_deny="Yes" if default_deny else "No",
+    )
+
+
+def start_llmproxy(options: dict[str, str]) -> None:
+    """Start llmproxy.py as the tinyproxy user and wait until it accepts connections."""
+    LLMPROXY_RUN_DIR.mkdir(exist_ok=True)
+    shutil.chown(LLMPROXY_RUN_DIR, "tinyproxy", "tinyproxy")
+    command = [
+        "/llmproxy.py",
+        f"--max-clients={options['max_clients']}",
+        f"--timeout={options['timeout']}",
+        f"--log-level={options['log_level']}",
+        f"--connect-ports={options['connect_ports']}",
+    ]
+    with LLMPROXY_LOG.open("a") as log:
+        shutil.chown(LLMPROXY_LOG, "tinyproxy", "tinyproxy")
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            user="tinyproxy",
+            group="tinyproxy",
+            extra_groups=[],
+            start_new_session=True,
+        )
+    # Where tinyproxy keeps its PID, for watch-blocklist.sh and llmbox proxy reload.
+    PROXY_PID_FILE.write_text(f"{process.pid}\n")
+    deadline = time.monotonic() + PROXY_START_TIMEOUT
+    while True:
+        try:
+            socket.create_connection(PROXY_ADDRESS, timeout=1).close()
+            return
+        except OSError:
+            if process.poll() is not None:
+                raise InitError(
+                    f"llmproxy exited with status {process.returncode}; see {LLMPROXY_LOG}"
+                )
+            if time.monotonic() > deadline:
+                raise InitError("llmproxy did not start listening")
+            time.sleep(0.01)
+
+
+def start_proxy() -> None:
+    options = proxy_options(dict(os.environ))
+    # A profile with an allowlist policy mounts a filter directory holding a
+    # default-deny marker: the filter then lists what is allowed.
+    default_deny = DEFAULT_DENY_MARKER.exists()
+    if default_deny:
+        print("Proxy filter is an allowlist; unmatched requests are denied")
+    if options["engine"] == "llmproxy":
+        start_llmproxy(options)
+    else:
+        TINYPROXY_CONF.write_text(render_proxy_conf(options, default_deny))
+        subprocess.run(["/usr/sbin/tinyproxy", "-c", str(TINYPROXY_CONF)], check=True)
+    # Reload the proxy whenever the host edits the mounted blocklist.  Runs as
+    # the tinyproxy user, which can read the blocklist and signal the proxy.
+    with WATCH_LOG.open("a") as log:
+        subprocess.Popen(
+            ["runuser", "-u", "tinyproxy", "--", "/watch-blocklist.sh"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+
+
+def configure_package_cache(environ: dict[str, str]) -> None:
+    cache = environ.get("LLM_CACHE_PROXY")
+    if not cache:
+        CACHE_REPO_FILE.unlink(missing_ok=True)
+        return
+    sections = [
+        f"[{repo}]\nbaseurl={cache}/fedora/{path}\nmetalink=\nmirrorlist=\nproxy=\n"
+        for repo, path in CACHE_REPOS.items()
+    ]
+    CACHE_REPO_FILE.parent.mkdir(parents=True, exist_ok=True)
+    CACHE_REPO_FILE.write_text("\n".join(sections))
+    print(f"Package cache: {cache}")
+
+
+def check_sudo(user: str) -> None:
+    result = subprocess.run(
+        ["runuser", "-u", user, "--", "sudo", "-n", "true"], capture_output=True
+    )
+    if result.returncode == 0:
+        raise InitError("User should not be able to run arbitrary sudo commands")
+
+
+def check_egress() -> None:
+    try:
+        with socket.create_connection(PROBE_HOST, timeout=PROBE_TIMEOUT):
+            pass
+    except OSError as exc:
+        if exc.errno in _BLOCKED_ERRNOS:
+            return
+        raise InitError(f"Unexpected error probing {PROBE_HOST[0]}: {exc}") from exc
+    raise InitError(f"Should not be able to connect to {PROBE_HOST[0]}")
+
+
+def main() -> int:
+    started = time.monotonic()
+    durations: list[tuple[str, float]] = []
+
+    def phase(name: str, since: float) -> float:
+        now = time.monotonic()
+        durations.append((name, now - since))
+        return now
+
+    try:
+        mark("network-detect")
+        subnet, host_ip = detect_network()
+        last = phase("network", started)
+
+        mark("firewall")
+        apply_firewall(subnet, host_ip)
+        last = phase("firewall", last)
+
+        mark("resolver")
+        start_resolver()
+        last = phase("resolver", last)
+
+        configure_package_cache(dict(os.environ))
+
+        mark("proxy+self-checks")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(start_proxy),
+                executor.submit(check_sudo, os.environ["LLM_USER"]),
+                executor.submit(check_egress),
+            ]
+            for future in futures:
+                future.result()
+        phase("proxy+self-checks", last)
+    except (InitError, subprocess.CalledProcessError, OSError, ValueError) as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        return 1
+
+    total = time.monotonic() - started
+    detail = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in durations)
+    print(f"Init done in {total * 1000:.0f}ms ({detail})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+"""Single-process asyncio egress proxy, an alternative to tinyproxy.
+
+Selected with ``llmbox config proxy --engine llmproxy``.  llm-init.py then
+starts it in place of tinyproxy, as the tinyproxy user on 127.0.0.1:8888, so
+the firewall's skuid rule and every client's proxy settings stay the same.
+
+The policy is the tinyproxy filter file, read the way tinyproxy reads it:
+
+- Lines in the shape ``llmbox blocklist compile`` writes (see blocklist.py)
+  are parsed back into their domain entries and loaded into a trie of
+  reversed labels, so a request costs one lookup per label of its host, no
+  matter how long the list is.  Each parsed line is first checked against
+  its own regex on hosts around its entries, and kept as a regex if they
+  disagree.
+- Every other line is a POSIX extended regex, matched case-insensitively
+  with the C library's regexec(), as tinyproxy does, against the same
+  subject: ``host:port`` for CONNECT and the URL otherwise, rebuilt without
+  userinfo so the policy sees the host the proxy connects to.
+
+A plain HTTP request is forwarded with ``Connection: close`` and its body
+(``Content-Length`` bytes) only; anything the client sends after it, such as
+a pipelined request, is dropped rather than reaching an upstream it was
+never checked against.
+
+A ``default-deny`` marker beside the filter file turns it into an allowlist.
+SIGUSR1 reloads the filter, so watch-blocklist.sh and ``llmbox proxy
+reload`` work unchanged.
+
+Tunnels are relayed by protocol callbacks that hand each received chunk
+straight to the other side's transport; reading pauses while the other
+side's write buffer is full.  Per-host counters are served as JSON on the
+stats socket, and ``llmproxy.py --stats`` prints them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import re
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+DEFAULT_LISTEN = "127.0.0.1:8888"
+DEFAULT_FILTER = Path("/etc/tinyproxy/filter/blocklist")
+DEFAULT_STATS_SOCKET = Path("/run/llmproxy/stats.sock")
+DEFAULT_DENY_MARKER = "default-deny"
+# Request heads larger than this are refused, like tinyproxy's line limits.
+MAX_HEAD = 64 * 1024
+# Hosts counted individually; later ones are added up under OTHER_HOSTS.
+MAX_STATS_HOSTS = 10_000
+OTHER_HOSTS = "(other)"
+
+# tinyproxy log levels, most to least severe; Connect logs every request.
+NOTICE = 25
+LOG_LEVELS = {
+    "Critical": logging.CRITICAL,
+    "Error": logging.ERROR,
+    "Warning": logging.WARNING,
+    "Notice": NOTICE,
+    "Connect": logging.INFO,
+    "Info": logging.DEBUG,
+}
+
+# The fixed parts of a compiled domain line; must match blocklist.py.  Lines
+# compiled before userinfo was skipped use the second head and tail.
+_LINE_HEADS = (
+    r"^([a-z][a-z0-9+.-]*://)?([^/?@]*@)?([^/:?]*\.)?",
+    r"^([a-z][a-z0-9+.-]*://)?([^/:?]*\.)?",
+)
+_LINE_TAILS = (r"\.?(:[0-9]*)?([/?]|$)", r"\.?([:/?]|$)")
+_ANY_SUBDOMAIN = r"[^/:?]*\."
+_LABEL = re.compile(r"[a-z0-9_-]+")
+_SCHEME = re.compile(r"^[a-z][a-z0-9+.-]*://")
+_AUTHORITY_END = re.compile(r"[/?#]")
+_HOST_END = re.compile(r"[:/?]")
+
+# <regex.h>; the same values in glibc and musl.
+REG_EXTENDED = 1
+REG_ICASE = 2
+REG_NEWLINE = 4
+REG_NOSUB = 8
+# Larger than regex_t on any libc.
+_REGEX_T_SIZE = 256
+
+log = logging.getLogger("llmproxy")
+
+
+class PosixRegex:
+    """A pattern compiled with regcomp(), flagged as tinyproxy compiles filters."""
+
+    _libc: ctypes.CDLL | None = None
+
+    def __init__(self, pattern: str) -> None:
+        if PosixRegex._libc is None:
+            PosixRegex._libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        self.pattern = pattern
+        self._regex = ctypes.create_string_buffer(_REGEX_T_SIZE)
+        flags = REG_EXTENDED | REG_ICASE | REG_NEWLINE | REG_NOSUB
+        if PosixRegex._libc.regcomp(self._regex, pattern.encode(), flags) != 0:
+            raise ValueError(f"invalid filter pattern: {pattern}")
+
+    def search(self, subject: str) -> bool:
+        assert PosixRegex._libc is not None
+        return PosixRegex._libc.regexec(self._regex, subject.encode(), 0, None, 0) == 0
+
+    def __del__(self) -> None:
+        if PosixRegex._libc is not None:
+            PosixRegex._libc.regfree(self._regex)
+
+
+def filter_lines(text: str) -> list[str]:
+    """Return the patterns of a filter file as tinyproxy's loader sees them.
+
+    A pattern ends at the first whitespace or unescaped ``#``, so indented
+    lines and comments are skipped.
+    """
+    patterns = []
+    for line in text.splitlines():
+        end = 0
+        while end < len(line) and not line[end].isspace():
+            if line[end] == "#" and (end == 0 or line[end - 1] != "\\"):
+                break
+            end += 1
+        if end:
+            patterns.append(line[:end])
+    return patterns
+
+
+def _parse_term(text: str, pos: int) -> tuple[list[tuple[str, str]], int]:
+    if text.startswith("(", pos):
+        entries: list[tuple[str, str]] = []
+        pos += 1
+        while True:
+            alternative, pos = _parse_term(text, pos)
+            entries.extend(alternative)
+            if text.startswith("|", pos):
+                pos += 1
+            elif text.startswith(")", pos):
+                pos += 1
+                break
+            else:
+                raise ValueError(pos)
+    else:
+        kind = "domain"
+        if text.startswith(_ANY_SUBDOMAIN, pos):
+            kind = "subdomains"
+            pos += len(_ANY_SUBDOMAIN)
+        match = _LABEL.match(text, pos)
+        if match is None:
+            raise ValueError(pos)
+        entries = [(kind, match.group())]
+        pos = match.end()
+    while text.startswith(r"\.", pos):
+        match = _LABEL.match(text, pos + 2)
+        if match is None:
+            raise ValueError(pos)
+        entries = [(kind, f"{name}.{match.group()}") for kind, name in entries]
+        pos = match.end()
+    return entries, pos
+
+
+def parse_domain_line(pattern: str) -> list[tuple[str, str]] | None:
+    """Return the ("domain" | "subdomains", name) entries a compiled line blocks, or None."""
+    head = next((head for head in _LINE_HEADS if pattern.startswith(head)), None)
+    tail = next((tail for tail in _LINE_TAILS if pattern.endswith(tail)), None)
+    if head is None or tail is None:
+        return None
+    body = pattern[len(head) : -len(tail)]
+    try:
+        entries, end = _parse_term(body, 0)
+    except ValueError:
+        return None
+    return entries if end == len(body) else None
+
+
+def subject_host(subject: str) -> str:
+    """The host part of a filter subject, as blocklist.is_blocked_by_domains() takes it."""
+    subject = _SCHEME.sub("", subject.lower(), count=1)
+    # Userinfo is not part of the host: http://ok.com@blocked.com/ goes to blocked.com.
+    authority = _AUTHORITY_END.split(subject, maxsplit=1)[0].rpartition("@")[2]
+    return _HOST_END.split(authority, maxsplit=1)[0].removesuffix(".")
+
+
+class DomainTrie:
+    """Domain entries keyed by reversed labels: ``a.example.com`` -> com, example, a."""
+
+    # Flags stored beside the child labels of a node; never valid labels.
+    _DOMAIN = "\0domain"
+    _SUBDOMAINS = "\0subdomains"
+
+    def __init__(self) -> None:
+        self.root: dict = {}
+        self.size = 0
+
+    def add(self, kind: str, name: str) -> None:
+        node = self.root
+        for label in reversed(name.split(".")):
+            node = node.setdefault(label, {})
+        node[self._DOMAIN if kind == "domain" else self._SUBDOMAINS] = True
+        self.size += 1
+
+    def blocks(self, host: str) -> bool:
+        labels = host.split(".")
+        node = self.root
+        for depth in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[depth])
+            if node is None:
+                return False
+            if self._DOMAIN in node or (depth and self._SUBDOMAINS in node):
+                return True
+        return False
+
+
+def _agrees(regex: PosixRegex, entries: list[tuple[str, str]]) -> bool:
+    """Whether *regex* and *entries* decide alike around the line's first and last entries."""
+    trie = DomainTrie()
+    for kind, name in entries:
+        trie.add(kind, name)
+    for _, name in {entries[0], entries[-1]}:
+        first, _, rest = name.partition(".")
+        for host in (name, f"www.{name}", f"x{name}", f"{name}x", f"{first}-x.{rest}", rest):
+            if regex.search(f"{host}:443") != trie.blocks(host):
+                return False
+    return True
+
+
+class Policy:
+    """The filter file: a domain trie plus the lines left as regexes."""
+
+    def __init__(self, trie: DomainTrie, regexes: list[PosixRegex], default_deny: bool) -> None:
+        self.trie = trie
+        self.regexes = regexes
+        self.default_deny = default_deny
+
+    @classmethod
+    def load(cls, path: Path) -> Policy:
+        try:
+            text = path.read_text(errors="replace")
+        except FileNotFoundError:
+            text = ""
+        trie = DomainTrie()
+        regexes: list[PosixRegex] = []
+        for pattern in filter_lines(text):
+            try:
+                regex = PosixRegex(pattern)
+            except ValueError as exc:
+                # tinyproxy refuses to start on one; keep serving the rest.
+                log.error("%s", exc)
+                continue
+            entries = parse_domain_line(pattern)
+            if entries is not None and not _agrees(regex, entries):
+                log.warning("kept as a regex, the parsed entries disagree: %s", pattern)
+                entries = None
+            if entries is None:
+                regexes.append(regex)
+                continue
+            for kind, name in entries:
+                trie.add(kind, name)
+        return cls(trie, regexes, (path.parent / DEFAULT_DENY_MARKER).exists())
+
+    def matches(self, subject: str) -> bool:
+        if self.trie.size and self.trie.blocks(subject_host(subject)):
+            return True
+        return any(regex.search(subject) for regex in self.regexes)
+
+    def allows(self, subject: str) -> bool:
+        return self.matches(subject) == self.default_deny
+
+
+class HostStats:
+    __slots__ = ("requests", "denied", "failed", "open", "sent", "received")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.denied = 0
+        self.failed = 0
+        self.open = 0
+        self.sent = 0
+        self.received = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _response(status: str, message: str) -> bytes:
+    body = f"<html><body><h1>{status}</h1><p>{message}</p></body></html>\n".encode()
+    head = (
+        f"HTTP/1.0 {status}\r\nServer: llmproxy\r\nContent-Type: text/html\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+# Hop-by-hop headers dropped when forwarding a plain HTTP request.
+_HOP_HEADERS = frozenset(
+    {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te", "upgrade"}
+)
+
+
+class Side(asyncio.Protocol):
+    """One socket of a relayed connection; data goes straight to the other side."""
+
+    def __init__(self, proxy: Proxy) -> None:
+        self.proxy = proxy
+        self.transport: asyncio.Transport | None = None
+        self.peer: Side | None = None
+        self.stats: HostStats | None = None
+        self.eof = False
+        self.closed = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self.transport = transport
+
+    def forward(self, data: bytes) -> None:
+        self.proxy.touch(self)
+        peer = self.peer
+        if peer is not None and peer.transport is not None and not peer.closed:
+            peer.transport.write(data)
+            self.count(len(data))
+
+    def count(self, size: int) -> None:
+        raise NotImplementedError
+
+    def data_received(self, data: bytes) -> None:
+        self.forward(data)
+
+    def eof_received(self) -> bool:
+        self.eof = True
+        peer = self.peer
+        if peer is None or peer.eof or peer.transport is None:
+            self.close()
+            return False
+        if peer.transport.can_write_eof():
+            peer.transport.write_eof()
+        return True
+
+    def pause_writing(self) -> None:
+        if self.peer is not None and self.peer.transport is not None:
+            self.peer.transport.pause_reading()
+
+    def resume_writing(self) -> None:
+        if self.peer is not None and self.peer.transport is not None:
+            self.peer.transport.resume_reading()
+
+    def close(self) -> None:
+        for side in (self, self.peer):
+            if side is not None and not side.closed:
+                side.closed = True
+                if side.transport is not None:
+                    side.transport.close()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.closed = True
+        if self.peer is not None and not self.peer.closed:
+            self.peer.close()
+
+
+class Upstream(Side):
+    def count(self, size: int) -> None:
+        if self.stats is not None:
+            self.stats.received += size
+
+
+class Client(Side):
+    def __init__(self, proxy: Proxy) -> None:
+        super().__init__(proxy)
+        self.head = bytearray()
+        self.last_active = 0.0
+        # Request body bytes still to forward; None relays everything (tunnels).
+        self.remaining: int | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        super().connection_made(transport)
+        assert self.transport is not None
+        if len(self.proxy.clients) >= self.proxy.max_clients:
+            self.transport.write(_response("503 Service Unavailable", "Too many connections."))
+            self.transport.close()
+            self.closed = True
+            return
+        self.proxy.clients.add(self)
+        self.proxy.touch(self)
+
+    def count(self, size: int) -> None:
+        if self.stats is not None:
+            self.stats.sent += size
+
+    def forward(self, data: bytes) -> None:
+        if self.remaining is not None:
+            data = data[: self.remaining]
+            self.remaining -= len(data)
+            if not data:
+                return
+        super().forward(data)
+
+    def data_received(self, data: bytes) -> None:
+        if self.peer is not None:
+            self.forward(data)
+            return
+        if self.closed:
+            return
+        self.head += data
+        end = self.head.find(b"\r\n\r\n")
+        if end == -1:
+            if len(self.head) > MAX_HEAD:
+                self.refuse("400 Bad Request", "Request head too large.")
+            return
+        assert self.transport is not None
+        self.transport.pause_reading()
+        head, rest = bytes(self.head[:end]), bytes(self.head[end + 4 :])
+        self.head = bytearray()
+        self.proxy.spawn(self.handle(head, rest))
+
+    def eof_received(self) -> bool:
+        if self.peer is None:
+            self.close()
+            return False
+        return super().eof_received()
+
+    def refuse(self, status: str, message: str) -> None:
+        if self.transport is not None and not self.closed:
+            self.transport.write(_response(status, message))
+        self.close()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.proxy.clients.discard(self)
+        if self.stats is not None and self.peer is not None:
+            self.stats.open -= 1
+        super().connection_lost(exc)
+
+    async def handle(self, head: bytes, rest: bytes) -> None:
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            self.refuse("400 Bad Request", "Malformed request line.")
+            return
+        method, target, version = parts
+        if method == "CONNECT":
+            host, _, port_text = target.rpartition(":")
+            if not host or not port_text.isdigit():
+                self.refuse("400 Bad Request", "CONNECT needs host:port.")
+                return
+            port = int(port_text)
+            if self.proxy.connect_ports and port not in self.proxy.connect_ports:
+                self.proxy.stats_for(host.strip("[]").lower()).denied += 1
+                self.refuse("403 Access violation", "CONNECT to this port is not allowed.")
+                return
+            subject = target
+            first = b""
+        else:
+            url = urlsplit(target)
+            if url.scheme != "http" or not url.hostname:
+                self.refuse("400 Bad Request", "Only absolute http:// URLs can be proxied.")
+                return
+            host = url.hostname
+            try:
+                port = url.port or 80
+            except ValueError:
+                self.refuse("400 Bad Request", "Invalid port.")
+                return
+            path = url.path or "/"
+            if url.query:
+                path += f"?{url.query}"
+            fields = [line.partition(":") for line in lines[1:]]
+            if any(name.strip().lower() == "transfer-encoding" for name, _, _ in fields):
+                self.refuse("411 Length Required", "Chunked request bodies are not supported.")
+                return
+            lengths = {
+                value.strip()
+                for name, _, value in fields
+                if name.strip().lower() == "content-length"
+            }
+            if len(lengths) > 1 or not all(length.isdigit() for length in lengths):
+                self.refuse("400 Bad Request", "Invalid Content-Length.")
+                return
+            self.remaining = int(lengths.pop()) if lengths else 0
+            netloc = url.netloc.rpartition("@")[2]
+            subject = f"http://{netloc}{path}"
+            headers = [
+                line
+                for line in lines[1:]
+                if line.partition(":")[0].strip().lower() not in _HOP_HEADERS
+            ]
+            if not any(line.lower().startswith("host:") for line in headers):
+                headers.insert(0, f"Host: {netloc}")
+            head_lines = [f"{method} {path} {version}", *headers, "Connection: close", "", ""]
+            first = "\r\n".join(head_lines).encode("latin-1")
+
+        host = host.strip("[]").lower()
+        stats = self.proxy.stats_for(host)
+        stats.requests += 1
+        if not self.proxy.policy.allows(subject):
+            stats.denied += 1
+            log.log(NOTICE, "denied %s %s", method, subject)
+            self.refuse("403 Filtered", "The request you made has been filtered.")
+            return
+        log.info("%s %s", method, subject)
+
+        loop = asyncio.get_running_loop()
+        upstream = Upstream(self.proxy)
+        try:
+            await asyncio.wait_for(
+                loop.create_connection(lambda: upstream, host, port), self.proxy.timeout
+            )
+        # ValueError: a host create_connection cannot encode, such as one with a NUL.
+        except (OSError, asyncio.TimeoutError, ValueError) as exc:
+            stats.failed += 1
+            log.warning("cannot connect to %s:%s: %s", host, port, exc)
+            self.refuse("502 Bad Gateway", "Unable to connect to the upstream server.")
+            return
+        if self.closed:
+            upstream.close()
+            return
+        assert upstream.transport is not None and self.transport is not None
+        self.stats = upstream.stats = stats
+        stats.open += 1
+        self.peer, upstream.peer = upstream, self
+        if method == "CONNECT":
+            self.transport.write(
+                b"HTTP/1.0 200 Connection established\r\nProxy-agent: llmproxy\r\n\r\n"
+            )
+        else:
+            upstream.transport.write(first)
+            self.count(len(first))
+        if rest:
+            self.forward(rest)
+        self.transport.resume_reading()
+
+
+class Proxy:
+    def __init__(
+        self,
+        filter_path: Path,
+        max_clients: int,
+        timeout: float,
+        connect_ports: frozenset[int],
+    ) -> None:
+        self.filter_path = filter_path
+        self.max_clients = max_clients
+        self.timeout = timeout
+        self.connect_ports = connect_ports
+        self.policy = Policy.load(filter_path)
+        self.clients: set[Client] = set()
+        self.hosts: dict[str, HostStats] = {}
+        self.started = time.time()
+        self._tasks: set[asyncio.Task] = set()
+        self._now = 0.0
+
+    def touch(self, side: Side) -> None:
+        client = side if isinstance(side, Client) else side.peer
+        if isinstance(client, Client):
+            client.last_active = self._now
+
+    def spawn(self, coroutine) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats_for(self, host: str) -> HostStats:
+        stats = self.hosts.get(host)
+        if stats is None:
+            if len(self.hosts) >= MAX_STATS_HOSTS:
+                host = OTHER_HOSTS
+                stats = self.hosts.get(host)
+            if stats is None:
+                stats = self.hosts[host] = HostStats()
+        return stats
+
+    async def reload(self) -> None:
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        self.policy = await loop.run_in_executor(None, Policy.load, self.filter_path)
+        log.log(
+            NOTICE,
+            "filter reloaded in %.0fms: %d domain entries, %d regexes%s",
+            (time.monotonic() - started) * 1000,
+            self.policy.trie.size,
+            len(self.policy.regexes),
+            ", default deny" if self.policy.default_deny else "",
+        )
+
+    async def expire_idle(self) -> None:
+        """Close connections idle (in both directions) for longer than the timeout."""
+        loop = asyncio.get_running_loop()
+        interval = min(5.0, self.timeout / 4)
+        while True:
+            self._now = loop.time()
+            cutoff = self._now - self.timeout
+            for client in [client for client in self.clients if client.last_active < cutoff]:
+                client.close()
+            await asyncio.sleep(interval)
+
+    def snapshot(self) -> dict:
+        return {
+            "engine": "llmproxy",
+            "uptime": round(time.time() - self.started, 1),
+            "clients": len(self.clients),
+            "max_clients": self.max_clients,
+            "domain_entries": self.policy.trie.size,
+            "regexes": len(self.policy.regexes),
+            "default_deny": self.policy.default_deny,
+            "hosts": {host: stats.as_dict() for host, stats in self.hosts.items()},
+        }
+
+    async def serve_stats(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(json.dumps(self.snapshot()).encode() + b"\n")
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    host, _, port = args.listen.rpartition(":")
+    proxy = Proxy(
+        Path(args.filter),
+        args.max_clients,
+        float(args.timeout),
+        frozenset(int(port) for port in args.connect_ports.split(",") if port),
+    )
+    loop = asyncio.get_running_loop()
+    proxy._now = loop.time()
+    server = await loop.create_server(
+        lambda: Client(proxy), host, int(port), backlog=1024, reuse_address=True
+    )
+    stats_socket = Path(args.stats_socket)
+    stats_socket.unlink(missing_ok=True)
+    stats_server = await asyncio.start_unix_server(proxy.serve_stats, str(stats_socket))
+    # Any user in the container may read the counters.
+    os.chmod(stats_socket, 0o666)
+    loop.add_signal_handler(signal.SIGUSR1, lambda: proxy.spawn(proxy.reload()))
+    stopping = loop.create_future()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set_result, None)
+    proxy.spawn(proxy.expire_idle())
+    log.log(
+        NOTICE,
+        "listening on %s: %d domain entries, %d regexes%s",
+        args.listen,
+        proxy.policy.trie.size,
+        len(proxy.policy.regexes),
+        ", default deny" if proxy.policy.default_deny else "",
+    )
+    async with server, stats_server:
+        await stopping
+
+
+def print_stats(path: Path) -> int:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(path))
+        except OSError as exc:
+            print(f"llmproxy is not running ({path}: {exc.strerror})", file=sys.stderr)
+            return 1
+        chunks = []
+        while chunk := client.recv(65536):
+            chunks.append(chunk)
+    sys.stdout.write(b"".join(chunks).decode())
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Filtering HTTP/CONNECT egress proxy.")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN, help="host:port to listen on")
+    parser.add_argument("--filter", default=str(DEFAULT_FILTER), help="tinyproxy filter file")
+    parser.add_argument("--max-clients", type=int, default=100)
+    parser.add_argument("--timeout", type=int, default=600, help="idle timeout, seconds")
+    parser.add_argument("--log-level", choices=list(LOG_LEVELS), default="Connect")
+    parser.add_argument(
+        "--connect-ports", default="443,80", help="ports CONNECT may reach; empty allows all"
+    )
+    parser.add_argument("--stats-socket", default=str(DEFAULT_STATS_SOCKET))
+    parser.add_argument("--stats", action="store_true", help="print the running proxy's counters")
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        return print_stats(Path(args.stats_socket))
+    logging.addLevelName(NOTICE, "NOTICE")
+    logging.basicConfig(
+        level=LOG_LEVELS[args.log_level],
+        format="%(asctime)s %(levelname)s %(message)s",
+        stream=sys.stdout,
+    )
+    asyncio.run(serve(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
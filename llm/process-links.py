@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Symlink persisted files from ~/.persist into $HOME, as listed in LINKS.txt.
+
+Each LINKS.txt line is a path relative to $HOME, for example ``.claude.json``
+or ``.config/gh``.  A directory is linked as a whole.  Lines may also be glob
+patterns, matched inside ~/.persist: ``.config/*`` links each persisted entry
+of .config separately and leaves the image's other .config files alone, and
+``**`` matches any depth.  Blank lines and ``#`` comments are ignored, and
+absolute paths or paths containing ``..`` are rejected.
+
+Whatever is in the way of a link is moved aside to ``<name>.bak``.
+
+The whole list is handled in this one process.  A manifest in the home
+records a hash of LINKS.txt and of the persisted paths it resolved to; when
+neither changed since the last run in this container (a restart, or a
+profile snapshot), nothing is done at all.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+DEFAULT_LINKS = """\
+# Files to symlink from ~/.persist into $HOME
+# Each line is a path relative to $HOME (e.g. .bash_history)
+# Directories are linked as a whole; glob patterns (.config/*) link each match.
+.bash_history
+.claude.json
+.bashrc
+"""
+# Always exists in ~/.persist, so history is persisted from the first session.
+HISTORY_ENTRY = ".bash_history"
+_GLOB_CHARS = frozenset("*?[")
+
+
+def read_entries(links_file: Path) -> list[str]:
+    entries: list[str] = []
+    for line in links_file.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("/") or ".." in line:
+            print(f"LINKS.txt: skipping unsafe path: {line}", file=sys.stderr)
+            continue
+        entries.append(line.rstrip("/"))
+    return entries
+
+
+def resolve(persist_dir: Path, entries: list[str]) -> list[str]:
+    """Return the persisted paths (relative, in order, deduplicated) to link."""
+    resolved: dict[str, None] = {}
+    for entry in entries:
+        if _GLOB_CHARS.isdisjoint(entry):
+            if os.path.lexists(persist_dir / entry):
+                resolved[entry] = None
+            continue
+        matches = glob.glob(entry, root_dir=persist_dir, recursive=True, include_hidden=True)
+        for match in sorted(matches):
+            resolved[match.rstrip("/")] = None
+    # A match inside an already linked directory is reached through it.
+    linked: list[str] = []
+    for path in resolved:
+        if not any(path.startswith(f"{parent}/") for parent in linked):
+            linked.append(path)
+    return linked
+
+
+def manifest_hash(home: Path, persist_dir: Path, links_text: bytes, paths: list[str]) -> str:
+    digest = hashlib.sha256(f"{home}\0{persist_dir}\0".encode())
+    digest.update(hashlib.sha256(links_text).digest())
+    for path in paths:
+        digest.update(path.encode() + b"\0")
+    return digest.hexdigest()
+
+
+def _backup_path(path: Path) -> Path:
+    backup = path.with_name(f"{path.name}.bak")
+    number = 1
+    while os.path.lexists(backup):
+        backup = path.with_name(f"{path.name}.bak.{number}")
+        number += 1
+    return backup
+
+
+def link(home: Path, persist_dir: Path, path: str) -> bool:
+    """Link $HOME/*path* to ~/.persist/*path*; returns whether anything changed."""
+    source = persist_dir / path
+    target = home / path
+    try:
+        if os.readlink(target) == str(source):
+            return False
+    except (FileNotFoundError, OSError):
+        pass
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if os.path.lexists(target):
+        target.rename(_backup_path(target))
+    target.symlink_to(source)
+    return True
+
+
+def main() -> int:
+    home = Path.home()
+    persist_dir = home / ".persist"
+    links_file = persist_dir / "LINKS.txt"
+    manifest = home / ".local" / "state" / "llmbox-links"
+
+    if not links_file.exists():
+        links_file.write_text(DEFAULT_LINKS)
+    links_text = links_file.read_bytes()
+    entries = read_entries(links_file)
+    history = persist_dir / HISTORY_ENTRY
+    if HISTORY_ENTRY in entries and not os.path.lexists(history):
+        history.touch()
+
+    paths = resolve(persist_dir, entries)
+    digest = manifest_hash(home, persist_dir, links_text, paths)
+    try:
+        if manifest.read_text().strip() == digest:
+            return 0
+    except FileNotFoundError:
+        pass
+
+    changed = sum(link(home, persist_dir, path) for path in paths)
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    manifest.write_text(digest + "\n")
+    print(f"LINKS.txt: {len(paths)} links, {changed} created")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
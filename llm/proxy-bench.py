@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Compare the latency and throughput of tinyproxy and llmproxy.
+
+Starts a local origin server and a private instance of each proxy engine on
+spare loopback ports, filtering with the container's filter file, then
+measures through each:
+
+- latency: requests that each open a new CONNECT tunnel, send a small
+  request and read the response, RUNS at a time;
+- throughput: STREAMS tunnels downloading in parallel.
+
+The engines' own CPU time (including tinyproxy's children) is reported too.
+Run it in a container, as any user: ``docker exec CONTAINER /proxy-bench.py``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+LLMPROXY = Path(__file__).with_name("llmproxy.py")
+FILTER = Path("/etc/tinyproxy/filter/blocklist")
+CHUNK = b"x" * 65536
+
+TINYPROXY_CONF = """\
+Port {port}
+Listen 127.0.0.1
+Timeout 600
+MaxClients {max_clients}
+LogFile "{log}"
+LogLevel Error
+PidFile "{pid}"
+Allow 127.0.0.1
+Filter "{filter}"
+FilterURLs On
+FilterType ere
+FilterCaseSensitive Off
+DisableViaHeader Yes
+ConnectPort {origin_port}
+"""
+
+
+async def origin(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Answer ``GET /bytes/N`` with N bytes, then close."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+        size = int(head.split(b" ", 2)[1].rsplit(b"/", 1)[1])
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % size)
+        while size > 0:
+            writer.write(CHUNK[: min(size, len(CHUNK))])
+            size -= len(CHUNK)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError, IndexError):
+        pass
+    finally:
+        writer.close()
+
+
+async def fetch(proxy_port: int, origin_port: int, size: int) -> int:
+    """Fetch *size* bytes through a new tunnel; returns the bytes received."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", proxy_port)
+    try:
+        writer.write(f"CONNECT localhost:{origin_port} HTTP/1.1\r\n\r\n".encode())
+        status = await reader.readuntil(b"\r\n\r\n")
+        if b" 200 " not in status.split(b"\r\n", 1)[0]:
+            raise RuntimeError(status.split(b"\r\n", 1)[0].decode(errors="replace"))
+        writer.write(f"GET /bytes/{size} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        received = 0
+        while chunk := await reader.read(262144):
+            received += len(chunk)
+        return received
+    finally:
+        writer.close()
+
+
+async def measure(
+    proxy_port: int, origin_port: int, requests: int, runs: int, streams: int, megabytes: int
+) -> dict[str, float]:
+    latencies: list[float] = []
+    pending = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in pending:
+            started = time.perf_counter()
+            await fetch(proxy_port, origin_port, 1024)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(runs)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    size = megabytes * 1024 * 1024 // streams
+    bulk_started = time.perf_counter()
+    received = await asyncio.gather(*(fetch(proxy_port, origin_port, size) for _ in range(streams)))
+    bulk_elapsed = time.perf_counter() - bulk_started
+    return {
+        "req/s": requests / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p99 ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "MB/s": sum(received) / bulk_elapsed / 1024 / 1024,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_listening(port: int, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"proxy exited with status {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError("proxy did not start listening")
+
+
+def cpu_seconds(pid: int) -> float:
+    """User and system time of *pid* and its reaped children."""
+    fields = Path(f"/proc/{pid}/stat").read_text().rpartition(")")[2].split()
+    return sum(int(value) for value in fields[11:15]) / os.sysconf("SC_CLK_TCK")
+
+
+def max_clients(args: argparse.Namespace) -> int:
+    # A finished tunnel still counts until the proxy sees the client close it.
+    return 4 * (args.runs + args.streams)
+
+
+def start_engine(engine: str, port: int, origin_port: int, args, workdir: Path) -> subprocess.Popen:
+    if engine == "tinyproxy":
+        conf = workdir / "tinyproxy.conf"
+        conf.write_text(
+            TINYPROXY_CONF.format(
+                port=port,
+                max_clients=max_clients(args),
+                log=workdir / "tinyproxy.log",
+                pid=workdir / "tinyproxy.pid",
+                filter=args.filter,
+                origin_port=origin_port,
+            )
+        )
+        command = [args.tinyproxy, "-d", "-c", str(conf)]
+    else:
+        command = [
+            sys.executable,
+            str(LLMPROXY),
+            f"--listen=127.0.0.1:{port}",
+            f"--filter={args.filter}",
+            f"--max-clients={max_clients(args)}",
+            "--log-level=Error",
+            f"--connect-ports={origin_port}",
+            f"--stats-socket={workdir / 'llmproxy.sock'}",
+        ]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def run(args: argparse.Namespace) -> int:
+    server = await asyncio.start_server(origin, "127.0.0.1", 0)
+    origin_port = server.sockets[0].getsockname()[1]
+    engines = [engine for engine in args.engines.split(",") if engine]
+    if "tinyproxy" in engines and not shutil.which(args.tinyproxy):
+        print(f"{args.tinyproxy} not found; skipping tinyproxy", file=sys.stderr)
+        engines.remove("tinyproxy")
+
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix="proxy-bench-") as tmp:
+        for engine in engines:
+            port = free_port()
+            process = start_engine(engine, port, origin_port, args, Path(tmp))
+            try:
+                await asyncio.to_thread(wait_listening, port, process)
+                # Warm up, then measure.
+                await measure(port, origin_port, min(50, args.requests), 5, 1, 1)
+                cpu_before = cpu_seconds(process.pid)
+                results[engine] = await measure(
+                    port, origin_port, args.requests, args.runs, args.streams, args.megabytes
+                )
+                results[engine]["CPU s"] = cpu_seconds(process.pid) - cpu_before
+            finally:
+                process.terminate()
+                process.wait()
+    server.close()
+
+    print(
+        f"{args.requests} requests, {args.runs} at a time; {args.megabytes}MB over"
+        f" {args.streams} tunnels; filter {args.filter}"
+    )
+    columns = ["req/s", "p50 ms", "p99 ms", "MB/s", "CPU s"]
+    print(f"{'engine':<10}" + "".join(f"{column:>10}" for column in columns))
+    for engine, result in results.items():
+        print(f"{engine:<10}" + "".join(f"{result[column]:>10.1f}" for column in columns))
+    return 0
+
+
+def main() -> int:
+    # __doc__ is None under python -OO.
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--engines", default="tinyproxy,llmproxy")
+    parser.add_argument("--filter", default=str(FILTER), help="filter file both engines use")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=50, help="latency requests at a time")
+    parser.add_argument("--streams", type=int, default=8, help="parallel bulk tunnels")
+    parser.add_argument("--megabytes", type=int, default=512, help="bulk data in total")
+    parser.add_argument("--tinyproxy", default="/usr/sbin/tinyproxy")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env bash
+#
+# Start the user's session: drop the capabilities the proxy and firewall
+# setup needed and run the command (default: a login shell) as $LLM_USER.
+# entrypoint.sh execs this as its last step; a claimed warm pool container
+# runs it through `docker exec -it`.
+
+set -euo pipefail
+
+# A profile snapshot, and so a pool member started from one, sets the
+# variables of the launch it was committed from to empty values, since an
+# image cannot unset them, and lists them in LLM_SNAPSHOT_UNSET (see
+# llmbox's snapshots.py).  Unset those still empty.
+for variable in ${LLM_SNAPSHOT_UNSET:-}; do
+    [ -n "${!variable:-}" ] || unset "$variable" 2>/dev/null || true
+done
+unset LLM_SNAPSHOT_UNSET
+
+# Tells a parked pool entrypoint to stay up for this session.
+touch /run/llmbox-claimed
+
+# The last phase mark: everything before the user's shell is done.
+if [ -n "${LLM_TIMINGS_FILE:-}" ]; then
+    read -r up _ </proc/uptime
+    printf '{"phase":"session","t":%s}\n' "$up" >>"$LLM_TIMINGS_FILE"
+fi
+
+if [ "$#" -eq 0 ]; then
+    set -- /bin/bash
+fi
+
+# runuser sets up the environment for us.  Otherwise we'd have to
+# bootstrap stuff like HOME ourselves.
+exec setpriv \
+    --bounding-set -net_admin,-setpcap \
+    --inh-caps -all \
+    --ambient -all \
+    -- \
+    runuser -u "$LLM_USER" -g "$LLM_USER" \
+    -- \
+    bash -lc 'cd && exec "$@"' -- "$@"
@@ -1,4 +1,8 @@
 #!/usr/bin/env bash
+#
+# Update the coding agents.  By default this shows a tmux UI and blocks until
+# every update is done.  With --background it runs quietly, logging to
+# $LOG_FILE and reporting progress in $STATUS_FILE for the shell prompt.
 
 set -euo pipefail
 
@@ -7,16 +11,200 @@ if [ "${LLM_UPDATE_AGENTS:-1}" != "1" ]; then
     exit 0
 fi
 
+# The agents come from a toolchain mounted by llmbox, which updates it on the
+# host (llmbox toolchain update); the copies in ~/.local are not used.
+if [ -n "${LLM_TOOLCHAIN:-}" ] && [ -d "$LLM_TOOLCHAIN/bin" ]; then
+    echo "Using the agents in $LLM_TOOLCHAIN; skipping updates"
+    exit 0
+fi
+
+BACKGROUND=0
+if [ "${1:-}" = "--background" ]; then
+    BACKGROUND=1
+fi
+
+# Update state shared by every container using this persist dir:
+#   {"checked_at": <epoch>, "versions": {"claude": "1.2.3", ...}}
+# "versions" are the newest releases as of "checked_at".  Within the TTL
+# (LLM_UPDATE_TTL seconds) no upstream check is made and only agents that
+# differ from those versions are updated; fresh agents skip the update
+# entirely.
+STATE_FILE="${LLM_UPDATE_STATE:-$HOME/.persist/.agent-updates.json}"
+UPDATE_TTL="${LLM_UPDATE_TTL:-86400}"
+AGENTS=(claude codex copilot)
+# npm agents are installed into a fresh prefix under here on every update.
+AGENTS_DIR="$HOME/.local/share/llm-agents"
+# One line, "<running|done|failed> <message>"; see .bashrc.
+STATUS_FILE="$HOME/.local/state/agent-updates"
+LOG_FILE="$HOME/.local/state/agent-updates.log"
+
+agent_label() {
+    case "$1" in
+    claude) echo "Claude Code" ;;
+    codex) echo "Codex" ;;
+    copilot) echo "Copilot CLI" ;;
+    esac
+}
+
+agent_package() {
+    case "$1" in
+    claude) echo "@anthropic-ai/claude-code" ;;
+    codex) echo "@openai/codex" ;;
+    copilot) echo "@github/copilot" ;;
+    esac
+}
+
+# Install the latest release without touching the one in use until it is
+# complete.  The native Claude installer already works that way: it writes
+# ~/.local/share/claude/versions/<version> and then repoints the symlink.
+# npm agents get a new prefix, AGENTS_DIR/<agent>/install.*, and are switched
+# over by replacing the "current" and ~/.local/bin symlinks with rename(2),
+# so a running agent or an interrupted install never sees a half-written
+# tree.  The previous prefix is kept for agents still running from it.
+# Any failed step returns before the links are touched; callers run this
+# where set -e does not apply (under || and in tmux panes).
+install_agent() {
+    local agent="$1"
+    if [ "$agent" = claude ]; then
+        bash -c 'curl -fsSL https://claude.ai/install.sh | bash'
+        return
+    fi
+    if [ -z "${AGENTS_DIR:-}" ] || [ -z "${HOME:-}" ]; then
+        echo "AGENTS_DIR or HOME is not set" >&2
+        return 1
+    fi
+    local root="$AGENTS_DIR/$agent" staging previous dir
+    mkdir -p "$root" "$HOME/.local/bin" || return 1
+    staging=$(mktemp -d "$root/install.XXXXXX") || return 1
+    if ! npm install -g --prefix "$staging" "$(agent_package "$agent")" ||
+        [ ! -x "$staging/bin/$agent" ]; then
+        rm -rf "$staging"
+        return 1
+    fi
+    previous=$(readlink "$root/current" || true)
+    ln -sfn "$staging" "$root/current.$$" || return 1
+    mv -T "$root/current.$$" "$root/current" || return 1
+    ln -sfn "$root/current/bin/$agent" "$HOME/.local/bin/$agent.$$" || return 1
+    mv -T "$HOME/.local/bin/$agent.$$" "$HOME/.local/bin/$agent" || return 1
+    for dir in "$root"/install.*; do
+        if [ "$dir" != "$staging" ] && [ "$dir" != "$previous" ]; then
+            rm -rf "$dir"
+        fi
+    done
+}
+
+# Read from the files the installers leave behind; starting each agent just
+# to ask its version costs hundreds of milliseconds.  npm agents are found
+# through their ~/.local/bin link, which covers both the image's install and
+# staged ones.
+installed_version() {
+    local target
+    target=$(readlink -f "$HOME/.local/bin/$1" 2>/dev/null || true)
+    case "$1" in
+    claude)
+        echo "${target##*/versions/}"
+        ;;
+    *)
+        [[ "$target" == */lib/node_modules/* ]] || return 0
+        jq -r '.version // empty' \
+            "${target%%/lib/node_modules/*}/lib/node_modules/$(agent_package "$1")/package.json" \
+            2>/dev/null || true
+        ;;
+    esac
+}
+
+set_status() {
+    [ "$BACKGROUND" -eq 1 ] || return 0
+    mkdir -p "$(dirname "$STATUS_FILE")"
+    echo "$*" >"$STATUS_FILE.$$"
+    mv -f "$STATUS_FILE.$$" "$STATUS_FILE"
+}
+
+latest_version() {
+    curl -fsS --max-time 10 "https://registry.npmjs.org/$(agent_package "$1")/latest" |
+        jq -r '.version // empty'
+}
+
+write_state() {
+    local checked_at="$1" versions="{}" agent
+    for agent in "${AGENTS[@]}"; do
+        versions=$(jq -c --arg a "$agent" --arg v "${WANTED[$agent]:-}" '.[$a] = $v' <<<"$versions")
+    done
+    mkdir -p "$(dirname "$STATE_FILE")"
+    # Several containers can share the persist dir: replace, never rewrite.
+    jq -n --argjson t "$checked_at" --argjson v "$versions" '{checked_at: $t, versions: $v}' \
+        >"$STATE_FILE.$$"
+    mv -f "$STATE_FILE.$$" "$STATE_FILE"
+}
+
+if [ "$BACKGROUND" -eq 1 ]; then
+    mkdir -p "$(dirname "$LOG_FILE")"
+    exec </dev/null >"$LOG_FILE" 2>&1
+    set_status running "checking for agent updates"
+fi
+
+now=$(date +%s)
+checked_at=0
+if [ -r "$STATE_FILE" ]; then
+    checked_at=$(jq -r '.checked_at // 0' "$STATE_FILE" 2>/dev/null || echo 0)
+fi
+
+declare -A WANTED=()
+if [ $((now - checked_at)) -lt "$UPDATE_TTL" ]; then
+    for agent in "${AGENTS[@]}"; do
+        WANTED[$agent]=$(jq -r --arg a "$agent" '.versions[$a] // empty' "$STATE_FILE" || true)
+    done
+else
+    checked_at=$now
+    for agent in "${AGENTS[@]}"; do
+        # An unknown latest version means "update it", as before.
+        WANTED[$agent]=$(latest_version "$agent" 2>/dev/null || true)
+    done
+fi
+
+STALE=()
+for agent in "${AGENTS[@]}"; do
+    if [ -z "${WANTED[$agent]}" ] || [ "$(installed_version "$agent")" != "${WANTED[$agent]}" ]; then
+        STALE+=("$agent")
+    fi
+done
+
+if [ "${#STALE[@]}" -eq 0 ]; then
+    echo "Agents are up to date; skipping updates"
+    write_state "$checked_at"
+    rm -f "$STATUS_FILE"
+    exit 0
+fi
+echo "Updating: ${STALE[*]}"
+set_status running "updating ${STALE[*]}"
+
 STATUS_DIR=$(mktemp -d)
 export STATUS_DIR
+export STALE_AGENTS="${STALE[*]}"
+
+# Record the state only if every update worked, so a failed one is retried.
+finish() {
+    local agent failed=()
+    for agent in "${STALE[@]}"; do
+        [ "$(cat "$STATUS_DIR/$agent" 2>/dev/null)" = "0" ] || failed+=("$agent")
+    done
+    rm -rf "$STATUS_DIR"
+    if [ "${#failed[@]}" -eq 0 ]; then
+        for agent in "${AGENTS[@]}"; do
+            WANTED[$agent]=$(installed_version "$agent")
+        done
+        write_state "$checked_at"
+        set_status done "updated ${STALE[*]}; restart them to use the new versions"
+    else
+        set_status failed "updating ${failed[*]} failed; see $LOG_FILE"
+    fi
+}
 
 update_agent() {
     local name="$1"
-    local label="$2"
-    shift 2
-    echo "Updating $label..."
+    echo "Updating $(agent_label "$name")..."
     local rc=0
-    "$@" 2>&1 || rc=$?
+    install_agent "$name" 2>&1 || rc=$?
     if [ "$rc" -eq 0 ]; then
         echo -e "\nSUCCESS"
         echo 0 > "$STATUS_DIR/$name"
@@ -28,8 +216,11 @@ update_agent() {
 }
 
 run_monitor() {
-    while [ ! -f "$STATUS_DIR/claude" ] || [ ! -f "$STATUS_DIR/codex" ] || [ ! -f "$STATUS_DIR/copilot" ]; do
-        sleep 0.5
+    local agent
+    for agent in $STALE_AGENTS; do
+        while [ ! -f "$STATUS_DIR/$agent" ]; do
+            sleep 0.5
+        done
     done
 
     failures=0
@@ -42,46 +233,50 @@ run_monitor() {
         sleep 2
         tmux kill-session -t updates
     else
+        # Nobody may be watching (a detached container), so do not wait forever.
         echo "$failures update(s) failed. Press Enter to continue..."
-        read -r
+        read -r -t 60 || true
         tmux kill-session -t updates
     fi
 }
 
-# Fallback: no tty or no tmux
-if [ ! -t 0 ] || ! command -v tmux &>/dev/null; then
+# Fallback: background, no tty, no tmux or a pool member, which has a tty
+# but nobody attached until it is claimed
+if [ "$BACKGROUND" -eq 1 ] || [ ! -t 0 ] || [ -n "${LLM_POOL_TTL:-}" ] ||
+    ! command -v tmux &>/dev/null; then
     echo "=== Updating agents (parallel) ==="
 
     update_simple() {
-        local label="$1"
-        shift
+        local name="$1" label rc=0
+        label=$(agent_label "$name")
         echo "[$label] Updating..."
-        if "$@" 2>&1 | sed "s/^/[$label] /"; then
+        install_agent "$name" 2>&1 | sed "s/^/[$label] /" || rc=$?
+        if [ "$rc" -eq 0 ]; then
             echo "[$label] SUCCESS"
         else
             echo "[$label] FAILED"
         fi
+        echo "$rc" > "$STATUS_DIR/$name"
     }
 
-    update_simple "Claude Code" bash -c 'curl -fsSL https://claude.ai/install.sh | bash' &
-    update_simple "Codex" npm install -g @openai/codex &
-    update_simple "Copilot CLI" npm install -g @github/copilot &
+    for agent in "${STALE[@]}"; do
+        update_simple "$agent" &
+    done
     wait
-    rm -rf "$STATUS_DIR"
+    finish
     exit 0
 fi
 
-# tmux UI
-export -f update_agent run_monitor
+# tmux UI: one pane per stale agent, a small monitor pane below
+export AGENTS_DIR
+export -f agent_label agent_package install_agent update_agent run_monitor
 
 tmux new-session -d -s updates -x "$(tput cols)" -y "$(tput lines)" \
-    "bash -c 'update_agent claude \"Claude Code\" bash -c \"curl -fsSL https://claude.ai/install.sh | bash\"'"
-
-tmux split-window -h -t updates \
-    "bash -c 'update_agent codex \"Codex\" npm install -g @openai/codex'"
+    "bash -c 'update_agent ${STALE[0]}'"
 
-tmux split-window -h -t updates \
-    "bash -c 'update_agent copilot \"Copilot CLI\" npm install -g @github/copilot'"
+for agent in "${STALE[@]:1}"; do
+    tmux split-window -h -t updates "bash -c 'update_agent $agent'"
+done
 
 # Even out the top panes
 tmux select-layout -t updates even-horizontal
@@ -92,4 +287,4 @@ tmux split-window -v -l 3 -t updates \
 
 tmux attach -t updates
 
-rm -rf "$STATUS_DIR"
+finish
@@ -0,0 +1,33 @@
+#!/usr/bin/env bash
+
+# Watch the tinyproxy filter directory and send tinyproxy SIGUSR1 (reload
+# config and filters) when the blocklist changes.  A burst of events, such as
+# an editor's write-rename-chmod sequence or a script appending line by line,
+# results in a single reload once the directory has been quiet for
+# LLM_BLOCKLIST_DEBOUNCE seconds.
+
+set -euo pipefail
+
+filter_dir=${1:-/etc/tinyproxy/filter}
+filter_file=${2:-blocklist}
+debounce=${LLM_BLOCKLIST_DEBOUNCE:-0.2}
+pid_file=/run/tinyproxy.pid
+
+inotifywait -m -q \
+    -e close_write -e moved_to -e create -e delete -e attrib \
+    --format '%f' "$filter_dir" |
+    while read -r name; do
+        if [ "$name" != "$filter_file" ]; then
+            continue
+        fi
+        # Drain the rest of the burst.  read -t fails once no event has
+        # arrived for $debounce seconds (or inotifywait has exited).
+        while read -r -t "$debounce" _; do
+            :
+        done
+        if pid=$(cat "$pid_file" 2>/dev/null) && kill -USR1 "$pid"; then
+            echo "$(date -Is) reloaded tinyproxy after $filter_file changed"
+        else
+            echo "$(date -Is) failed to signal tinyproxy" >&2
+        fi
+    done
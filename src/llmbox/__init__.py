@@ -3,6 +3,8 @@
 from __future__ import annotations
 
 import subprocess
+from functools import cache
+from pathlib import Path
 from typing import Final
 
 __all__ = ["__version__", "version_with_commit"]
@@ -13,20 +15,31 @@ VERSION: Final[str] = __version__
 
 
 def _commit_hash() -> str | None:
-    """Return the short git commit hash if available, otherwise None."""
+    """Return the short git commit hash of the llmbox checkout, otherwise None.
+
+    Git runs in the package directory rather than the caller's cwd so that an
+    installed copy never reports the commit of whatever repository the user is
+    standing in.
+    """
     try:
         result = subprocess.run(
             ["git", "rev-parse", "--short", "HEAD"],
             check=True,
             capture_output=True,
             text=True,
+            cwd=Path(__file__).resolve().parent,
         )
         return result.stdout.strip() or None
-    except (FileNotFoundError, subprocess.CalledProcessError):
+    except (FileNotFoundError, NotADirectoryError, subprocess.CalledProcessError):
         return None
 
 
+@cache
 def version_with_commit() -> str:
-    """Return version string including commit hash when available."""
+    """Return version string including commit hash when available.
+
+    This forks git, so only call it when version information is actually
+    requested.
+    """
     commit = _commit_hash()
     return f"{__version__} ({commit})" if commit else __version__
@@ -0,0 +1,515 @@
+"""Compile a human-maintained blocklist into a small set of tinyproxy filter patterns.
+
+tinyproxy tests every request against each line of its filter file in turn,
+so a list of thousands of domains costs thousands of regex evaluations per
+request.  The source list (``blocklist.txt`` in the config directory) holds
+one entry per line:
+
+- ``example.com`` blocks the domain and all of its subdomains.
+- ``*.example.com`` blocks only the subdomains.
+- ``re:PATTERN`` is copied through as a raw POSIX extended regex.  Any other
+  line that is not a domain is treated as a raw regex too, so an existing
+  tinyproxy filter file is a valid source.
+- Blank lines and lines starting with ``#`` are ignored.
+
+Domains covered by a broader entry are dropped, the rest are grouped by TLD
+and suffix-factored into alternations, for example
+``(google|(ads|track)\\.example)\\.com``, and split into lines short enough
+for tinyproxy's filter line buffer.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Sequence, TypeVar
+
+from .docker import proxy_filter_dir
+
+T = TypeVar("T")
+
+# tinyproxy reads filter lines into a 512-byte buffer; longer lines are split.
+MAX_PATTERN_LENGTH = 500
+# Probe at most this many entries when verifying a compiled list.
+VERIFY_SAMPLE = 5_000
+
+GENERATED_HEADER = "# Generated by llmbox blocklist compile from {source}. Edit that file instead."
+
+_LABEL = r"[a-z0-9_](?:[a-z0-9_-]*[a-z0-9_])?"
+_DOMAIN_RE = re.compile(rf"^(\*\.)?({_LABEL}(?:\.{_LABEL})*)\.?$")
+
+# Every domain pattern is anchored at the start of the URL (or bare host)
+# tinyproxy filters on, skips an optional scheme and userinfo (the host of
+# http://ok.com@blocked.com/ is blocked.com) and ends at the port, path,
+# query or end of string.  The port is spelled out so that userinfo such as
+# blocked.com:80@ok.com cannot pass for a host and port.  No ``#``: tinyproxy cuts filter lines at the first
+# unescaped one, and clients never send the fragment anyway.
+_HEAD = r"^([a-z][a-z0-9+.-]*://)?([^/?@]*@)?"
+_ANY_SUBDOMAIN = r"[^/:?]*\."
+_TAIL = r"\.?(:[0-9]*)?([/?]|$)"
+
+
+def blocklist_source_path(config_dir: Path) -> Path:
+    return config_dir / "blocklist.txt"
+
+
+def managed_domains_path(config_dir: Path) -> Path:
+    """Sorted domain set maintained by ``llmbox blocklist add/remove/import``."""
+    return config_dir / "blocklist-domains.txt"
+
+
+def compiled_blocklist_path(config_dir: Path) -> Path:
+    return proxy_filter_dir(config_dir) / "blocklist"
+
+
+@dataclass(frozen=True)
+class BlocklistSource:
+    domains: frozenset[str] = frozenset()
+    """Blocked together with all of their subdomains."""
+    subdomains: frozenset[str] = frozenset()
+    """Only their subdomains are blocked (``*.example.com`` entries)."""
+    regexes: tuple[str, ...] = ()
+
+
+def parse_entry(line: str) -> tuple[str, str] | None:
+    """Classify one source line as ("domain" | "subdomains" | "regex", value), or None to skip."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("re:"):
+        return ("regex", line[3:]) if line[3:] else None
+    match = _DOMAIN_RE.match(line.lower())
+    if match is None:
+        return ("regex", line)
+    if match.group(1):
+        return ("subdomains", match.group(2))
+    # A bare word is far more likely a regex than a whole TLD; use *.TLD for that.
+    if "." not in match.group(2):
+        return ("regex", line)
+    return ("domain", match.group(2))
+
+
+def parse_source(lines: Iterable[str]) -> BlocklistSource:
+    domains: set[str] = set()
+    subdomains: set[str] = set()
+    regexes: dict[str, None] = {}
+    for line in lines:
+        entry = parse_entry(line)
+        if entry is None:
+            continue
+        kind, value = entry
+        if kind == "domain":
+            domains.add(value)
+        elif kind == "subdomains":
+            subdomains.add(value)
+        else:
+            regexes[value] = None
+    return BlocklistSource(frozenset(domains), frozenset(subdomains), tuple(regexes))
+
+
+def _parents(domain: str) -> Iterable[str]:
+    """Yield the proper parent domains of *domain*, nearest first."""
+    index = domain.find(".")
+    while index != -1:
+        yield domain[index + 1 :]
+        index = domain.find(".", index + 1)
+
+
+def _covered(name: str, broader: frozenset[str]) -> bool:
+    """Whether a proper parent of *name* is in *broader* (_parents() inlined; this is hot)."""
+    index = name.find(".")
+    while index != -1:
+        if name[index + 1 :] in broader:
+            return True
+        index = name.find(".", index + 1)
+    return False
+
+
+def minimize(source: BlocklistSource) -> BlocklistSource:
+    """Drop entries already covered by a broader one."""
+    broader = source.domains | source.subdomains
+    domains = {domain for domain in source.domains if not _covered(domain, broader)}
+    subdomains = {
+        name
+        for name in source.subdomains
+        if name not in source.domains and not _covered(name, broader)
+    }
+    return BlocklistSource(frozenset(domains), frozenset(subdomains), source.regexes)
+
+
+# A trie of reversed domain labels.  A leaf holds the entry kind ("domain" or
+# "subdomains"); after minimize() no entry has entries below it, so a node is
+# either a leaf or a dict of children.
+_Trie = dict[str, "_Trie | str"]
+
+
+def _build_trie(source: BlocklistSource) -> _Trie:
+    root: _Trie = {}
+    for kind, names in (("domain", source.domains), ("subdomains", source.subdomains)):
+        for name in names:
+            labels = name.split(".")
+            node = root
+            for label in reversed(labels[1:]):
+                child = node.get(label)
+                if not isinstance(child, dict):
+                    child = node[label] = {}
+                node = child
+            node[labels[0]] = kind
+    return root
+
+
+def _alternation(parts: Sequence[str]) -> str:
+    return parts[0] if len(parts) == 1 else "(" + "|".join(parts) + ")"
+
+
+def _render(label: str, node: _Trie | str) -> str:
+    """Regex for the names in *node*'s subtree, up to and including *label*."""
+    if node == "domain":
+        return label
+    if node == "subdomains":
+        return _ANY_SUBDOMAIN + label
+    assert isinstance(node, dict)
+    children = [_render(child_label, child) for child_label, child in sorted(node.items())]
+    return _alternation(children) + r"\." + label
+
+
+def _line(body: str) -> str:
+    return f"{_HEAD}({_ANY_SUBDOMAIN})?{body}{_TAIL}"
+
+
+@dataclass(frozen=True)
+class CompiledLine:
+    """One filter line and the (minimized) entries it was generated from."""
+
+    pattern: str
+    domains: frozenset[str]
+    subdomains: frozenset[str]
+
+
+def _subtree_entries(name: str, node: _Trie | str) -> Iterable[tuple[str, str]]:
+    if isinstance(node, str):
+        yield node, name
+        return
+    for label, child in node.items():
+        yield from _subtree_entries(f"{label}.{name}", child)
+
+
+def _make_line(body: str, subtrees: Iterable[tuple[str, _Trie | str]]) -> CompiledLine:
+    domains: list[str] = []
+    subdomains: list[str] = []
+    for name, node in subtrees:
+        for kind, entry in _subtree_entries(name, node):
+            (domains if kind == "domain" else subdomains).append(entry)
+    return CompiledLine(_line(body), frozenset(domains), frozenset(subdomains))
+
+
+def _lines_for(name: str, node: _Trie | str, limit: int) -> list[CompiledLine]:
+    """Pack the subtrees below *node* into as few lines as fit in *limit* characters.
+
+    *name* is the domain *node* stands for.  A subtree too big for one line is
+    split further on its own children.
+    """
+    if isinstance(node, str):
+        # Only a whole TLD (``*.zip``) gets here; deeper entries are rendered
+        # by their parents.
+        return [_make_line(_render(name, node), [(name, node)])]
+
+    suffix = name.replace(".", r"\.")
+    # Everything but the alternatives themselves: the line template, the
+    # group parentheses and the suffix.
+    overhead = len(_line("()" + r"\." + suffix))
+    lines: list[CompiledLine] = []
+    batch: list[tuple[str, str, _Trie | str]] = []
+    batch_length = 0
+
+    def flush() -> None:
+        nonlocal batch_length
+        if batch:
+            body = _alternation([alt for alt, _, _ in batch]) + r"\." + suffix
+            lines.append(_make_line(body, [(child_name, child) for _, child_name, child in batch]))
+            batch.clear()
+            batch_length = 0
+
+    for label, child in sorted(node.items()):
+        alt = _render(label, child)
+        if overhead + len(alt) > limit and isinstance(child, dict):
+            flush()
+            lines.extend(_lines_for(f"{label}.{name}", child, limit))
+            continue
+        # Alternatives are joined with "|".
+        if batch and overhead + batch_length + 1 + len(alt) > limit:
+            flush()
+        batch_length += len(alt) + (1 if batch else 0)
+        batch.append((alt, f"{label}.{name}", child))
+    flush()
+    return lines
+
+
+def compile_lines(
+    source: BlocklistSource, limit: int = MAX_PATTERN_LENGTH, minimized: bool = False
+) -> list[CompiledLine]:
+    """Suffix-factor the domain entries of *source* into lines grouped by TLD.
+
+    Pass *minimized* if *source* already went through minimize().
+    """
+    root = _build_trie(source if minimized else minimize(source))
+    lines: list[CompiledLine] = []
+    for tld, node in sorted(root.items()):
+        lines.extend(_lines_for(tld, node, limit))
+    return lines
+
+
+def compile_patterns(source: BlocklistSource, limit: int = MAX_PATTERN_LENGTH) -> list[str]:
+    """Return the tinyproxy filter lines for *source*: raw regexes first, then the domains."""
+    return [*source.regexes, *(line.pattern for line in compile_lines(source, limit))]
+
+
+def reference_patterns(source: BlocklistSource) -> list[str]:
+    """One pattern per entry, as the list would look if maintained by hand."""
+    patterns = list(source.regexes)
+    patterns.extend(_line(name.replace(".", r"\.")) for name in sorted(source.domains))
+    patterns.extend(
+        _line(_ANY_SUBDOMAIN + name.replace(".", r"\.")) for name in sorted(source.subdomains)
+    )
+    return patterns
+
+
+_SCHEME_RE = re.compile(r"^[a-z][a-z0-9+.-]*://")
+_AUTHORITY_END_RE = re.compile(r"[/?]")
+_HOST_END_RE = re.compile(r"[:/?]")
+
+
+def is_blocked_by_domains(source: BlocklistSource, subject: str) -> bool:
+    """Decide whether the domain entries of *source* block *subject*, without regexes.
+
+    This is the specification compile_patterns() must match: the host is what
+    follows an optional scheme and userinfo (up to the last ``@`` before any
+    ``/?``), up to the first ``:/?``.
+    """
+    subject = _SCHEME_RE.sub("", subject.lower(), count=1)
+    authority = _AUTHORITY_END_RE.split(subject, maxsplit=1)[0]
+    if "@" in authority:
+        subject = subject[authority.rindex("@") + 1 :]
+    host = _HOST_END_RE.split(subject, maxsplit=1)[0].removesuffix(".")
+    if host in source.domains:
+        return True
+    return any(p in source.domains or p in source.subdomains for p in _parents(host))
+
+
+def probe_subjects(source: BlocklistSource) -> list[str]:
+    """Request subjects exercising the edges of every domain entry."""
+    probes: list[str] = []
+    for name in sorted(source.domains | source.subdomains):
+        first, _, rest = name.partition(".")
+        probes.extend(
+            [
+                name,
+                f"{name}.",
+                f"{name}:443",
+                f"www.{name}:443",
+                f"https://a.b.{name}/path?q=1",
+                f"HTTP://WWW.{name.upper()}:8080/",
+                f"http://x{name}/",
+                f"{name}x:443",
+                f"http://{name}.example.invalid/",
+                f"http://example.invalid/?u={name}",
+                f"http://user:pass@{name}/",
+                f"http://{name}@example.invalid/",
+                f"http://{name}:80@example.invalid/",
+                f"{first}-x.{rest}:443",
+                f"{rest}:443",
+            ]
+        )
+    return probes
+
+
+def _compile_python(patterns: Iterable[str]) -> list[re.Pattern[str]]:
+    compiled = []
+    for pattern in patterns:
+        try:
+            compiled.append(re.compile(pattern, re.IGNORECASE))
+        except re.error:
+            # POSIX-only syntax in a raw regex; it is copied verbatim anyway.
+            continue
+    return compiled
+
+
+def _spread(items: Sequence[T], limit: int | None) -> Sequence[T]:
+    """Return at most *limit* items, evenly spaced over *items*."""
+    if limit is None or len(items) <= limit:
+        return items
+    step = -(-len(items) // limit)
+    return items[::step]
+
+
+def verify(
+    source: BlocklistSource,
+    lines: Sequence[CompiledLine],
+    sample: int | None = None,
+    minimal: BlocklistSource | None = None,
+) -> list[str]:
+    """Return the problems found checking *lines* against the domain entries of *source*.
+
+    Checks that the lines cover exactly the minimized entries, and then that
+    each line blocks exactly what its own entries block on a set of probe
+    subjects.  Lines are independent, so if each is equivalent to its
+    entries, the whole list is equivalent to the source.  With *sample*,
+    only about that many entries are probed, spread evenly over the list.
+    Raw regexes are copied through unchanged and are not checked.  *minimal*
+    may be passed if minimize(source) was already computed.
+    """
+    minimal = minimal if minimal is not None else minimize(source)
+    covered_domains = frozenset().union(*(line.domains for line in lines))
+    covered_subdomains = frozenset().union(*(line.subdomains for line in lines))
+    problems = [f"missing {name}" for name in sorted(minimal.domains - covered_domains)]
+    problems += [f"missing *.{name}" for name in sorted(minimal.subdomains - covered_subdomains)]
+    problems += [f"unexpected {name}" for name in sorted(covered_domains - minimal.domains)]
+    problems += [f"unexpected *.{name}" for name in sorted(covered_subdomains - minimal.subdomains)]
+
+    per_line = max(1, len(covered_domains) + len(covered_subdomains)) / max(1, len(lines))
+    line_sample = None if sample is None else max(1, int(sample / per_line))
+    for line in _spread(lines, line_sample):
+        try:
+            compiled = re.compile(line.pattern, re.IGNORECASE)
+        except re.error as exc:
+            problems.append(f"invalid pattern {line.pattern}: {exc}")
+            continue
+        spec = BlocklistSource(line.domains, line.subdomains)
+        for subject in probe_subjects(spec):
+            if bool(compiled.search(subject)) != is_blocked_by_domains(spec, subject):
+                problems.append(subject)
+
+    # Dropping covered entries must not change what is blocked.
+    names = _spread(sorted(source.domains | source.subdomains), sample)
+    for subject in probe_subjects(BlocklistSource(frozenset(names))):
+        if is_blocked_by_domains(source, subject) != is_blocked_by_domains(minimal, subject):
+            problems.append(subject)
+    return problems
+
+
+def match_cost(patterns: Sequence[str], subjects: Sequence[str], rounds: int = 3) -> float:
+    """Mean seconds to filter one subject, stopping at the first match like tinyproxy."""
+    compiled = _compile_python(patterns)
+    if not subjects:
+        return 0.0
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for subject in subjects:
+            for pattern in compiled:
+                if pattern.search(subject):
+                    break
+        best = min(best, time.perf_counter() - start)
+    return best / len(subjects)
+
+
+# Typical allowed traffic: a request that matches nothing is the worst case,
+# since every pattern is tried.
+_BENCHMARK_SUBJECTS = (
+    "registry.npmjs.org:443",
+    "api.anthropic.com:443",
+    "https://pypi.org/simple/requests/",
+    "http://deb.debian.org/debian/dists/stable/InRelease",
+    "github.com:443",
+)
+
+
+def benchmark(source: BlocklistSource, patterns: Sequence[str]) -> tuple[float, float]:
+    """Return the mean per-request match cost in seconds of the uncompiled list and of *patterns*.
+
+    Requests are a mix of allowed hosts and probes around the blocked
+    entries.  Timed with Python's regex engine, so absolute numbers differ
+    from tinyproxy's, but the ratio carries over.
+    """
+    reference = reference_patterns(source)
+    # Keep the uncompiled run to a few million regex calls on huge lists.
+    count = max(20, min(1000, 2_000_000 // max(1, len(reference))))
+    names = _spread(sorted(source.domains | source.subdomains), max(1, count // 4))
+    probes = probe_subjects(BlocklistSource(frozenset(names)))
+    subjects = [*_spread(probes, count // 2), *_BENCHMARK_SUBJECTS * (count // 10 + 1)]
+    return match_cost(reference, subjects, rounds=1), match_cost(patterns, subjects)
+
+
+@dataclass(frozen=True)
+class CompileResult:
+    source_path: Path
+    output_path: Path
+    source: BlocklistSource
+    patterns: list[str]
+    redundant: int
+
+
+def _seed_source(source_path: Path, output_path: Path) -> None:
+    """Start the source list from the current filter file, which is all raw regexes."""
+    source_path.parent.mkdir(parents=True, exist_ok=True)
+    lines: list[str] = []
+    if output_path.is_file():
+        lines = output_path.read_text().splitlines()
+        if lines and lines[0].startswith("# Generated by llmbox"):
+            # Compiled output, not hand-written patterns.
+            lines = []
+        # Lines that happen to look like domains must stay regexes.
+        lines = [
+            f"re:{line}" if (entry := parse_entry(line)) and entry[0] != "regex" else line
+            for line in lines
+        ]
+    source_path.write_text("".join(f"{line}\n" for line in lines))
+
+
+def write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text)
+    tmp_path.replace(path)
+
+
+def compile_verified(
+    source: BlocklistSource, label: str, sample: int | None = VERIFY_SAMPLE
+) -> tuple[list[str], int]:
+    """Compile *source* and check the result, returning the patterns and the redundant count.
+
+    Raises:
+        ValueError: If the compiled patterns fail verification.
+    """
+    minimal = minimize(source)
+    lines = compile_lines(minimal, minimized=True)
+    problems = verify(source, lines, sample=sample, minimal=minimal)
+    if problems:
+        raise ValueError(f"Compiled blocklist does not match {label}: " + ", ".join(problems[:5]))
+    patterns = [*source.regexes, *(line.pattern for line in lines)]
+    kept = sum(len(line.domains) + len(line.subdomains) for line in lines)
+    return patterns, len(source.domains) + len(source.subdomains) - kept
+
+
+def compile_blocklist(config_dir: Path, sample: int | None = VERIFY_SAMPLE) -> CompileResult:
+    """Compile ``blocklist.txt`` and the managed domain set into the mounted tinyproxy filter file.
+
+    If there is no source list yet it is created from the current filter
+    file first, so nothing written by hand is lost.  The output is written
+    atomically, so the in-container watcher only ever sees a complete file.
+
+    Raises:
+        ValueError: If the compiled patterns fail verification.
+    """
+    source_path = blocklist_source_path(config_dir)
+    output_path = compiled_blocklist_path(config_dir)
+    if not source_path.exists():
+        _seed_source(source_path, output_path)
+    with source_path.open() as handle:
+        source = parse_source(handle)
+    managed_path = managed_domains_path(config_dir)
+    if managed_path.exists():
+        with managed_path.open() as handle:
+            managed = parse_source(handle)
+        source = BlocklistSource(
+            source.domains | managed.domains,
+            source.subdomains | managed.subdomains,
+            source.regexes,
+        )
+    patterns, redundant = compile_verified(source, str(source_path), sample)
+    header = GENERATED_HEADER.format(source=source_path)
+    write_atomic(output_path, "".join(f"{line}\n" for line in [header, *patterns]))
+    return CompileResult(source_path, output_path, source, patterns, redundant)
@@ -0,0 +1,171 @@
+"""Per-profile proxy filters layered over the global blocklist.
+
+A profile's ``blocklist`` policy decides what its containers filter:
+
+- ``inherit`` mounts the global filter directory shared by every profile.
+- ``extend`` filters the global blocklist plus the profile's own entries.
+- ``replace`` filters only the profile's entries.
+- ``allowlist`` lets through only what the profile's entries match; tinyproxy
+  runs with ``FilterDefaultDeny Yes`` and denies everything else.
+
+Entries use the ``blocklist.txt`` syntax.  The layered filter file is
+compiled once per distinct set of inputs and cached under the data directory
+in a directory named by their hash, then hard-linked into a directory per
+profile and mode that the container mounts.  Launching an unchanged profile
+costs a hash of the inputs and a ``stat``.
+
+tinyproxy renders ``FilterDefaultDeny`` once, when the container starts, and
+only reloads the filter file afterwards.  Keying the mounted directory by mode
+means a policy change never swaps an allowlist under a running container that
+treats it as a blocklist, or the reverse: running containers keep the
+directory of the mode they started with, and new ones mount the new mode's.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Sequence
+
+from .blocklist import compile_verified, compiled_blocklist_path, parse_source
+from .paths import default_data_dir
+
+POLICY_MODES = ("inherit", "extend", "replace", "allowlist")
+
+# Bump when the layout or content of a cache entry changes.
+LAYER_FORMAT = 2
+
+# Present in a filter directory when tinyproxy should deny unmatched requests.
+DEFAULT_DENY_MARKER = "default-deny"
+
+# Seconds an unused cache entry is kept before it may be pruned.
+PRUNE_GRACE = 60
+
+# Cache entries are shared by every profile with the same inputs, so the
+# header does not name one.
+LAYER_HEADER = "# Generated by llmbox from a profile blocklist policy ({mode})."
+
+
+def blocklists_dir(data_dir: Path | None = None) -> Path:
+    return (data_dir or default_data_dir()) / "blocklists"
+
+
+def _global_patterns(config_dir: Path) -> bytes:
+    try:
+        return compiled_blocklist_path(config_dir).read_bytes()
+    except FileNotFoundError:
+        return b""
+
+
+def layer_key(mode: str, entries: Sequence[str], global_filter: bytes) -> str:
+    """Hash everything the layered filter for *mode* and *entries* is built from."""
+    digest = hashlib.sha256()
+    for part in (str(LAYER_FORMAT), mode, *entries):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    if mode == "extend":
+        digest.update(hashlib.sha256(global_filter).digest())
+    return digest.hexdigest()
+
+
+def _build_entry(
+    directory: Path, profile: str, mode: str, entries: Sequence[str], global_filter: bytes
+) -> None:
+    patterns, _ = compile_verified(parse_source(entries), f"the {profile} profile entries")
+    lines = [LAYER_HEADER.format(mode=mode)]
+    if mode == "extend":
+        for line in global_filter.decode().splitlines():
+            if line.strip() and not line.startswith("#"):
+                lines.append(line)
+    lines.extend(patterns)
+    (directory / "blocklist").write_text("".join(f"{line}\n" for line in lines))
+    if mode == "allowlist":
+        (directory / DEFAULT_DENY_MARKER).touch()
+
+
+def _prune_unused(cache_dir: Path, keep: Path) -> None:
+    # An entry no profile directory links to any more has a link count of 1.
+    # Recent ones are left alone: a concurrent launch may be about to link one.
+    cutoff = time.time() - PRUNE_GRACE
+    for entry in cache_dir.iterdir():
+        try:
+            stat = (entry / "blocklist").stat()
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        if entry != keep and stat.st_nlink == 1 and stat.st_mtime < cutoff:
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def _build_cached(
+    entry: Path, profile: str, mode: str, entries: Sequence[str], global_filter: bytes
+) -> None:
+    cache_dir = entry.parent
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=cache_dir, prefix=".build-"))
+    try:
+        _build_entry(tmp, profile, mode, entries, global_filter)
+        try:
+            tmp.rename(entry)
+        except OSError:
+            # Another launch built the same entry first.
+            if not (entry / "blocklist").is_file():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _link_into(entry: Path, target_dir: Path) -> None:
+    """Make *target_dir* hold the files of cache *entry*, replacing each atomically."""
+    target_dir.mkdir(parents=True, exist_ok=True)
+    source = entry / "blocklist"
+    target = target_dir / "blocklist"
+    if not (target.exists() and os.path.samefile(source, target)):
+        tmp = target_dir / f".blocklist.{os.getpid()}.tmp"
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(source, tmp)
+        except OSError:
+            shutil.copyfile(source, tmp)
+        # Replaced, never rewritten: the in-container watcher reloads on the rename.
+        tmp.replace(target)
+    marker = target_dir / DEFAULT_DENY_MARKER
+    if (entry / DEFAULT_DENY_MARKER).exists():
+        marker.touch()
+    else:
+        marker.unlink(missing_ok=True)
+
+
+def profile_filter_dir(
+    config_dir: Path,
+    profile: str,
+    mode: str,
+    entries: Sequence[str],
+    data_dir: Path | None = None,
+) -> Path | None:
+    """Return the filter directory to mount for *profile*, building it if needed.
+
+    Returns None for ``inherit``: the profile uses the global filter directory.
+
+    Raises:
+        ValueError: If *mode* is unknown or the entries fail to compile.
+    """
+    if mode not in POLICY_MODES:
+        raise ValueError(f"Unknown blocklist mode {mode!r}; expected one of {POLICY_MODES}")
+    if mode == "inherit":
+        return None
+    base = blocklists_dir(data_dir)
+    cache_dir = base / "cache"
+    global_filter = _global_patterns(config_dir) if mode == "extend" else b""
+    entry = cache_dir / layer_key(mode, entries, global_filter)
+    built = not (entry / "blocklist").is_file()
+    if built:
+        _build_cached(entry, profile, mode, entries, global_filter)
+    target_dir = base / "profiles" / profile / mode
+    _link_into(entry, target_dir)
+    if built:
+        _prune_unused(cache_dir, keep=entry)
+    return target_dir
@@ -0,0 +1,193 @@
+"""The managed blocklist domain set: a sorted, deduplicated file of one entry per line.
+
+``llmbox blocklist add/remove/import`` maintain ``blocklist-domains.txt`` next
+to the hand-edited ``blocklist.txt``; the compiler reads both.  Updates are an
+external merge sort: new entries are sorted in bounded chunks spilled to
+temporary files, then streamed together with the existing set into a new
+file that atomically replaces the old one.  Memory use does not depend on
+the size of the set or of the input.
+"""
+
+from __future__ import annotations
+
+import functools
+import heapq
+import ipaddress
+import os
+import tempfile
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+from typing import IO, Collection, Iterable, Iterator
+
+from .blocklist import parse_entry
+
+# Entries sorted in memory before being spilled to a temporary run file.
+RUN_SIZE = 200_000
+
+# Names hosts files conventionally map that are not blocklist entries.
+_HOSTS_NOISE = frozenset(
+    {
+        "localhost",
+        "localhost.localdomain",
+        "local",
+        "broadcasthost",
+        "ip6-localhost",
+        "ip6-loopback",
+        "ip6-localnet",
+        "ip6-mcastprefix",
+        "ip6-allnodes",
+        "ip6-allrouters",
+        "ip6-allhosts",
+    }
+)
+
+
+def normalize_domain(text: str) -> str | None:
+    """Return *text* as a managed entry (``example.com`` or ``*.example.com``), or None."""
+    entry = parse_entry(text)
+    if entry is None:
+        return None
+    kind, value = entry
+    if kind == "domain":
+        return value
+    if kind == "subdomains":
+        return f"*.{value}"
+    return None
+
+
+@functools.lru_cache(maxsize=64)
+def _is_address(token: str) -> bool:
+    # Cached: hosts files repeat one or two sink addresses on every line.
+    try:
+        ipaddress.ip_address(token)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_import_line(line: str, format: str = "auto") -> tuple[list[str], bool]:
+    """Extract entries from one line of a hosts file or plain domain list.
+
+    Returns the normalized entries and whether the line held something that
+    could not be used.  In ``auto`` format a line whose first field is an IP
+    address is read as a hosts entry, anything else as a domain.
+    """
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return [], False
+    fields = line.split()
+    if format == "hosts" or (format == "auto" and _is_address(fields[0])):
+        names = fields[1:]
+    else:
+        names = fields[:1]
+        if len(fields) > 1:
+            return [], True
+    entries: list[str] = []
+    rejected = False
+    for name in names:
+        if name.lower() in _HOSTS_NOISE:
+            continue
+        entry = normalize_domain(name)
+        if entry is None:
+            rejected = True
+        else:
+            entries.append(entry)
+    return entries, rejected
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    """Entries found in the input, including duplicates."""
+    rejected: int = 0
+    """Input lines that held something other than a domain."""
+
+
+def iter_import(
+    handles: Iterable[IO[str]], format: str = "auto", stats: ImportStats | None = None
+) -> Iterator[str]:
+    """Stream normalized entries out of *handles*, line by line."""
+    stats = stats if stats is not None else ImportStats()
+    for handle in handles:
+        for line in handle:
+            entries, rejected = parse_import_line(line, format)
+            stats.read += len(entries)
+            stats.rejected += rejected
+            yield from entries
+
+
+def iter_entries(path: Path) -> Iterator[str]:
+    """Stream the entries of a managed set file, in order."""
+    try:
+        handle = path.open()
+    except FileNotFoundError:
+        return
+    with handle:
+        for line in handle:
+            entry = line.rstrip("\n")
+            if entry:
+                yield entry
+
+
+def _spill_runs(entries: Iterable[str], directory: Path, run_size: int) -> list[Path]:
+    runs: list[Path] = []
+    chunk: list[str] = []
+
+    def spill() -> None:
+        run = directory / f"run{len(runs)}"
+        # Deduplicating each chunk keeps the runs, and the merge, small.
+        run.write_text("".join(f"{entry}\n" for entry in sorted(set(chunk))))
+        runs.append(run)
+        chunk.clear()
+
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= run_size:
+            spill()
+    if chunk:
+        spill()
+    return runs
+
+
+@dataclass(frozen=True)
+class MergeResult:
+    added: int
+    removed: int
+    total: int
+
+
+def update_set(
+    path: Path,
+    add: Iterable[str] = (),
+    remove: Collection[str] = (),
+    run_size: int = RUN_SIZE,
+) -> MergeResult:
+    """Merge *add* into the set stored at *path* and drop *remove*, writing atomically.
+
+    *add* is consumed as a stream and may be arbitrarily large; *remove* is
+    held in memory.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    added = removed = total = 0
+    with tempfile.TemporaryDirectory(dir=path.parent, prefix=".blocklist-") as tmp:
+        runs = _spill_runs(add, Path(tmp), run_size)
+        # Existing entries sort before new copies of themselves (0 < 1), so
+        # the first of each group says whether the entry is new.
+        streams = [((entry, 0) for entry in iter_entries(path))]
+        streams += [((entry, 1) for entry in iter_entries(run)) for run in runs]
+        tmp_path = Path(tmp) / "merged"
+        with tmp_path.open("w") as out:
+            merged = heapq.merge(*streams)
+            for entry, group in groupby(merged, key=lambda item: item[0]):
+                is_new = next(group)[1] == 1
+                if entry in remove:
+                    removed += not is_new
+                    continue
+                added += is_new
+                total += 1
+                out.write(f"{entry}\n")
+            out.flush()
+            os.fsync(out.fileno())
+        tmp_path.replace(path)
+    return MergeResult(added=added, removed=removed, total=total)
@@ -0,0 +1,530 @@
+"""Host-side caching mirror for package registries, shared by every container.
+
+Downloads through tinyproxy cannot be cached: HTTPS goes through opaque
+CONNECT tunnels.  Instead ``llmbox cache-proxy serve`` runs a plain HTTP
+mirror on the host, and containers started with ``cache_proxy.enabled``
+point npm, pip, uv and dnf at it.  Each upstream gets a path prefix:
+
+    /npm/...         https://registry.npmjs.org/...
+    /pypi/...        https://pypi.org/...
+    /pypi-files/...  https://files.pythonhosted.org/...
+    /fedora/...      https://dl.fedoraproject.org/pub/fedora/linux/...
+
+Bodies are stored under ``objects/`` named by their SHA-256, and an SQLite
+index maps each URL to its blob:
+
+- Artifacts (npm tarballs, wheels and sdists, RPMs, hash-named repodata)
+  never change once published and are served from disk without asking
+  upstream again.
+- Metadata (packuments, simple index pages, repomd.xml) is served from disk
+  for ``metadata_ttl`` seconds, then revalidated with its ETag or
+  Last-Modified.  When upstream cannot be reached, the stale copy is served.
+  It is cached per Accept header, since npm asks for abbreviated documents.
+  Upstream URLs in it are rewritten to the mirror's, so tarball and file
+  links come back through the cache.
+
+Concurrent requests for the same URL wait for a single upstream fetch, so a
+fleet of containers installing the same package downloads it once.  Blobs
+are evicted least recently used first once the store exceeds its size cap.
+Requests carrying credentials are passed through uncached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Mapping, Protocol
+
+from . import __version__
+from .paths import default_data_dir
+
+DEFAULT_MAX_SIZE = 20 * 1024**3
+DEFAULT_METADATA_TTL = 300
+DEFAULT_MIRRORS = {
+    "npm": "https://registry.npmjs.org",
+    "pypi": "https://pypi.org",
+    "pypi-files": "https://files.pythonhosted.org",
+    "fedora": "https://dl.fedoraproject.org/pub/fedora/linux",
+}
+UPSTREAM_TIMEOUT = 60.0
+# An eviction frees space down to this fraction of the cap, so a full store
+# does not evict again on every fetch.
+EVICT_TO = 0.9
+
+IMMUTABLE_SUFFIXES = (".tgz", ".whl", ".tar.gz", ".tar.bz2", ".zip", ".rpm", ".drpm")
+_HASHED_REPODATA = re.compile(r"/repodata/[0-9a-f]{32,}-[^/]+$")
+_TEXT_TYPES = ("json", "html", "xml", "text/")
+_CHUNK = 1024 * 1024
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    content_encoding TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    last_modified TEXT NOT NULL,
+    immutable INTEGER NOT NULL,
+    fetched REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+-- The bytes in blobs, kept by triggers so the size check after each store
+-- does not add up the whole table.
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO meta VALUES ('size', (SELECT COALESCE(SUM(size), 0) FROM blobs));
+CREATE TRIGGER IF NOT EXISTS blobs_insert AFTER INSERT ON blobs BEGIN
+    UPDATE meta SET value = value + new.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS blobs_delete AFTER DELETE ON blobs BEGIN
+    UPDATE meta SET value = value - old.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS blobs_update AFTER UPDATE OF size ON blobs BEGIN
+    UPDATE meta SET value = value - old.size + new.size WHERE name = 'size';
+END;
+"""
+
+
+def cache_proxy_dir(data_dir: Path | None = None) -> Path:
+    return (data_dir or default_data_dir()) / "cache-proxy"
+
+
+def is_immutable(path: str) -> bool:
+    """Whether *path* names a published artifact, which never changes."""
+    path = path.partition("?")[0]
+    return path.endswith(IMMUTABLE_SUFFIXES) or _HASHED_REPODATA.search(path) is not None
+
+
+@dataclass(frozen=True)
+class Entry:
+    key: str
+    url: str
+    digest: str
+    content_type: str
+    content_encoding: str
+    etag: str
+    last_modified: str
+    immutable: bool
+    fetched: float
+
+
+class CacheStore:
+    """Content-addressed blobs plus the SQLite index of the URLs that map to them."""
+
+    def __init__(self, root: Path, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.root = root
+        self.max_size = max_size
+        self.objects = root / "objects"
+        self.tmp = root / "tmp"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.tmp.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            root / "index.db", isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    def lookup(self, key: str) -> Entry | None:
+        """Return the entry for *key*, marking its blob as used; None if missing."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT key, url, digest, content_type, content_encoding, etag, last_modified,"
+                " immutable, fetched FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE blobs SET accessed = ? WHERE digest = ?", (time.time(), row[2]))
+        entry = Entry(*row[:7], immutable=bool(row[7]), fetched=row[8])
+        if not self.blob_path(entry.digest).exists():
+            # Removed behind our back; fetch it again.
+            self.forget(key)
+            return None
+        return entry
+
+    def forget(self, key: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def refresh(self, key: str) -> None:
+        """Record that upstream confirmed the entry for *key* is current."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE entries SET fetched = ? WHERE key = ?", (time.time(), key))
+
+    def write(self, source: UpstreamResponse) -> tuple[str, int, Path]:
+        """Copy *source* into a temporary file; returns its digest, size and path."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, name = _mkstemp(self.tmp)
+        with os.fdopen(fd, "wb") as target:
+            while chunk := source.read(_CHUNK):
+                digest.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size, Path(name)
+
+    def store(self, entry: Entry, size: int, tmp_path: Path) -> None:
+        """Move the body at *tmp_path* into the store and index it as *entry*."""
+        path = self.blob_path(entry.digest)
+        path.parent.mkdir(exist_ok=True)
+        if path.exists():
+            tmp_path.unlink()
+        else:
+            tmp_path.replace(path)
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO blobs (digest, size, accessed) VALUES (?, ?, ?)"
+                " ON CONFLICT (digest) DO UPDATE SET accessed = excluded.accessed",
+                (entry.digest, size, now),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.key,
+                    entry.url,
+                    entry.digest,
+                    entry.content_type,
+                    entry.content_encoding,
+                    entry.etag,
+                    entry.last_modified,
+                    int(entry.immutable),
+                    entry.fetched,
+                ),
+            )
+            total = self._size(conn)
+        if total > self.max_size:
+            self.evict(int(self.max_size * EVICT_TO))
+
+    @staticmethod
+    def _size(conn: sqlite3.Connection) -> int:
+        (size,) = conn.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()
+        return size
+
+    def usage(self) -> tuple[int, int]:
+        """Return the number of entries and the bytes stored."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            size = self._size(self._conn)
+        return entries, size
+
+    def evict(self, limit: int) -> tuple[int, int]:
+        """Drop least recently used blobs until at most *limit* bytes remain.
+
+        Returns the number of blobs removed and the bytes freed.
+        """
+        removed: list[tuple[str, int]] = []
+        with self._transaction() as conn:
+            total = self._size(conn)
+            for digest, size in conn.execute("SELECT digest, size FROM blobs ORDER BY accessed"):
+                if total <= limit:
+                    break
+                removed.append((digest, size))
+                total -= size
+            for digest, _ in removed:
+                conn.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+                conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        for digest, _ in removed:
+            self.blob_path(digest).unlink(missing_ok=True)
+        return len(removed), sum(size for _, size in removed)
+
+
+def _mkstemp(directory: Path) -> tuple[int, str]:
+    import tempfile
+
+    return tempfile.mkstemp(dir=directory, prefix=".fetch-")
+
+
+@dataclass
+class Upstream:
+    """An upstream answer that is relayed rather than cached."""
+
+    status: int
+    content_type: str
+    body: bytes
+
+
+class UpstreamResponse(Protocol):
+    """What the opener returns; urllib's responses."""
+
+    headers: Message
+
+    def read(self, size: int = ..., /) -> bytes: ...
+
+    def __enter__(self) -> UpstreamResponse: ...
+
+    def __exit__(self, *exc: object) -> object: ...
+
+
+Opener = Callable[..., UpstreamResponse]
+
+
+class CacheProxy:
+    """The caching logic behind the HTTP handler, one instance per server."""
+
+    def __init__(
+        self,
+        store: CacheStore,
+        mirrors: Mapping[str, str] = DEFAULT_MIRRORS,
+        metadata_ttl: float = DEFAULT_METADATA_TTL,
+        opener: Opener = urllib.request.urlopen,
+    ) -> None:
+        self.store = store
+        self.mirrors = {name: base.rstrip("/") for name, base in mirrors.items()}
+        self.metadata_ttl = metadata_ttl
+        self.opener = opener
+        self.counters = {"hit": 0, "miss": 0, "revalidated": 0, "stale": 0, "uncached": 0}
+        self._lock = threading.Lock()
+        self._inflight: dict[str, threading.Event] = {}
+
+    def upstream_url(self, path: str) -> tuple[str, str] | None:
+        """Map a request path to (mirror name, upstream URL), or None if no mirror matches."""
+        name, _, rest = path.lstrip("/").partition("/")
+        base = self.mirrors.get(name)
+        if base is None:
+            return None
+        return name, f"{base}/{rest}"
+
+    def rewrite(self, body: bytes, mirror_base: str) -> bytes:
+        """Point upstream URLs in *body* at the mirror reached through *mirror_base*."""
+        for name, base in sorted(self.mirrors.items(), key=lambda item: -len(item[1])):
+            body = body.replace(base.encode() + b"/", f"{mirror_base}/{name}/".encode())
+        return body
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counters[outcome] += 1
+
+    def _fresh(self, entry: Entry) -> bool:
+        return entry.immutable or time.time() - entry.fetched < self.metadata_ttl
+
+    def fetch(
+        self, url: str, accept: str, headers: Mapping[str, str] | None = None
+    ) -> tuple[Entry | Upstream, str]:
+        """Return the cached entry (or relayed upstream answer) for *url* and how it was served.
+
+        The outcome is one of ``hit``, ``miss``, ``revalidated``, ``stale`` or
+        ``uncached``.
+        """
+        immutable = is_immutable(url)
+        key = url if immutable else f"{url}\n{accept}"
+        entry = self.store.lookup(key)
+        if entry is not None and self._fresh(entry):
+            self._count("hit")
+            return entry, "hit"
+
+        with self._lock:
+            waiting = self._inflight.get(key)
+            if waiting is None:
+                self._inflight[key] = threading.Event()
+        if waiting is not None:
+            # Someone is fetching this URL already; use what they got.
+            waiting.wait(UPSTREAM_TIMEOUT)
+            entry = self.store.lookup(key)
+            if entry is not None:
+                self._count("hit")
+                return entry, "hit"
+            return self._fetch(url, key, accept, immutable, None, headers)
+        try:
+            return self._fetch(url, key, accept, immutable, entry, headers)
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _fetch(
+        self,
+        url: str,
+        key: str,
+        accept: str,
+        immutable: bool,
+        entry: Entry | None,
+        headers: Mapping[str, str] | None,
+    ) -> tuple[Entry | Upstream, str]:
+        request_headers = {
+            "Accept": accept,
+            "Accept-Encoding": "identity",
+            "User-Agent": f"llmbox-cache-proxy/{__version__}",
+            **(headers or {}),
+        }
+        if entry is not None:
+            if entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request_headers["If-Modified-Since"] = entry.last_modified
+        request = urllib.request.Request(url, headers=request_headers)
+        try:
+            response = self.opener(request, timeout=UPSTREAM_TIMEOUT)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 304 and entry is not None:
+                self.store.refresh(key)
+                self._count("revalidated")
+                return entry, "revalidated"
+            self._count("uncached")
+            return Upstream(exc.code, exc.headers.get("Content-Type", ""), exc.read()), "uncached"
+        except (urllib.error.URLError, OSError):
+            if entry is not None:
+                self._count("stale")
+                return entry, "stale"
+            raise
+        with response:
+            digest, size, tmp_path = self.store.write(response)
+            fetched = Entry(
+                key=key,
+                url=url,
+                digest=digest,
+                content_type=response.headers.get("Content-Type", "application/octet-stream"),
+                content_encoding=response.headers.get("Content-Encoding", ""),
+                etag=response.headers.get("ETag", ""),
+                last_modified=response.headers.get("Last-Modified", ""),
+                immutable=immutable,
+                fetched=time.time(),
+            )
+        self.store.store(fetched, size, tmp_path)
+        self._count("miss")
+        return fetched, "miss"
+
+    def passthrough(self, url: str, headers: Mapping[str, str]) -> Upstream:
+        """Fetch *url* with the client's credentials, without caching."""
+        self._count("uncached")
+        request = urllib.request.Request(url, headers=dict(headers))
+        try:
+            with self.opener(request, timeout=UPSTREAM_TIMEOUT) as response:
+                return Upstream(200, response.headers.get("Content-Type", ""), response.read())
+        except urllib.error.HTTPError as exc:
+            return Upstream(exc.code, exc.headers.get("Content-Type", ""), exc.read())
+
+
+class CacheProxyHandler(BaseHTTPRequestHandler):
+    server: CacheProxyServer  # pyright: ignore[reportIncompatibleVariableOverride]
+    server_version = f"llmbox-cache-proxy/{__version__}"
+
+    def do_GET(self) -> None:
+        self._serve(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self._serve(send_body=False)
+
+    def _serve(self, send_body: bool) -> None:
+        proxy = self.server.proxy
+        path, _, query = self.path.partition("?")
+        target = proxy.upstream_url(path)
+        if target is None:
+            self._reply(404, "text/plain", b"No mirror for this path\n", send_body)
+            return
+        name, url = target
+        if query:
+            url += f"?{query}"
+        accept = self.headers.get("Accept", "*/*")
+        if "Authorization" in self.headers:
+            headers = {"Accept": accept, "Authorization": self.headers["Authorization"]}
+            answer = proxy.passthrough(url, headers)
+            self._reply(answer.status, answer.content_type, answer.body, send_body)
+            return
+        # Eviction can unlink a blob between the lookup and the read; an open
+        # file survives that, so the blob is opened first and refetched if gone.
+        for _ in range(2):
+            try:
+                result, outcome = proxy.fetch(url, accept)
+            except (urllib.error.URLError, OSError) as exc:
+                message = f"Upstream unreachable: {exc}\n".encode()
+                self._reply(502, "text/plain", message, send_body)
+                return
+            if isinstance(result, Upstream):
+                self._reply(result.status, result.content_type, result.body, send_body, outcome)
+                return
+            try:
+                handle = proxy.store.blob_path(result.digest).open("rb")
+            except FileNotFoundError:
+                proxy.store.forget(result.key)
+                continue
+            with handle:
+                self._send_entry(result, outcome, handle, send_body)
+            return
+        self._reply(502, "text/plain", b"Cached body evicted while serving\n", send_body)
+
+    def _send_entry(self, entry: Entry, outcome: str, handle: BinaryIO, send_body: bool) -> None:
+        textual = any(kind in entry.content_type for kind in _TEXT_TYPES)
+        if not entry.immutable and textual and not entry.content_encoding:
+            host = (
+                self.headers.get("Host")
+                or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+            )
+            body = self.server.proxy.rewrite(handle.read(), f"http://{host}")
+            self._reply(200, entry.content_type, body, send_body, outcome)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", entry.content_type)
+        if entry.content_encoding:
+            self.send_header("Content-Encoding", entry.content_encoding)
+        self.send_header("Content-Length", str(os.fstat(handle.fileno()).st_size))
+        self.send_header("X-Cache", outcome.upper())
+        self.end_headers()
+        if send_body:
+            shutil.copyfileobj(handle, self.wfile, _CHUNK)
+
+    def _reply(
+        self, status: int, content_type: str, body: bytes, send_body: bool, outcome: str = ""
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        if outcome:
+            self.send_header("X-Cache", outcome.upper())
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class CacheProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], proxy: CacheProxy, quiet: bool = False) -> None:
+        self.proxy = proxy
+        self.quiet = quiet
+        super().__init__(address, CacheProxyHandler)
@@ -0,0 +1,221 @@
+"""Package-manager caches kept across containers.
+
+Containers run with ``--rm``, so without these every session starts with
+empty dnf metadata and uv and npm caches.  Each cache in ``config.yaml``'s
+``caches`` is mounted into every container, backed by either
+
+- ``dir``: a directory under ``~/.local/share/llmbox/caches``, or
+- ``volume``: a Docker volume named ``llmbox-cache-NAME``.  Use this when
+  root writes the cache (dnf), so the host never ends up with root-owned
+  files it cannot prune.
+
+Caches owned by the user are listed in LLM_CACHE_DIRS, and fix-ownership.py
+hands their mount points to the container user.
+
+``llmbox cache ls`` and ``llmbox cache prune`` work on both backends.  The
+files of a volume are listed and removed by a throwaway container of the
+llm image, which has Python.  Pruning removes the least recently used files
+first, as judged by the later of their access and modification times.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping, Sequence
+
+from .paths import default_data_dir
+
+CACHE_VOLUME_PREFIX = "llmbox-cache-"
+CACHE_NAME = re.compile(r"[a-z0-9][a-z0-9_.-]*")
+# Where a throwaway container mounts a volume to list or prune it.
+VOLUME_MOUNT = "/cache"
+
+_SIZE = re.compile(r"(\d+)\s*([KMGT]?)i?B?", re.IGNORECASE)
+
+_LIST_SCRIPT = """
+import json, os, sys
+for root, _, names in os.walk(sys.argv[1]):
+    for name in names:
+        path = os.path.join(root, name)
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        print(json.dumps([os.path.relpath(path, sys.argv[1]), st.st_size, max(st.st_atime, st.st_mtime)]))
+"""
+
+_REMOVE_SCRIPT = """
+import os, sys
+for path in sys.stdin.read().split("\\0"):
+    if path:
+        try:
+            os.unlink(os.path.join(sys.argv[1], path))
+        except FileNotFoundError:
+            pass
+"""
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as ``512M`` or ``20G`` (binary units) into bytes.
+
+    Raises:
+        ValueError: If *text* is not a size.
+    """
+    match = _SIZE.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f"Not a size: {text!r}")
+    return int(match.group(1)) * 1024 ** " KMGT".index(match.group(2).upper() or " ")
+
+
+def format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TiB"
+
+
+def caches_dir(data_dir: Path | None = None) -> Path:
+    return (data_dir or default_data_dir()) / "caches"
+
+
+@dataclass(frozen=True)
+class CacheMount:
+    name: str
+    target: str
+    backend: str = "dir"
+    owner: str = "user"
+    environment: Mapping[str, str] = field(default_factory=dict)
+
+    @property
+    def source(self) -> str:
+        """The host directory or the volume name mounted at *target*."""
+        if self.backend == "volume":
+            return f"{CACHE_VOLUME_PREFIX}{self.name}"
+        return str(caches_dir() / self.name)
+
+    def spec(self) -> str:
+        return f"{self.source}:{self.target}"
+
+
+@dataclass(frozen=True)
+class CacheFile:
+    path: str
+    """Relative to the cache's root."""
+    size: int
+    used: float
+
+
+def least_recently_used(files: Iterable[CacheFile], limit: int) -> list[CacheFile]:
+    """Return the files to remove, least recently used first, to get down to *limit* bytes."""
+    ordered = sorted(files, key=lambda item: item.used)
+    total = sum(item.size for item in ordered)
+    selected: list[CacheFile] = []
+    for item in ordered:
+        if total <= limit:
+            break
+        selected.append(item)
+        total -= item.size
+    return selected
+
+
+def _walk(root: Path) -> Iterator[CacheFile]:
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                else:
+                    relative = os.path.relpath(entry.path, root)
+                    yield CacheFile(relative, st.st_size, max(st.st_atime, st.st_mtime))
+
+
+def _volume_command(cache: CacheMount, image: str, script: str, interactive: bool) -> list[str]:
+    return [
+        "docker",
+        "run",
+        "--rm",
+        *(["-i"] if interactive else []),
+        "--network",
+        "none",
+        "--user",
+        "0",
+        "--entrypoint",
+        "python3",
+        "-v",
+        f"{cache.source}:{VOLUME_MOUNT}",
+        image,
+        "-c",
+        script,
+        VOLUME_MOUNT,
+    ]
+
+
+def volume_exists(cache: CacheMount, runner=subprocess.run) -> bool:
+    result = runner(
+        ["docker", "volume", "inspect", cache.source], check=False, capture_output=True, text=True
+    )
+    return result.returncode == 0
+
+
+def list_files(cache: CacheMount, image: str, runner=subprocess.run) -> list[CacheFile]:
+    """Return every file in *cache*; a volume's are listed by a container of *image*.
+
+    Raises:
+        RuntimeError: If the container fails.
+    """
+    if cache.backend != "volume":
+        return list(_walk(Path(cache.source)))
+    if not volume_exists(cache, runner=runner):
+        return []
+    result = runner(
+        _volume_command(cache, image, _LIST_SCRIPT, interactive=False),
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"Failed to list volume {cache.source}")
+    return [CacheFile(*json.loads(line)) for line in result.stdout.splitlines() if line]
+
+
+def remove_files(
+    cache: CacheMount, files: Sequence[CacheFile], image: str, runner=subprocess.run
+) -> None:
+    """Delete *files* from *cache*; a volume's are deleted by a container of *image*.
+
+    Raises:
+        RuntimeError: If the container fails.
+        OSError: If a file in a directory cache cannot be deleted.
+    """
+    if not files:
+        return
+    if cache.backend != "volume":
+        root = Path(cache.source)
+        for item in files:
+            (root / item.path).unlink(missing_ok=True)
+        return
+    result = runner(
+        _volume_command(cache, image, _REMOVE_SCRIPT, interactive=True),
+        input="\0".join(item.path for item in files),
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"Failed to prune volume {cache.source}")
@@ -1,24 +1,38 @@
 from __future__ import annotations
 
 import time
+from functools import partial
 from pathlib import Path
-from typing import Any, Iterable, Mapping, Sequence
+from typing import IO, TYPE_CHECKING, Any, Callable, Iterable, Mapping, Sequence, cast
 
 import click
-from pydantic import ValidationError
 
 from . import version_with_commit
-from .docker import reload_proxy, run_container
-from .profiles import (
-    ProfileManager,
-    choose_existing_default,
-    resolve_default_profile,
-    resolve_profile_for_run,
-    validate_profile_name,
+from .docker import (
+    build_run_command,
+    cache_host_dirs,
+    container_name,
+    ensure_host_paths,
+    exec_in_containers,
+    list_profile_containers,
+    proxy_stats,
+    reload_proxy,
+    run_command,
+    run_container,
 )
-from .settings import Settings, State, load_config, load_state, save_config, save_state
+from .fanout import DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT
 from .volumes import VolumeMount, normalize_host_path, parse_mount_spec
 
+# pydantic, pydantic-settings and PyYAML are imported inside the commands that
+# need them: importing them costs more than the rest of startup combined, and
+# things like shell completion or --version should not pay for it.
+if TYPE_CHECKING:
+    from .blocklist import CompileResult
+    from .caches import CacheMount
+    from .launch_plan import LaunchPlan
+    from .profiles import ProfileManager
+    from .settings import Settings, State, UpdateMode
+
 
 class AbbreviatingGroup(click.Group):
     """A Click group that allows commands to be abbreviated to unique prefixes.
@@ -56,6 +70,10 @@ class AbbreviatingGroup(click.Group):
 
 
 def _load_settings(overrides: Mapping[str, Any]) -> Settings:
+    from pydantic import ValidationError
+
+    from .settings import Settings
+
     try:
         return Settings(**overrides)
     except ValidationError as exc:
@@ -63,6 +81,8 @@ def _load_settings(overrides: Mapping[str, Any]) -> Settings:
 
 
 def _parse_profile(name: str) -> str:
+    from .profiles import validate_profile_name
+
     try:
         return validate_profile_name(name)
     except ValueError as exc:
@@ -71,6 +91,8 @@ def _parse_profile(name: str) -> str:
 
 def _resolve_profile_arg(name: str, manager: ProfileManager, state: State) -> str:
     """Resolve a profile argument, handling '-' as a shortcut for the default profile."""
+    from .profiles import resolve_default_profile
+
     if name == "-":
         try:
             return resolve_default_profile(manager, state)
@@ -111,8 +133,24 @@ def _delete_targets_from_volumes(
     return [volume for idx, volume in enumerate(remaining) if idx not in matches]
 
 
+def _print_version(ctx: click.Context, _param: click.Parameter, value: bool) -> None:
+    # Replaces click.version_option, which needs the version string (and so a
+    # git subprocess) at import time.
+    if not value or ctx.resilient_parsing:
+        return
+    click.echo(f"{ctx.find_root().info_name}, version {version_with_commit()}")
+    ctx.exit()
+
+
 @click.group(cls=AbbreviatingGroup)
-@click.version_option(version=version_with_commit(), package_name="llmbox")
+@click.option(
+    "--version",
+    is_flag=True,
+    expose_value=False,
+    is_eager=True,
+    callback=_print_version,
+    help="Show the version and exit.",
+)
 def cli() -> None:
     """Manage llm sandbox containers."""
 
@@ -134,6 +172,9 @@ def volume() -> None:
 @click.option("--force", is_flag=True, help="Allow host paths that do not exist yet.")
 @click.option("-g", "--global", "is_global", is_flag=True, help="Add to global volumes.")
 def volume_add(profile: str | None, mount: tuple[str, ...], force: bool, is_global: bool) -> None:
+    from .profiles import open_profile_manager
+    from .settings import State, load_config, save_config
+
     settings = _load_settings({})
 
     if is_global:
@@ -156,8 +197,8 @@ def volume_add(profile: str | None, mount: tuple[str, ...], force: bool, is_glob
     if not mount:
         raise click.UsageError("Missing argument 'MOUNT'.")
 
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
     profile_name = _resolve_profile_arg(profile, manager, state)
     try:
         data, created = manager.ensure(profile_name)
@@ -165,7 +206,7 @@ def volume_add(profile: str | None, mount: tuple[str, ...], force: bool, is_glob
         raise click.ClickException(str(exc)) from exc
     if created:
         click.echo(f"Creating profile {profile_name}")
-        save_state(settings.state_dir, State(default_profile=profile_name))
+        manager.save_state(State(default_profile=profile_name))
 
     cwd = Path.cwd()
     try:
@@ -182,6 +223,9 @@ def volume_add(profile: str | None, mount: tuple[str, ...], force: bool, is_glob
 @click.argument("profile", required=False, default=None)
 @click.option("-g", "--global", "is_global", is_flag=True, help="List global volumes.")
 def volume_list(profile: str | None, is_global: bool) -> None:
+    from .profiles import open_profile_manager
+    from .settings import load_config
+
     settings = _load_settings({})
 
     if is_global:
@@ -193,8 +237,8 @@ def volume_list(profile: str | None, is_global: bool) -> None:
     if profile is None:
         raise click.UsageError("Missing argument 'PROFILE'.")
 
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
     profile_name = _resolve_profile_arg(profile, manager, state)
     try:
         data = manager.load(profile_name)
@@ -213,6 +257,9 @@ volume.add_command(volume_list, name="ls")
 @click.argument("mount", nargs=-1)
 @click.option("-g", "--global", "is_global", is_flag=True, help="Remove from global volumes.")
 def volume_remove(profile: str | None, mount: tuple[str, ...], is_global: bool) -> None:
+    from .profiles import open_profile_manager
+    from .settings import load_config, save_config
+
     settings = _load_settings({})
 
     if is_global:
@@ -235,8 +282,8 @@ def volume_remove(profile: str | None, mount: tuple[str, ...], is_global: bool)
     if not mount:
         raise click.UsageError("Missing argument 'MOUNT'.")
 
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
     profile_name = _resolve_profile_arg(profile, manager, state)
     try:
         data = manager.load(profile_name)
@@ -259,9 +306,11 @@ def profile() -> None:
 
 @profile.command("list")
 def profile_list() -> None:
+    from .profiles import choose_existing_default, open_profile_manager
+
     settings = _load_settings({})
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
     profiles = manager.list_profiles()
     default_profile = choose_existing_default(profiles, state.default_profile)
 
@@ -276,8 +325,11 @@ profile.add_command(profile_list, name="ls")
 @profile.command("create")
 @click.argument("profile", required=False)
 def profile_create(profile: str | None) -> None:
+    from .profiles import open_profile_manager
+    from .settings import State
+
     settings = _load_settings({})
-    manager = ProfileManager(settings.config_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
 
     if profile is None:
         # Let Click surface usage by raising an error
@@ -297,16 +349,20 @@ def profile_create(profile: str | None) -> None:
         raise click.ClickException(str(exc)) from exc
 
     click.echo(f"Created profile {profile_name}")
-    save_state(settings.state_dir, State(default_profile=profile_name))
+    manager.save_state(State(default_profile=profile_name))
 
 
 @profile.command("remove")
 @click.argument("profile", nargs=-1, required=True)
 def profile_remove(profile: tuple[str, ...]) -> None:
+    from .profiles import fallback_default, open_profile_manager
+    from .settings import State
+
     settings = _load_settings({})
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
-    profiles = manager.list_profiles()
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
+    # Only numbered targets need the full listing
+    profiles = manager.list_profiles() if any(item.isdigit() for item in profile) else []
 
     def resolve(name: str) -> str:
         if name == "-":
@@ -324,16 +380,14 @@ def profile_remove(profile: tuple[str, ...]) -> None:
     except FileNotFoundError as exc:
         raise click.ClickException(str(exc)) from exc
 
-    remaining = manager.list_profiles()
     new_default = state.default_profile
     if state.default_profile in targets:
-        if remaining:
-            new_default = "default" if "default" in remaining else sorted(remaining)[0]
+        new_default = fallback_default(manager)
+        if new_default:
             click.echo(f"Default profile removed, new default profile is: {new_default}")
         else:
-            new_default = None
             click.echo("Default profile removed; no profiles remain, clearing default")
-        save_state(settings.state_dir, State(default_profile=new_default))
+        manager.save_state(State(default_profile=new_default))
 
 
 profile.add_command(profile_remove, name="rm")
@@ -343,9 +397,12 @@ profile.add_command(profile_remove, name="rm")
 @click.argument("old")
 @click.argument("new")
 def profile_rename(old: str, new: str) -> None:
+    from .profiles import open_profile_manager
+    from .settings import State
+
     settings = _load_settings({})
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
     old_name = _resolve_profile_arg(old, manager, state)
     new_name = _parse_profile(new)
     try:
@@ -354,16 +411,18 @@ def profile_rename(old: str, new: str) -> None:
         raise click.ClickException(str(exc)) from exc
 
     if state.default_profile == old_name:
-        save_state(settings.state_dir, State(default_profile=new_name))
+        manager.save_state(State(default_profile=new_name))
 
 
 @profile.command("copy")
 @click.argument("source")
 @click.argument("destination")
 def profile_copy(source: str, destination: str) -> None:
+    from .profiles import open_profile_manager
+
     settings = _load_settings({})
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
     src = _resolve_profile_arg(source, manager, state)
     dest = _parse_profile(destination)
     try:
@@ -375,15 +434,18 @@ def profile_copy(source: str, destination: str) -> None:
 @profile.command("set-default")
 @click.argument("profile")
 def profile_set_default(profile: str) -> None:
+    from .profiles import open_profile_manager
+    from .settings import State
+
     settings = _load_settings({})
-    manager = ProfileManager(settings.config_dir)
-    profiles = manager.list_profiles()
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
 
     if profile == "-":
         raise click.ClickException("Use an explicit profile name to set default")
 
     resolved = None
     if profile.isdigit():
+        profiles = manager.list_profiles()
         index = int(profile) - 1
         if index < 0 or index >= len(profiles):
             raise click.ClickException(f"Profile number {profile} is out of range")
@@ -393,25 +455,103 @@ def profile_set_default(profile: str) -> None:
         if not manager.exists(resolved):
             raise click.ClickException(f"Profile {resolved} does not exist")
 
-    save_state(settings.state_dir, State(default_profile=resolved))
+    manager.save_state(State(default_profile=resolved))
     click.echo(f"Default profile set to {resolved}")
 
 
+@profile.command("commit")
+@click.argument("profile", required=False, default="-")
+@click.option("-c", "--container", help="Container to commit (default: the newest one).")
+@click.option("--drop", is_flag=True, help="Remove the snapshot and use the base image again.")
+def profile_commit(profile: str, container: str | None, drop: bool) -> None:
+    """Snapshot a running container of PROFILE as the image it starts from.
+
+    Packages, logins and caches added in the container are then there on
+    every start.  Volumes, including ~/.persist, are not part of the
+    snapshot.  It is discarded automatically when the base image changes.
+    """
+    import subprocess
+
+    from .profiles import ProfileSnapshot, open_profile_manager
+    from .snapshots import commit, image_id, profile_containers, remove, snapshot_tag
+
+    settings = _load_settings({})
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    name = _resolve_profile_arg(profile, manager, manager.load_state())
+    try:
+        data = manager.load(name)
+    except (FileNotFoundError, ValueError) as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    if drop:
+        if data.snapshot is None:
+            click.echo(f"Profile {name} has no snapshot")
+            return
+        remove(data.snapshot.image)
+        data.snapshot = None
+        manager.save(name, data)
+        click.echo(f"Profile {name} starts from {settings.image_name} again")
+        return
+
+    try:
+        if container is None:
+            running = profile_containers(name)
+            if not running:
+                raise click.ClickException(f"No running container for profile {name}")
+            container = running[0][0]
+            if len(running) > 1:
+                click.echo(f"Committing {running[0][1]}, the newest of {len(running)} containers")
+        base_id = image_id(settings.image_name)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    if base_id is None:
+        raise click.ClickException(f"Image {settings.image_name} does not exist")
+
+    tag = snapshot_tag(name)
+    try:
+        commit(container, tag, base_id)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    except subprocess.CalledProcessError as exc:
+        raise click.ClickException(f"docker commit failed: {(exc.stderr or '').strip()}") from exc
+    data.snapshot = ProfileSnapshot(image=tag, base_image=settings.image_name, base_id=base_id)
+    manager.save(name, data)
+    click.echo(f"Profile {name} now starts from {tag}")
+
+
 @cli.group(cls=AbbreviatingGroup)
 def proxy() -> None:
     """Manage proxy settings."""
 
 
-@proxy.command("reload")
-@click.argument("profile")
-def proxy_reload(profile: str) -> None:
+def _resolve_container_scope(profile: str | None, all_profiles: bool) -> str | None:
+    """Return the profile whose containers to target, or None for every profile."""
+    from .profiles import open_profile_manager
+
+    if all_profiles:
+        if profile is not None:
+            raise click.UsageError("Give a profile or --all, not both")
+        return None
     settings = _load_settings({})
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
-    profile_name = _resolve_profile_arg(profile, manager, state)
-    containers, failures = reload_proxy(profile_name)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    return _resolve_profile_arg(profile or "-", manager, manager.load_state())
+
+
+@proxy.command("reload")
+@click.argument("profile", required=False, default=None)
+@click.option(
+    "-a", "--all", "all_profiles", is_flag=True, help="Reload every running llmbox container."
+)
+def proxy_reload(profile: str | None, all_profiles: bool) -> None:
+    if profile is None and not all_profiles:
+        raise click.UsageError("Give a profile or --all")
+    profile_name = _resolve_container_scope(profile, all_profiles)
+    try:
+        containers, failures = reload_proxy(profile_name)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
     if not containers:
-        click.echo("Warning: no running containers for this profile")
+        click.echo("Warning: no running containers" + ("" if all_profiles else " for this profile"))
         return
 
     if failures:
@@ -423,25 +563,713 @@ def proxy_reload(profile: str) -> None:
         raise click.ClickException("Proxy reload failed")
 
 
+PROXY_STATS_COLUMNS = ("requests", "denied", "failed", "open", "sent", "received")
+
+
+@proxy.command("stats")
+@click.argument("profile", required=False, default=None)
+@click.option("-a", "--all", "all_profiles", is_flag=True, help="Every running llmbox container.")
+@click.option(
+    "-n",
+    "--top",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Hosts to show per container, by requests.",
+)
+def proxy_stats_command(profile: str | None, all_profiles: bool, top: int) -> None:
+    """Show per-host request and byte counters from llmproxy.
+
+    Only containers whose proxy engine is llmproxy keep counters; see
+    ``llmbox config proxy --engine``.  sent and received are bytes relayed
+    to and from each host.
+    """
+    profile_name = _resolve_container_scope(profile, all_profiles)
+    try:
+        stats, failures = proxy_stats(profile_name)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    if not stats and not failures:
+        click.echo("Warning: no running containers" + ("" if all_profiles else " for this profile"))
+        return
+
+    for container, snapshot in stats.items():
+        hosts = sorted(
+            snapshot.get("hosts", {}).items(), key=lambda item: item[1]["requests"], reverse=True
+        )
+        click.echo(
+            f"{container}: {snapshot.get('clients', 0)} clients,"
+            f" {snapshot.get('domain_entries', 0)} domain entries,"
+            f" {snapshot.get('regexes', 0)} regexes"
+        )
+        width = max([len("host"), *(len(host) for host, _ in hosts[:top])])
+        click.echo(f"  {'host':<{width}}" + "".join(f"{c:>10}" for c in PROXY_STATS_COLUMNS))
+        for host, counters in hosts[:top]:
+            values = "".join(f"{counters.get(c, 0):>10}" for c in PROXY_STATS_COLUMNS)
+            click.echo(f"  {host:<{width}}{values}")
+    for container, detail in failures:
+        click.echo(f"Error: no proxy stats from container {container}: {detail}", err=True)
+    if failures and not stats:
+        raise click.ClickException("No proxy stats")
+
+
+@cli.group(cls=AbbreviatingGroup)
+def cache() -> None:
+    """Manage the package-manager caches mounted into containers."""
+
+
+def _selected_caches(names: Sequence[str]) -> tuple[Settings, list[CacheMount], dict[str, int]]:
+    """Return the settings, the caches called *names* (all if empty) and their size caps."""
+    from .settings import load_config
+
+    settings = _load_settings({})
+    cfg = load_config(settings.config_dir)
+    unknown = sorted(set(names) - set(cfg.caches))
+    if unknown:
+        raise click.BadParameter(f"No such cache: {', '.join(unknown)}", param_hint="NAME")
+    caches = [mount for mount in cfg.cache_mounts() if not names or mount.name in names]
+    limits = {
+        name: cache.max_size for name, cache in cfg.caches.items() if cache.max_size is not None
+    }
+    return settings, caches, limits
+
+
+@cache.command("ls")
+@click.argument("names", metavar="[NAME]...", nargs=-1)
+def cache_ls(names: tuple[str, ...]) -> None:
+    """Show each cache's size and when it was last used.
+
+    Volume-backed caches are measured by a throwaway container.
+    """
+    from .caches import format_size, list_files
+
+    settings, caches, limits = _selected_caches(names)
+    rows: list[tuple[str, ...]] = []
+    for mount in caches:
+        try:
+            files = list_files(mount, settings.image_name)
+        except RuntimeError as exc:
+            raise click.ClickException(f"Cache {mount.name}: {exc}") from exc
+        size = sum(item.size for item in files)
+        used = max((item.used for item in files), default=None)
+        limit = limits.get(mount.name)
+        rows.append(
+            (
+                mount.name,
+                mount.backend,
+                mount.target,
+                format_size(size) + (f" of {format_size(limit)}" if limit else ""),
+                str(len(files)),
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(used)) if used else "-",
+            )
+        )
+    header = ("name", "backend", "target", "size", "files", "last used")
+    widths = [max(len(row[index]) for row in [header, *rows]) for index in range(len(header))]
+    for row in [header, *rows]:
+        click.echo("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+
+@cache.command("prune")
+@click.argument("names", metavar="[NAME]...", nargs=-1)
+@click.option("--max-size", help="Trim each cache to this size, e.g. 2G (default: its max_size).")
+@click.option("--all", "prune_all", is_flag=True, help="Empty the caches.")
+def cache_prune(names: tuple[str, ...], max_size: str | None, prune_all: bool) -> None:
+    """Remove the least recently used files from the caches.
+
+    Without --max-size or --all, caches trim to the max_size set for them in
+    config.yaml, and caches without one are left alone.
+    """
+    from .caches import format_size, least_recently_used, list_files, parse_size, remove_files
+
+    if max_size is not None and prune_all:
+        raise click.UsageError("Give --max-size or --all, not both")
+    try:
+        size_limit = 0 if prune_all else parse_size(max_size) if max_size else None
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--max-size") from exc
+    settings, caches, limits = _selected_caches(names)
+    for mount in caches:
+        limit = limits.get(mount.name) if size_limit is None else size_limit
+        if limit is None:
+            click.echo(f"{mount.name}: no max_size set; skipped")
+            continue
+        try:
+            doomed = least_recently_used(list_files(mount, settings.image_name), limit)
+            remove_files(mount, doomed, settings.image_name)
+        except (RuntimeError, OSError) as exc:
+            raise click.ClickException(f"Cache {mount.name}: {exc}") from exc
+        freed = sum(item.size for item in doomed)
+        click.echo(f"{mount.name}: removed {len(doomed)} file(s), {format_size(freed)}")
+
+
+@cli.group("cache-proxy", cls=AbbreviatingGroup)
+def cache_proxy() -> None:
+    """Run and manage the host's shared package cache."""
+
+
+@cache_proxy.command("serve")
+@click.option("--bind", help="Address to listen on (default: cache_proxy.bind).")
+@click.option("--port", type=click.IntRange(1, 65535), help="Port (default: cache_proxy.port).")
+@click.option("-q", "--quiet", is_flag=True, help="Do not log requests.")
+def cache_proxy_serve(bind: str | None, port: int | None, quiet: bool) -> None:
+    """Serve the package cache until interrupted.
+
+    Containers use it once ``llmbox config cache-proxy --enable`` is set.
+    It must listen where they can reach it as host.docker.internal, so it
+    binds to docker_host_ip when that is configured, and otherwise to the
+    gateway of Docker's default bridge, which host.docker.internal maps to.
+    Where that address does not exist on the host (Docker Desktop), it
+    falls back to 127.0.0.1.
+    """
+    from .cache_proxy import CacheProxy, CacheProxyServer, CacheStore, cache_proxy_dir
+    from .docker import bridge_gateway
+    from .settings import load_config
+
+    settings = _load_settings({})
+    cfg = load_config(settings.config_dir)
+    options = cfg.cache_proxy
+    port = port or options.port
+    configured = bind or options.bind or (str(cfg.docker_host_ip) if cfg.docker_host_ip else None)
+    hosts = [configured] if configured else [*filter(None, [bridge_gateway()]), "127.0.0.1"]
+    store = CacheStore(cache_proxy_dir(), options.max_size)
+    proxy = CacheProxy(store, options.mirrors, options.metadata_ttl)
+    server = None
+    for host in hosts:
+        try:
+            server = CacheProxyServer((host, port), proxy, quiet=quiet)
+            break
+        except OSError as exc:
+            click.echo(f"Cannot listen on {host}:{port}: {exc}", err=True)
+    if server is None:
+        store.close()
+        raise click.ClickException(f"Cannot listen on port {port} of {', '.join(hosts)}")
+    host = server.server_address[0]
+    if not configured and host == "127.0.0.1":
+        click.echo(
+            "Warning: listening on 127.0.0.1 only; containers may not reach it."
+            " Set docker_host_ip or cache_proxy.bind to the address of host.docker.internal.",
+            err=True,
+        )
+    click.echo(f"Package cache on http://{host}:{server.server_address[1]}/ in {store.root}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+        counters = ", ".join(f"{name} {count}" for name, count in proxy.counters.items())
+        click.echo(f"Stopped; {counters}")
+
+
+@cache_proxy.command("status")
+def cache_proxy_status() -> None:
+    """Show how much the package cache holds."""
+    from .cache_proxy import CacheStore, cache_proxy_dir
+    from .caches import format_size
+    from .settings import load_config
+
+    settings = _load_settings({})
+    options = load_config(settings.config_dir).cache_proxy
+    store = CacheStore(cache_proxy_dir(), options.max_size)
+    try:
+        entries, size = store.usage()
+    finally:
+        store.close()
+    click.echo(f"Store: {store.root}")
+    click.echo(f"Entries: {entries}")
+    click.echo(f"Size: {format_size(size)} of {format_size(options.max_size)}")
+    click.echo(f"Containers use it: {'yes' if options.enabled else 'no'}")
+
+
+@cache_proxy.command("prune")
+@click.option("--max-size", help="Evict down to this size, e.g. 5G (default: the cap).")
+@click.option("--all", "prune_all", is_flag=True, help="Empty the cache.")
+def cache_proxy_prune(max_size: str | None, prune_all: bool) -> None:
+    """Evict the least recently used downloads."""
+    from .cache_proxy import CacheStore, cache_proxy_dir
+    from .caches import format_size, parse_size
+    from .settings import load_config
+
+    settings = _load_settings({})
+    options = load_config(settings.config_dir).cache_proxy
+    try:
+        limit = 0 if prune_all else parse_size(max_size) if max_size else options.max_size
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--max-size") from exc
+    store = CacheStore(cache_proxy_dir(), options.max_size)
+    try:
+        removed, freed = store.evict(limit)
+    finally:
+        store.close()
+    click.echo(f"Removed {removed} download(s), {format_size(freed)}")
+
+
+@cli.command("exec")
+@click.option("-p", "--profile", "profile", help="Profile whose containers to target.")
+@click.option(
+    "-a", "--all", "all_profiles", is_flag=True, help="Target every running llmbox container."
+)
+@click.option(
+    "-t",
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_TIMEOUT,
+    show_default=True,
+    help="Seconds to wait for each container.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_WORKERS,
+    show_default=True,
+    help="Containers to run in parallel.",
+)
+@click.argument("command", nargs=-1, required=True)
+def exec_command(
+    profile: str | None,
+    all_profiles: bool,
+    timeout: float,
+    jobs: int,
+    command: tuple[str, ...],
+) -> None:
+    """Run COMMAND in running containers (the default profile's unless given).
+
+    Put `--` before COMMAND if it has options of its own.  Output lines are
+    prefixed with the container ID.
+    """
+    profile_name = _resolve_container_scope(profile, all_profiles)
+    try:
+        containers = list_profile_containers(profile_name)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    if not containers:
+        click.echo("Warning: no running containers" + ("" if all_profiles else " for this profile"))
+        return
+
+    outcomes = exec_in_containers(containers, command, timeout=timeout, max_workers=jobs)
+    failed = 0
+    for outcome in outcomes:
+        if outcome.value is None:
+            failed += 1
+            click.echo(f"Error: {outcome.target}: {outcome.error}", err=True)
+            continue
+        for line in outcome.value.stdout.splitlines():
+            click.echo(f"{outcome.target}: {line}")
+        for line in outcome.value.stderr.splitlines():
+            click.echo(f"{outcome.target}: {line}", err=True)
+        if outcome.value.returncode != 0:
+            failed += 1
+            click.echo(
+                f"Error: {outcome.target}: exited with status {outcome.value.returncode}", err=True
+            )
+    if failed:
+        raise click.ClickException(f"Command failed in {failed} of {len(outcomes)} containers")
+
+
+@cli.group(cls=AbbreviatingGroup)
+def blocklist() -> None:
+    """Manage the proxy blocklist."""
+
+
+def _profile_filter_dir(
+    config_dir: Path, profile: str, mode: str, entries: Sequence[str]
+) -> Path | None:
+    """Build the layered filter directory for a profile's blocklist policy, if it has one."""
+    if mode == "inherit":
+        return None
+    from .blocklist_layers import profile_filter_dir
+
+    try:
+        return profile_filter_dir(config_dir, profile, mode, entries)
+    except (OSError, ValueError) as exc:
+        raise click.ClickException(f"Blocklist for profile {profile}: {exc}") from exc
+
+
+def _refresh_extended_profiles(settings: Settings) -> None:
+    """Rebuild the filters of profiles that layer entries over the global blocklist."""
+    from .blocklist_layers import blocklists_dir
+    from .profiles import open_profile_manager
+
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    for name in manager.list_profiles():
+        # Profiles that have never been launched have nothing to refresh.
+        if not (blocklists_dir() / "profiles" / name).is_dir():
+            continue
+        policy = manager.load(name).blocklist
+        if policy.mode == "extend":
+            _profile_filter_dir(settings.config_dir, name, policy.mode, policy.entries)
+
+
+def _compile_blocklist(settings: Settings) -> CompileResult:
+    from .blocklist import compile_blocklist
+
+    try:
+        result = compile_blocklist(settings.config_dir)
+    except (OSError, ValueError) as exc:
+        raise click.ClickException(str(exc)) from exc
+    _refresh_extended_profiles(settings)
+    source = result.source
+    click.echo(
+        f"Compiled {len(source.domains) + len(source.subdomains)} domains"
+        f" ({result.redundant} redundant) and {len(source.regexes)} regexes"
+        f" into {len(result.patterns)} patterns: {result.output_path}"
+    )
+    return result
+
+
+@blocklist.command("compile")
+@click.option(
+    "-b", "--benchmark", is_flag=True, help="Compare per-request match cost before and after."
+)
+def blocklist_compile(benchmark: bool) -> None:
+    """Compile blocklist.txt and the managed domains into the proxy filter file.
+
+    Domains are deduplicated, suffix-factored and grouped by TLD so tinyproxy
+    evaluates a few patterns per request instead of one per domain.
+    """
+    from .blocklist import benchmark as run_benchmark
+
+    settings = _load_settings({})
+    result = _compile_blocklist(settings)
+    if benchmark:
+        source = result.source
+        before, after = run_benchmark(source, result.patterns)
+        entries = len(source.regexes) + len(source.domains) + len(source.subdomains)
+        click.echo(
+            f"Per-request match cost: {before * 1e6:.1f}us -> {after * 1e6:.1f}us"
+            f" ({entries} -> {len(result.patterns)} patterns)"
+        )
+
+
+def _parse_domains(entries: Iterable[str]) -> list[str]:
+    from .blocklist_store import normalize_domain
+
+    parsed: list[str] = []
+    for entry in entries:
+        normalized = normalize_domain(entry)
+        if normalized is None:
+            raise click.ClickException(
+                f"Not a domain: {entry} (add regexes to blocklist.txt instead)"
+            )
+        parsed.append(normalized)
+    return parsed
+
+
+@blocklist.command("add")
+@click.argument("domains", nargs=-1, required=True)
+def blocklist_add(domains: tuple[str, ...]) -> None:
+    """Block DOMAINS (example.com, or *.example.com for subdomains only)."""
+    from .blocklist import managed_domains_path
+    from .blocklist_store import update_set
+
+    entries = _parse_domains(domains)
+    settings = _load_settings({})
+    try:
+        result = update_set(managed_domains_path(settings.config_dir), add=entries)
+    except OSError as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo(f"Added {result.added} domains ({result.total} managed)")
+    if result.added:
+        _compile_blocklist(settings)
+
+
+@blocklist.command("remove")
+@click.argument("domains", nargs=-1, required=True)
+def blocklist_remove(domains: tuple[str, ...]) -> None:
+    """Stop blocking DOMAINS added with add or import."""
+    from .blocklist import blocklist_source_path, managed_domains_path, parse_source
+    from .blocklist_store import update_set
+
+    entries = _parse_domains(domains)
+    settings = _load_settings({})
+    try:
+        result = update_set(managed_domains_path(settings.config_dir), remove=set(entries))
+    except OSError as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo(f"Removed {result.removed} domains ({result.total} managed)")
+
+    source_path = blocklist_source_path(settings.config_dir)
+    if source_path.exists():
+        with source_path.open() as handle:
+            source = parse_source(handle)
+        for entry in entries:
+            name = entry.removeprefix("*.")
+            if name in (source.subdomains if entry.startswith("*.") else source.domains):
+                click.echo(f"Warning: {entry} is also listed in {source_path}")
+    if result.removed:
+        _compile_blocklist(settings)
+
+
+@blocklist.command("import")
+@click.argument("files", nargs=-1, required=True, type=click.File("r"))
+@click.option(
+    "-f",
+    "--format",
+    "input_format",
+    type=click.Choice(["auto", "hosts", "domains"]),
+    default="auto",
+    show_default=True,
+    help="Input format; auto treats lines starting with an IP address as hosts entries.",
+)
+@click.option("--no-compile", is_flag=True, help="Only update the domain set.")
+def blocklist_import(files: tuple[IO[str], ...], input_format: str, no_compile: bool) -> None:
+    """Add every domain in FILES (hosts files or one domain per line; - for stdin)."""
+    from .blocklist import managed_domains_path
+    from .blocklist_store import ImportStats, iter_import, update_set
+
+    settings = _load_settings({})
+    stats = ImportStats()
+    entries = iter_import(files, input_format, stats)
+    try:
+        result = update_set(managed_domains_path(settings.config_dir), add=entries)
+    except OSError as exc:
+        raise click.ClickException(str(exc)) from exc
+    message = f"Imported {stats.read} entries: {result.added} new ({result.total} managed)"
+    if stats.rejected:
+        message += f", skipped {stats.rejected} lines that were not domains"
+    click.echo(message)
+    if result.added and not no_compile:
+        _compile_blocklist(settings)
+
+
+@blocklist.command("list")
+@click.argument("match", required=False)
+def blocklist_list(match: str | None) -> None:
+    """List blocklist entries, optionally only those containing MATCH.
+
+    Entries from blocklist.txt come first, then the managed domains.
+    """
+    from .blocklist import blocklist_source_path, managed_domains_path, parse_entry
+    from .blocklist_store import iter_entries
+
+    settings = _load_settings({})
+    source_path = blocklist_source_path(settings.config_dir)
+    lines: Iterable[str] = []
+    if source_path.exists():
+        lines = source_path.read_text().splitlines()
+    for line in lines:
+        entry = parse_entry(line)
+        if entry is None:
+            continue
+        kind, value = entry
+        text = {"domain": value, "subdomains": f"*.{value}", "regex": f"re:{value}"}[kind]
+        if match is None or match in text:
+            click.echo(text)
+    for text in iter_entries(managed_domains_path(settings.config_dir)):
+        if match is None or match in text:
+            click.echo(text)
+
+
+def _echo_volumes(volumes: Iterable[tuple[str, str]]) -> None:
+    for host_path, container_path in volumes:
+        host = click.style(host_path, fg="cyan")
+        container = click.style(container_path, fg="green")
+        click.echo(f"  {host} -> {container}")
+
+
+def _prepare_launch(
+    settings: Settings, manager: ProfileManager, name: str, key: str, args: Sequence[str]
+) -> tuple[LaunchPlan, bool, Callable[[], object]]:
+    """Load or build the launch plan for *name* and create the host paths it mounts.
+
+    Returns the plan, whether it came from the cache, and a callable that
+    starts a container from it.
+    """
+    from .launch_plan import LaunchPlan, load_plan, plan_file_path, save_plan
+    from .settings import load_config
+
+    plan_path = plan_file_path(settings.state_dir, name)
+    plan = load_plan(plan_path, key)
+    if plan is not None:
+        ensure_host_paths(settings.config_dir, plan.persist_dir, plan.cache_dirs)
+        # The plan key does not cover the global blocklist, which an
+        # ``extend`` policy layers over; this rebuilds only if it changed.
+        _profile_filter_dir(settings.config_dir, name, plan.blocklist_mode, plan.blocklist_entries)
+        return plan, True, partial(run_command, plan.command_for(container_name(name)))
+
+    try:
+        data = manager.load(name)
+    except (FileNotFoundError, ValueError) as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    config = load_config(settings.config_dir)
+    global_volumes = [
+        parse_mount_spec(s, cwd=Path.home(), allow_missing=True) for s in config.volumes
+    ]
+    persist_dir = data.persist_dir or config.persist_dir
+    caches = config.cache_mounts()
+    update_ttl = config.update_ttl if data.update_ttl is None else data.update_ttl
+    environment = {
+        "LLM_PROFILE": name,
+        "LLM_UPDATE_TTL": str(update_ttl),
+        "LLM_UPDATE_MODE": data.update_mode or config.update_mode,
+        "LLM_HISTORY_MAX_ENTRIES": str(config.history_max_entries),
+    }
+    if config.history_shards:
+        environment["LLM_HISTORY_SHARDS"] = "1"
+    if config.history_max_age_days:
+        environment["LLM_HISTORY_MAX_AGE_DAYS"] = str(config.history_max_age_days)
+    # Saves the container from detecting them; see llm-init.py.
+    if config.docker_subnet:
+        environment["LLM_DOCKER_SUBNET"] = str(config.docker_subnet)
+    if config.docker_host_ip:
+        environment["LLM_DOCKER_HOST_IP"] = str(config.docker_host_ip)
+    environment.update(data.proxy.over(config.proxy).environment())
+    environment.update(config.cache_proxy.environment())
+    policy = data.blocklist
+    # A snapshot only stands in for the image it was committed from.
+    snapshot = data.snapshot
+    if snapshot is not None and snapshot.base_image != settings.image_name:
+        snapshot = None
+    image_name = snapshot.image if snapshot else settings.image_name
+    filter_dir = _profile_filter_dir(settings.config_dir, name, policy.mode, policy.entries)
+
+    command_line, container = build_run_command(
+        image_name,
+        name,
+        global_volumes,
+        data.volumes,
+        list(args),
+        settings.config_dir,
+        persist_dir=persist_dir,
+        filter_dir=filter_dir,
+        environment=environment,
+        caches=caches,
+    )
+    plan = LaunchPlan.from_command(
+        key,
+        command_line,
+        container,
+        persist_dir,
+        global_volumes,
+        data.volumes,
+        blocklist_mode=policy.mode,
+        blocklist_entries=policy.entries,
+        pool_size=data.pool_size,
+        snapshot_image=snapshot.image if snapshot else None,
+        snapshot_base_id=snapshot.base_id if snapshot else None,
+        cache_dirs=cache_host_dirs(caches, [*global_volumes, *data.volumes]),
+    )
+    save_plan(plan_path, plan)
+    launch = partial(
+        run_container,
+        image_name,
+        name,
+        global_volumes,
+        data.volumes,
+        list(args),
+        settings.config_dir,
+        persist_dir=persist_dir,
+        filter_dir=filter_dir,
+        environment=environment,
+        caches=caches,
+    )
+    return plan, False, launch
+
+
+def _discard_stale_snapshot(
+    settings: Settings, manager: ProfileManager, name: str, plan: LaunchPlan
+) -> bool:
+    """Drop *name*'s snapshot if its base image changed; returns whether it did.
+
+    The profile then starts from the base image until it is committed again.
+    """
+    from .snapshots import is_current, remove
+
+    if plan.snapshot_image is None or plan.snapshot_base_id is None:
+        return False
+    try:
+        if is_current(plan.snapshot_image, settings.image_name, plan.snapshot_base_id):
+            return False
+    except RuntimeError as exc:
+        click.echo(f"Cannot check snapshot {plan.snapshot_image}: {exc}", err=True)
+        return False
+    data = manager.load(name)
+    data.snapshot = None
+    manager.save(name, data)
+    remove(plan.snapshot_image)
+    click.echo(
+        f"Image {settings.image_name} changed; discarded snapshot {plan.snapshot_image}."
+        " Run `llmbox profile commit` to snapshot the profile again.",
+        err=True,
+    )
+    return True
+
+
+def _run_timed(settings: Settings, name: str, plan: LaunchPlan) -> None:
+    """Launch *plan* with entrypoint phase marks enabled and print the startup breakdown."""
+    import subprocess
+    import tempfile
+
+    from .timings import (
+        HISTORY_FILE,
+        MARKS_FILE,
+        breakdown,
+        format_breakdown,
+        read_marks,
+        record,
+        run_timed,
+        timed_command,
+    )
+
+    container = container_name(name)
+    # Under the state directory rather than /tmp, which Docker Desktop does not share.
+    timings_dir = settings.state_dir / "timings"
+    timings_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(
+        dir=timings_dir, prefix="run-", ignore_cleanup_errors=True
+    ) as tmp:
+        # Created here so the file stays ours (and removable) after root in
+        # the container appends to it.
+        marks_path = Path(tmp) / MARKS_FILE
+        marks_path.touch()
+        marks_path.chmod(0o666)
+        command = timed_command(plan.command_for(container), plan.name_index, Path(tmp))
+        host = run_timed(command)
+        rows = breakdown(host, read_marks(marks_path))
+    click.echo(format_breakdown(rows))
+    record(settings.state_dir / HISTORY_FILE, name, container, rows)
+    if host.returncode != 0:
+        raise subprocess.CalledProcessError(host.returncode, command)
+
+
 @cli.command()
 @click.option("-i", "--image", "image_name", help="Container image to run.")
 @click.option("-n", "--dry-run", is_flag=True, help="Print docker command without running it.")
+@click.option("--explain", is_flag=True, help="Show whether the cached launch plan was used.")
+@click.option(
+    "--timings", is_flag=True, help="Start a cold container and print where startup time went."
+)
 @click.argument("profile", required=False)
 @click.argument("args", nargs=-1)
-def run(image_name: str | None, dry_run: bool, profile: str | None, args: tuple[str, ...]) -> None:
+def run(
+    image_name: str | None,
+    dry_run: bool,
+    explain: bool,
+    timings: bool,
+    profile: str | None,
+    args: tuple[str, ...],
+) -> None:
+    from .launch_plan import plan_file_path, plan_key
+    from .profiles import open_profile_manager, resolve_profile_for_run
+    from .settings import State
+
     overrides: dict[str, object] = {}
     if image_name:
         overrides["image_name"] = image_name
 
     settings = _load_settings(overrides)
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
 
     requested_profile = None if profile in (None, "-") else profile
     try:
         name, created, new_default, reassigned = resolve_profile_for_run(
             manager, state, requested_profile
         )
+        fingerprint = manager.fingerprint(name)
     except (FileNotFoundError, ValueError) as exc:
         raise click.ClickException(str(exc)) from exc
     if created:
@@ -449,60 +1277,258 @@ def run(image_name: str | None, dry_run: bool, profile: str | None, args: tuple[
     if reassigned and not created and new_default:
         click.echo(f"Default profile missing; switching default to {new_default}")
 
-    try:
-        data = manager.load(name)
-    except (FileNotFoundError, ValueError) as exc:
-        raise click.ClickException(str(exc)) from exc
+    # A launch plan is the finished docker command for this exact profile,
+    # config, image and args; on a hit we skip validation and path resolution.
+    key = plan_key(settings.config_dir, fingerprint, settings.image_name, args)
+    plan, cache_hit, launch = _prepare_launch(settings, manager, name, key, args)
+    if _discard_stale_snapshot(settings, manager, name, plan):
+        key = plan_key(settings.config_dir, manager.fingerprint(name), settings.image_name, args)
+        plan, cache_hit, launch = _prepare_launch(settings, manager, name, key, args)
 
-    config = load_config(settings.config_dir)
-    global_volumes = [
-        parse_mount_spec(s, cwd=Path.home(), allow_missing=True) for s in config.volumes
-    ]
-    persist_dir = data.persist_dir or config.persist_dir
+    if explain:
+        status = "hit" if cache_hit else "miss (rebuilt)"
+        plan_path = plan_file_path(settings.state_dir, name)
+        click.echo(f"Launch plan: {status}, key {key[:12]}, {plan_path}")
 
     click.echo(f"Using profile {click.style(name, bold=True)}")
-    if global_volumes:
+    if plan.global_volumes:
         click.echo("Global volumes:")
-        for vol in global_volumes:
-            host = click.style(str(vol.host), fg="cyan")
-            container = click.style(str(vol.container), fg="green")
-            click.echo(f"  {host} -> {container}")
-    if data.volumes:
-        for vol in data.volumes:
-            host = click.style(str(vol.host), fg="cyan")
-            container = click.style(str(vol.container), fg="green")
-            click.echo(f"  {host} -> {container}")
-    if not global_volumes and not data.volumes:
+        _echo_volumes(plan.global_volumes)
+    if plan.volumes:
+        _echo_volumes(plan.volumes)
+    if not plan.global_volumes and not plan.volumes:
         click.echo(click.style("Warning: profile has no volumes", fg="yellow", bold=True))
         time.sleep(1)
 
-    from .docker import build_run_command
-
-    command_line, _ = build_run_command(
-        settings.image_name,
-        name,
-        global_volumes,
-        data.volumes,
-        list(args),
-        settings.config_dir,
-        persist_dir=persist_dir,
-    )
-
     if dry_run:
+        command_line = plan.command_for(container_name(name))
         click.echo(" ".join(str(part) for part in command_line))
         return
 
-    run_container(
-        settings.image_name,
-        name,
-        global_volumes,
-        data.volumes,
-        list(args),
-        settings.config_dir,
-        persist_dir=persist_dir,
-    )
+    # Warm containers are started from the plain plan; extra docker args
+    # always get a cold launch.
+    if timings:
+        launch = partial(_run_timed, settings, name, plan)
+    elif plan.pool_size and not args:
+        from .pool import claim, run_session, spawn_fill
+
+        try:
+            claimed = claim(name, key, container_name(name), time.time())
+        except RuntimeError as exc:
+            click.echo(f"Warm pool unavailable: {exc}", err=True)
+            claimed = None
+        if explain:
+            click.echo(f"Warm pool: {f'claimed {claimed}' if claimed else 'no ready container'}")
+        if claimed:
+            launch = partial(run_session, claimed)
+        spawn_fill(name)
+
+    launch()
     if new_default:
-        save_state(settings.state_dir, State(default_profile=new_default))
+        manager.save_state(State(default_profile=new_default))
+
+
+@cli.group(cls=AbbreviatingGroup)
+def pool() -> None:
+    """Manage warm container pools."""
+
+
+@pool.command("size")
+@click.argument("profile")
+@click.argument("size", required=False, type=click.IntRange(min=0))
+def pool_size(profile: str, size: int | None) -> None:
+    """Show or set how many warm containers to keep for PROFILE (0 disables the pool)."""
+    from .profiles import open_profile_manager
+
+    settings = _load_settings({})
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    profile_name = _resolve_profile_arg(profile, manager, manager.load_state())
+    try:
+        data = manager.load(profile_name)
+    except (FileNotFoundError, ValueError) as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    if size is None:
+        click.echo(data.pool_size)
+        return
+    data.pool_size = size
+    manager.save(profile_name, data)
+    click.echo(f"Pool size for profile {profile_name} set to {size}")
+
+
+@pool.command("fill")
+@click.argument("profile", required=False, default="-")
+@click.option("-q", "--quiet", is_flag=True, help="Only report errors.")
+@click.option("-w", "--wait", is_flag=True, help="Wait until the new containers are ready.")
+def pool_fill(profile: str, quiet: bool, wait: bool) -> None:
+    """Start warm containers for PROFILE up to its pool size.
+
+    Retires containers that outlived pool_ttl or were started from an older
+    version of the profile.  `llmbox run` does this in the background.
+    """
+    from .launch_plan import plan_key
+    from .pool import READY_TIMEOUT, fill, fill_lock, pool_lock_path, wait_ready
+    from .profiles import open_profile_manager
+    from .settings import load_config
+
+    settings = _load_settings({})
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    name = _resolve_profile_arg(profile, manager, manager.load_state())
+    try:
+        fingerprint = manager.fingerprint(name)
+    except FileNotFoundError as exc:
+        raise click.ClickException(str(exc)) from exc
+    key = plan_key(settings.config_dir, fingerprint, settings.image_name, ())
+    plan, _, _ = _prepare_launch(settings, manager, name, key, ())
+    if _discard_stale_snapshot(settings, manager, name, plan):
+        key = plan_key(settings.config_dir, manager.fingerprint(name), settings.image_name, ())
+        plan, _, _ = _prepare_launch(settings, manager, name, key, ())
+    ttl = load_config(settings.config_dir).pool_ttl
+
+    with fill_lock(pool_lock_path(settings.state_dir, name)) as locked:
+        if not locked:
+            if not quiet:
+                click.echo(f"The pool for profile {name} is already being filled")
+            return
+        started_at = time.time()
+        try:
+            result = fill(name, key, plan.command, plan.name_index, plan.pool_size, ttl, started_at)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+
+    if not quiet:
+        click.echo(f"Started {len(result.started)}, retired {len(result.retired)}")
+    for container, detail in result.failures:
+        click.echo(f"Error: {container}: {detail}", err=True)
+    if result.failures:
+        raise click.ClickException(f"Pool fill failed for {len(result.failures)} containers")
+    if wait and result.started:
+        try:
+            unready = wait_ready(name, result.started, started_at)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+        if unready:
+            raise click.ClickException(
+                f"Not ready (exited or still starting after {READY_TIMEOUT:.0f}s): "
+                + ", ".join(unready)
+            )
+        if not quiet:
+            click.echo(f"{len(result.started)} containers ready")
+
+
+@pool.command("status")
+@click.argument("profile", required=False, default=None)
+def pool_status(profile: str | None) -> None:
+    """List unclaimed warm containers, for PROFILE or every profile."""
+    from .pool import list_members
+
+    profile_name = _resolve_container_scope(profile, profile is None)
+    try:
+        members = list_members(profile_name)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    now = time.time()
+    for member in sorted(members, key=lambda member: (member.profile, member.expires)):
+        state = "ready" if member.ready else "starting"
+        remaining = max(0, int(member.expires - now))
+        click.echo(f"{member.name}  {member.profile}  {state}  retires in {remaining}s")
+    if not members:
+        click.echo("No warm containers")
+
+
+@pool.command("drain")
+@click.argument("profile", required=False, default=None)
+@click.option("-a", "--all", "all_profiles", is_flag=True, help="Drain every profile's pool.")
+def pool_drain(profile: str | None, all_profiles: bool) -> None:
+    """Stop the unclaimed warm containers of PROFILE."""
+    from .pool import list_members, stop_containers
+
+    profile_name = _resolve_container_scope(profile, all_profiles)
+    try:
+        members = list_members(profile_name)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from exc
+    outcomes = stop_containers([member.id for member in members])
+    failed = [outcome for outcome in outcomes if not outcome.ok]
+    for outcome in failed:
+        click.echo(f"Error: failed to stop {outcome.target}: {outcome.error}", err=True)
+    click.echo(f"Stopped {len(outcomes) - len(failed)} warm containers")
+    if failed:
+        raise click.ClickException("Pool drain failed")
+
+
+@cli.group(cls=AbbreviatingGroup)
+def toolchain() -> None:
+    """Manage the shared agent toolchain mounted into every container."""
+
+
+@toolchain.command("update")
+@click.option("-i", "--image", "image_name", help="Container image to install with.")
+def toolchain_update(image_name: str | None) -> None:
+    """Install the latest agents into a new toolchain generation.
+
+    Containers started afterwards use it; running ones keep the generation
+    they started with.  Generations no container uses are removed.
+    """
+    import subprocess
+
+    from .toolchain import generations_in_use, prune, read_versions, toolchain_dir, update
+
+    overrides: dict[str, object] = {}
+    if image_name:
+        overrides["image_name"] = image_name
+    settings = _load_settings(overrides)
+    root = toolchain_dir()
+    try:
+        generation, changed = update(settings.image_name, root)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        raise click.ClickException(f"Toolchain install failed: {exc}") from exc
+
+    versions = ", ".join(
+        f"{agent} {version}" for agent, version in read_versions(generation).items()
+    )
+    if changed:
+        click.echo(f"Toolchain generation {generation.name}: {versions}")
+    else:
+        click.echo(f"Toolchain generation {generation.name} is up to date: {versions}")
+    try:
+        in_use = generations_in_use()
+    except RuntimeError as exc:
+        click.echo(f"Not removing old generations: {exc}", err=True)
+        return
+    for removed in prune(root, in_use):
+        click.echo(f"Removed generation {removed.name}")
+
+
+@toolchain.command("status")
+def toolchain_status() -> None:
+    """Show the toolchain generations and the agent versions in each."""
+    from .toolchain import current_name, generations, read_versions, toolchain_dir
+
+    root = toolchain_dir()
+    current = current_name(root)
+    found = generations(root)
+    for generation in found:
+        marker = "*" if generation.name == current else " "
+        versions = ", ".join(
+            f"{agent} {version}" for agent, version in read_versions(generation).items()
+        )
+        click.echo(f"{marker} {generation.name}  {versions or '(incomplete)'}")
+    if current is None:
+        click.echo("No toolchain; containers use the agents in the image")
+    elif not found:
+        click.echo(f"Current generation {current} is missing")
+
+
+@toolchain.command("disable")
+def toolchain_disable() -> None:
+    """Stop mounting the toolchain; new containers use the agents in the image."""
+    from .toolchain import deactivate, toolchain_dir
+
+    if deactivate(toolchain_dir()):
+        click.echo("Toolchain disabled; `llmbox toolchain update` enables it again")
+    else:
+        click.echo("No toolchain is enabled")
 
 
 @cli.group(cls=AbbreviatingGroup)
@@ -517,6 +1543,9 @@ def config() -> None:
 @click.option("--clear", is_flag=True, help="Remove the persist-dir setting.")
 def config_persist_dir(profile: str | None, path: str | None, is_global: bool, clear: bool) -> None:
     """Get or set the persist directory (host bind-mount for ~/.persist)."""
+    from .profiles import open_profile_manager
+    from .settings import load_config, save_config
+
     settings = _load_settings({})
 
     if is_global:
@@ -540,8 +1569,8 @@ def config_persist_dir(profile: str | None, path: str | None, is_global: bool, c
     if profile is None:
         raise click.UsageError("Missing argument 'PROFILE'.")
 
-    manager = ProfileManager(settings.config_dir)
-    state = load_state(settings.state_dir)
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
     profile_name = _resolve_profile_arg(profile, manager, state)
     try:
         data = manager.load(profile_name)
@@ -562,3 +1591,356 @@ def config_persist_dir(profile: str | None, path: str | None, is_global: bool, c
 
     # Show current value
     click.echo(data.persist_dir or "(not set)")
+
+
+@config.command("update-ttl")
+@click.argument("profile", required=False, default=None)
+@click.argument("seconds", type=click.IntRange(min=0), required=False, default=None)
+@click.option("-g", "--global", "is_global", is_flag=True, help="Set/show the global TTL.")
+@click.option("--clear", is_flag=True, help="Use the global TTL for the profile.")
+def config_update_ttl(
+    profile: str | None, seconds: int | None, is_global: bool, clear: bool
+) -> None:
+    """Get or set how long agent versions are trusted before checking upstream.
+
+    Within the TTL, containers only update agents that differ from the
+    versions last recorded in the persist dir; 0 checks on every start.
+    """
+    from .profiles import open_profile_manager
+    from .settings import load_config, save_config
+
+    settings = _load_settings({})
+
+    if is_global:
+        cfg = load_config(settings.config_dir)
+        if seconds is None and profile is not None:
+            # --global with the TTL in the profile slot
+            if not profile.isdigit():
+                raise click.UsageError(f"{profile!r} is not a number of seconds.")
+            seconds = int(profile)
+        if seconds is None:
+            click.echo(cfg.update_ttl)
+            return
+        cfg.update_ttl = seconds
+        save_config(settings.config_dir, cfg)
+        click.echo(f"Global update-ttl set to {seconds}")
+        return
+
+    if profile is None:
+        raise click.UsageError("Missing argument 'PROFILE'.")
+
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
+    profile_name = _resolve_profile_arg(profile, manager, state)
+    try:
+        data = manager.load(profile_name)
+    except (FileNotFoundError, ValueError) as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    if clear:
+        data.update_ttl = None
+        manager.save(profile_name, data)
+        click.echo(f"Cleared update-ttl for profile {profile_name}")
+        return
+
+    if seconds is not None:
+        data.update_ttl = seconds
+        manager.save(profile_name, data)
+        click.echo(f"update-ttl for profile {profile_name} set to {seconds}")
+        return
+
+    click.echo("(not set)" if data.update_ttl is None else data.update_ttl)
+
+
+UPDATE_MODES = ("foreground", "background")
+
+
+@config.command("update-mode")
+@click.argument("profile", required=False, default=None)
+@click.argument("mode", type=click.Choice(UPDATE_MODES), required=False, default=None)
+@click.option("-g", "--global", "is_global", is_flag=True, help="Set/show the global mode.")
+@click.option("--clear", is_flag=True, help="Use the global mode for the profile.")
+def config_update_mode(profile: str | None, mode: str | None, is_global: bool, clear: bool) -> None:
+    """Get or set whether the shell waits for agent updates.
+
+    foreground shows the updates and starts the shell when they are done.
+    background starts the shell right away; the prompt shows the updates'
+    progress, and new versions replace the old ones only once installed.
+    """
+    from .profiles import open_profile_manager
+    from .settings import load_config, save_config
+
+    settings = _load_settings({})
+
+    if is_global:
+        cfg = load_config(settings.config_dir)
+        if mode is None and profile is not None:
+            # --global with the mode in the profile slot
+            if profile not in UPDATE_MODES:
+                raise click.UsageError(f"MODE must be one of: {', '.join(UPDATE_MODES)}.")
+            mode = profile
+        if mode is None:
+            click.echo(cfg.update_mode)
+            return
+        cfg.update_mode = cast("UpdateMode", mode)
+        save_config(settings.config_dir, cfg)
+        click.echo(f"Global update-mode set to {mode}")
+        return
+
+    if profile is None:
+        raise click.UsageError("Missing argument 'PROFILE'.")
+
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    state = manager.load_state()
+    profile_name = _resolve_profile_arg(profile, manager, state)
+    try:
+        data = manager.load(profile_name)
+    except (FileNotFoundError, ValueError) as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    if clear:
+        data.update_mode = None
+        manager.save(profile_name, data)
+        click.echo(f"Cleared update-mode for profile {profile_name}")
+        return
+
+    if mode is not None:
+        data.update_mode = cast("UpdateMode", mode)
+        manager.save(profile_name, data)
+        click.echo(f"update-mode for profile {profile_name} set to {mode}")
+        return
+
+    click.echo(data.update_mode or "(not set)")
+
+
+PROXY_ENGINES = ("tinyproxy", "llmproxy")
+PROXY_LOG_LEVELS = ("Critical", "Error", "Warning", "Notice", "Connect", "Info")
+
+
+@config.command("proxy")
+@click.argument("profile", required=False, default=None)
+@click.option("-g", "--global", "is_global", is_flag=True, help="Set/show the global settings.")
+@click.option("--engine", type=click.Choice(PROXY_ENGINES), help="Proxy implementation.")
+@click.option("--max-clients", type=click.IntRange(min=1), help="Concurrent connections.")
+@click.option("--timeout", type=click.IntRange(min=1), help="Idle connection timeout, seconds.")
+@click.option("--log-level", type=click.Choice(PROXY_LOG_LEVELS), help="tinyproxy log level.")
+@click.option(
+    "--connect-port",
+    "connect_ports",
+    type=click.IntRange(1, 65535),
+    multiple=True,
+    help="Port CONNECT may tunnel to (repeatable; replaces the list).",
+)
+@click.option("--clear", is_flag=True, help="Drop the settings, back to the defaults.")
+def config_proxy(
+    profile: str | None,
+    is_global: bool,
+    engine: str | None,
+    max_clients: int | None,
+    timeout: int | None,
+    log_level: str | None,
+    connect_ports: tuple[int, ...],
+    clear: bool,
+) -> None:
+    """Get or set the container proxy's engine and tuning.
+
+    A profile's settings override the global ones field by field; unset
+    fields keep the image's defaults (tinyproxy, 100 clients, 600s timeout,
+    Connect logging, ports 443 and 80).  llmproxy is a single-process
+    proxy that matches domains in a trie and reports per-host counters
+    through ``llmbox proxy stats``.  Changes apply to containers started
+    afterwards.
+    """
+    from .profiles import open_profile_manager
+    from .settings import ProxySettings, load_config, save_config
+
+    settings = _load_settings({})
+    updates = {
+        "engine": engine,
+        "max_clients": max_clients,
+        "timeout": timeout,
+        "log_level": log_level,
+        "connect_ports": list(connect_ports) or None,
+    }
+    updates = {name: value for name, value in updates.items() if value is not None}
+
+    def apply(current: ProxySettings) -> ProxySettings:
+        if clear:
+            return ProxySettings()
+        return ProxySettings.model_validate({**current.model_dump(), **updates})
+
+    if is_global:
+        if profile is not None:
+            raise click.UsageError("PROFILE cannot be combined with --global.")
+        cfg = load_config(settings.config_dir)
+        proxy = cfg.proxy
+        if clear or updates:
+            proxy = cfg.proxy = apply(proxy)
+            save_config(settings.config_dir, cfg)
+    else:
+        if profile is None:
+            raise click.UsageError("Missing argument 'PROFILE'.")
+        manager = open_profile_manager(settings.config_dir, settings.state_dir)
+        profile_name = _resolve_profile_arg(profile, manager, manager.load_state())
+        try:
+            data = manager.load(profile_name)
+        except (FileNotFoundError, ValueError) as exc:
+            raise click.ClickException(str(exc)) from exc
+        proxy = data.proxy
+        if clear or updates:
+            proxy = data.proxy = apply(proxy)
+            manager.save(profile_name, data)
+
+    for name, value in proxy.model_dump().items():
+        if isinstance(value, list):
+            value = ", ".join(map(str, value))
+        click.echo(f"{name}: {'(not set)' if value is None else value}")
+
+
+@config.command("cache-proxy")
+@click.option("--enable/--disable", default=None, help="Point new containers at the cache.")
+@click.option("--port", type=click.IntRange(1, 65535), help="Port the cache listens on.")
+@click.option("--bind", help="Address the cache listens on.")
+@click.option("--max-size", help="Size cap, e.g. 20G.")
+@click.option(
+    "--metadata-ttl", type=click.IntRange(min=0), help="Seconds before metadata is revalidated."
+)
+def config_cache_proxy(
+    enable: bool | None,
+    port: int | None,
+    bind: str | None,
+    max_size: str | None,
+    metadata_ttl: int | None,
+) -> None:
+    """Get or set the host package cache's settings.
+
+    With the cache enabled, new containers fetch npm, PyPI and Fedora
+    packages through ``llmbox cache-proxy serve`` on the host.
+    """
+    from .caches import format_size, parse_size
+    from .settings import CacheProxySettings, load_config, save_config
+
+    settings = _load_settings({})
+    updates: dict[str, Any] = {
+        "enabled": enable,
+        "port": port,
+        "bind": bind,
+        "metadata_ttl": metadata_ttl,
+    }
+    if max_size is not None:
+        try:
+            updates["max_size"] = parse_size(max_size)
+        except ValueError as exc:
+            raise click.BadParameter(str(exc), param_hint="--max-size") from exc
+    updates = {name: value for name, value in updates.items() if value is not None}
+
+    cfg = load_config(settings.config_dir)
+    if updates:
+        cfg.cache_proxy = CacheProxySettings.model_validate(
+            {**cfg.cache_proxy.model_dump(), **updates}
+        )
+        save_config(settings.config_dir, cfg)
+    options = cfg.cache_proxy
+    click.echo(f"enabled: {options.enabled}")
+    click.echo(f"bind: {options.bind or '(not set)'}")
+    click.echo(f"port: {options.port}")
+    click.echo(f"max_size: {format_size(options.max_size)}")
+    click.echo(f"metadata_ttl: {options.metadata_ttl}")
+    for name, base in options.mirrors.items():
+        click.echo(f"mirror {name}: {base}")
+
+
+@config.command("blocklist")
+@click.argument("profile")
+@click.option(
+    "-m",
+    "--mode",
+    type=click.Choice(["inherit", "extend", "replace", "allowlist"]),
+    help="How the profile's entries combine with the global blocklist.",
+)
+@click.option("-a", "--add", "added", multiple=True, help="Add an entry (repeatable).")
+@click.option("-r", "--remove", "removed", multiple=True, help="Remove an entry (repeatable).")
+def config_blocklist(
+    profile: str, mode: str | None, added: tuple[str, ...], removed: tuple[str, ...]
+) -> None:
+    """Get or set a profile's proxy blocklist policy.
+
+    inherit uses the global blocklist, extend adds the profile's entries to
+    it, replace uses only the profile's entries, and allowlist denies every
+    request the entries do not match.  Entries use the blocklist.txt syntax.
+    Changes apply to containers started afterwards.
+    """
+    from .blocklist import parse_entry
+    from .profiles import BlocklistPolicy, open_profile_manager
+
+    settings = _load_settings({})
+    manager = open_profile_manager(settings.config_dir, settings.state_dir)
+    profile_name = _resolve_profile_arg(profile, manager, manager.load_state())
+    try:
+        data = manager.load(profile_name)
+    except (FileNotFoundError, ValueError) as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    policy = data.blocklist
+    if mode or added or removed:
+        for entry in added:
+            # tinyproxy ends a filter pattern at the first whitespace.
+            if parse_entry(entry) is None or len(entry.split()) != 1:
+                raise click.ClickException(f"Not a blocklist entry: {entry!r}")
+        kept = [entry for entry in policy.entries if entry not in removed]
+        policy = BlocklistPolicy.model_validate(
+            {
+                "mode": mode or policy.mode,
+                "entries": kept + [entry for entry in added if entry not in kept],
+            }
+        )
+        data.blocklist = policy
+        manager.save(profile_name, data)
+
+    click.echo(f"mode: {policy.mode}")
+    for entry in policy.entries:
+        click.echo(f"  {entry}")
+    if policy.mode in ("replace", "allowlist") and not policy.entries:
+        qualifier = "denies" if policy.mode == "allowlist" else "allows"
+        click.echo(
+            click.style(f"Warning: no entries; the proxy {qualifier} everything", fg="yellow")
+        )
+
+
+@config.command("profile-store")
+@click.argument("backend", required=False, type=click.Choice(["yaml", "sqlite"]))
+def config_profile_store(backend: str | None) -> None:
+    """Show or switch the profile storage backend.
+
+    Switching to sqlite imports the existing YAML profiles and state into
+    profiles.db; switching back to yaml exports the database as YAML files.
+    """
+    from .profile_db import SqliteProfileManager
+    from .profiles import ProfileManager
+    from .settings import load_config, save_config
+
+    settings = _load_settings({})
+    cfg = load_config(settings.config_dir)
+
+    if backend is None:
+        click.echo(cfg.profile_store)
+        return
+    if backend == cfg.profile_store:
+        click.echo(f"Profile store is already {backend}")
+        return
+
+    yaml_manager = ProfileManager(settings.config_dir, settings.state_dir)
+    db_manager = SqliteProfileManager(settings.config_dir)
+    try:
+        if backend == "sqlite":
+            count = db_manager.import_from(yaml_manager)
+            click.echo(f"Imported {count} profile(s) into {db_manager.db_path}")
+        else:
+            count = db_manager.export_to(yaml_manager)
+            click.echo(f"Exported {count} profile(s) to {yaml_manager.profiles_dir}")
+    finally:
+        db_manager.close()
+
+    cfg.profile_store = "sqlite" if backend == "sqlite" else "yaml"
+    save_config(settings.config_dir, cfg)
+    click.echo(f"Profile store set to {backend}")
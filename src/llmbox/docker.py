@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import json
 import subprocess
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Sequence
+from typing import TYPE_CHECKING, Mapping, Sequence
 
-from .settings import default_data_dir
+from .caches import CacheMount
+from .fanout import DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT, Outcome, fan_out
+from .paths import default_data_dir
+from .toolchain import TOOLCHAIN_LABEL, TOOLCHAIN_MOUNT, current_generation, toolchain_dir
 from .volumes import VolumeMount
 
+if TYPE_CHECKING:
+    from .engine import EngineClient
+
 BASE_RUN_ARGS = [
     "docker",
     "run",
@@ -41,7 +48,7 @@ BASE_RUN_ARGS = [
     "-e",
     "HTTPS_PROXY=http://127.0.0.1:8888",
     "-e",
-    "NO_PROXY=localhost,127.0.0.1",
+    "NO_PROXY=localhost,127.0.0.1,host.docker.internal",
 ]
 
 
@@ -49,6 +56,10 @@ def _timestamp() -> str:
     return datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
 
 
+def container_name(profile: str) -> str:
+    return f"llmbox-{profile}-{_timestamp()}"
+
+
 def _resolve_persist_mount(persist_dir: str | None) -> str:
     """Return the -v spec for the persist mount.
 
@@ -64,6 +75,76 @@ def _resolve_persist_mount(persist_dir: str | None) -> str:
     return f"{host}:/home/llm/.persist"
 
 
+def proxy_filter_dir(config_dir: Path) -> Path:
+    """Host directory mounted at /etc/tinyproxy/filter; holds the ``blocklist`` file."""
+    return config_dir / "proxy"
+
+
+def _ensure_blocklist(config_dir: Path) -> Path:
+    """Create the blocklist under proxy_filter_dir() and return the directory.
+
+    The directory is mounted rather than the file: a single-file bind mount
+    pins the inode, so an editor that saves by writing a new file and
+    renaming it over the old one would leave running containers on the stale
+    copy, and their watchers would never see the change.  A blocklist left
+    at the old ``proxy_blocklist`` location is moved into place.
+    """
+    filter_dir = proxy_filter_dir(config_dir)
+    blocklist_path = filter_dir / "blocklist"
+    filter_dir.mkdir(parents=True, exist_ok=True)
+    legacy_path = config_dir / "proxy_blocklist"
+    if legacy_path.is_file() and not blocklist_path.exists():
+        legacy_path.replace(blocklist_path)
+    blocklist_path.touch(exist_ok=True)
+    return filter_dir
+
+
+def ensure_host_paths(
+    config_dir: Path, persist_dir: str | None, cache_dirs: Sequence[str] = ()
+) -> None:
+    """Create the host files and directories a run command bind-mounts.
+
+    build_run_command() does this itself; call this before reusing a command
+    it produced earlier so Docker never creates them as root.
+    """
+    _ensure_blocklist(config_dir)
+    _resolve_persist_mount(persist_dir)
+    for path in cache_dirs:
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+
+def _cache_args(
+    caches: Sequence[CacheMount], volumes: Sequence[VolumeMount]
+) -> tuple[list[str], list[str]]:
+    """Return the arguments mounting *caches* and the host directories they use.
+
+    A cache whose target a volume also mounts is left out; the volume wins.
+    """
+    taken = {str(volume.container) for volume in volumes}
+    args: list[str] = []
+    host_dirs: list[str] = []
+    user_dirs: list[str] = []
+    for cache in caches:
+        if cache.target in taken:
+            continue
+        if cache.backend == "dir":
+            host_dirs.append(cache.source)
+        if cache.owner == "user":
+            user_dirs.append(cache.target)
+        args.extend(["-v", cache.spec()])
+        for variable, value in cache.environment.items():
+            args.extend(["-e", f"{variable}={value}"])
+    if user_dirs:
+        # Handed to the user by fix-ownership.py.
+        args.extend(["-e", f"LLM_CACHE_DIRS={':'.join(user_dirs)}"])
+    return args, host_dirs
+
+
+def cache_host_dirs(caches: Sequence[CacheMount], volumes: Sequence[VolumeMount]) -> list[str]:
+    """The host directories build_run_command() mounts for *caches*."""
+    return _cache_args(caches, volumes)[1]
+
+
 def build_run_command(
     image_name: str,
     profile: str,
@@ -72,11 +153,21 @@ def build_run_command(
     extra_args: Sequence[str],
     config_dir: Path,
     persist_dir: str | None = None,
+    filter_dir: Path | None = None,
+    environment: Mapping[str, str] | None = None,
+    caches: Sequence[CacheMount] = (),
 ) -> tuple[list[str], str]:
-    name = f"llmbox-{profile}-{_timestamp()}"
-    blocklist_path = config_dir / "proxy_blocklist"
-    blocklist_path.parent.mkdir(parents=True, exist_ok=True)
-    blocklist_path.touch(exist_ok=True)
+    """Return the ``docker run`` argv for *profile* and the container name it uses.
+
+    *filter_dir* is the proxy filter directory to mount; it defaults to the
+    global one under *config_dir*, which is created either way.
+    *environment* is passed to the container with ``-e``.  The current
+    toolchain generation, if any, is mounted read-only (see toolchain).
+    *caches* are mounted after the volumes (see caches).
+    """
+    name = container_name(profile)
+    global_filter_dir = _ensure_blocklist(config_dir)
+    filter_dir = filter_dir or global_filter_dir
 
     command: list[str] = [
         *BASE_RUN_ARGS,
@@ -89,14 +180,35 @@ def build_run_command(
         "-v",
         _resolve_persist_mount(persist_dir),
     ]
+    for variable, value in (environment or {}).items():
+        command.extend(["-e", f"{variable}={value}"])
+    generation = current_generation(toolchain_dir())
+    if generation is not None:
+        command.extend(
+            [
+                "--label",
+                f"{TOOLCHAIN_LABEL}={generation.name}",
+                "-v",
+                f"{generation}:{TOOLCHAIN_MOUNT}:ro",
+                "-e",
+                f"LLM_TOOLCHAIN={TOOLCHAIN_MOUNT}",
+                # The mount is read-only; updates come from llmbox toolchain update.
+                "-e",
+                "DISABLE_AUTOUPDATER=1",
+            ]
+        )
 
     # Global volumes first (profile volumes come after and win on conflict)
     for volume in global_volumes:
         command.extend(["-v", volume.spec()])
     for volume in volumes:
         command.extend(["-v", volume.spec()])
+    cache_args, cache_dirs = _cache_args(caches, [*global_volumes, *volumes])
+    for path in cache_dirs:
+        Path(path).mkdir(parents=True, exist_ok=True)
+    command.extend(cache_args)
 
-    command.extend(["-v", f"{blocklist_path}:/etc/tinyproxy/blocklist:ro"])
+    command.extend(["-v", f"{filter_dir}:/etc/tinyproxy/filter:ro"])
     command.extend(extra_args)
     command.append(image_name)
     return command, name
@@ -110,21 +222,105 @@ def run_container(
     extra_args: Sequence[str],
     config_dir: Path,
     persist_dir: str | None = None,
+    filter_dir: Path | None = None,
+    environment: Mapping[str, str] | None = None,
+    caches: Sequence[CacheMount] = (),
     runner=subprocess.run,
 ) -> tuple[str, list[str]]:
     command, name = build_run_command(
-        image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir
+        image_name,
+        profile,
+        global_volumes,
+        volumes,
+        extra_args,
+        config_dir,
+        persist_dir,
+        filter_dir=filter_dir,
+        environment=environment,
+        caches=caches,
     )
     runner(command, check=True)
     return name, command
 
 
-def list_profile_containers(profile: str, runner=subprocess.run) -> list[str]:
+def run_command(command: Sequence[str], runner=subprocess.run) -> None:
+    """Run a docker command produced earlier by build_run_command()."""
+    runner(list(command), check=True)
+
+
+RELOAD_PROXY_COMMAND = [
+    "sh",
+    "-c",
+    'pid="$(cat /run/tinyproxy.pid)" && runuser -u tinyproxy -- kill -USR1 "$pid"',
+]
+
+
+def bridge_gateway(runner=subprocess.run) -> str | None:
+    """Return the IPv4 gateway of Docker's default bridge, or None if it cannot be found.
+
+    ``host-gateway``, and so host.docker.internal in containers, maps to it.
+    """
+    result = runner(
+        [
+            "docker",
+            "network",
+            "inspect",
+            "bridge",
+            "--format",
+            "{{range .IPAM.Config}}{{.Gateway}} {{end}}",
+        ],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    for address in result.stdout.split():
+        if "." in address:
+            return address
+    return None
+
+
+def engine_for(runner, client: EngineClient | None) -> EngineClient | None:
+    """Pick the Engine API client to use, or None to go through the docker CLI.
+
+    An explicit *client* always wins.  A custom *runner* means the caller wants
+    CLI commands (tests inject one), so the socket is only auto-detected when
+    the default subprocess runner is in use.  Callers fall back to the CLI
+    when an API call fails for any reason but a timeout.
+    """
+    if client is not None:
+        return client
+    if runner is subprocess.run:
+        from .engine import default_client
+
+        return default_client()
+    return None
+
+
+def list_profile_containers(
+    profile: str | None, runner=subprocess.run, client: EngineClient | None = None
+) -> list[str]:
+    """Return IDs of running containers for *profile*, or of every llmbox container if None."""
+    label = "llmbox.managed=true" if profile is None else f"llmbox.profile={profile}"
+    engine = engine_for(runner, client)
+    if engine is not None:
+        from .engine import EngineError
+
+        try:
+            found = engine.ps(filters={"label": [label]})
+        except TimeoutError as exc:
+            raise RuntimeError(str(exc) or "Failed to list containers") from exc
+        except (OSError, EngineError):
+            pass
+        else:
+            return [container["Id"][:12] for container in found]
+
     ps_command = [
         "docker",
         "ps",
         "--filter",
-        f"label=llmbox.profile={profile}",
+        f"label={label}",
         "--format",
         "{{.ID}}",
     ]
@@ -134,24 +330,114 @@ def list_profile_containers(profile: str, runner=subprocess.run) -> list[str]:
     return [line.strip() for line in result.stdout.splitlines() if line.strip()]
 
 
-def reload_proxy(profile: str, runner=subprocess.run) -> tuple[list[str], list[tuple[str, str]]]:
-    containers = list_profile_containers(profile, runner=runner)
+def exec_in_containers(
+    containers: Sequence[str],
+    command: Sequence[str],
+    runner=subprocess.run,
+    client: EngineClient | None = None,
+    timeout: float | None = DEFAULT_TIMEOUT,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> list[Outcome[subprocess.CompletedProcess[str]]]:
+    """Run *command* in every container concurrently.
+
+    An outcome is a failure if the exec could not be run (including timeouts);
+    a non-zero exit status is reported through its CompletedProcess.
+    """
+    engine = engine_for(runner, client)
+
+    def run_one(container: str, op_timeout: float | None) -> subprocess.CompletedProcess[str]:
+        if engine is not None:
+            from .engine import EngineError
+
+            try:
+                return engine.exec(container, command, timeout=op_timeout)
+            except TimeoutError:
+                raise
+            except (OSError, EngineError):
+                pass
+        return runner(
+            ["docker", "exec", container, *command],
+            check=False,
+            capture_output=True,
+            text=True,
+            timeout=op_timeout,
+        )
+
+    return fan_out(containers, run_one, max_workers=max_workers, timeout=timeout)
+
+
+def reload_proxy(
+    profile: str | None,
+    runner=subprocess.run,
+    client: EngineClient | None = None,
+    timeout: float | None = DEFAULT_TIMEOUT,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """Ask tinyproxy in each running container of *profile* (all profiles if None) to reload."""
+    engine = engine_for(runner, client)
+    containers = list_profile_containers(profile, runner=runner, client=engine)
     if not containers:
         return [], []
 
+    outcomes = exec_in_containers(
+        containers,
+        RELOAD_PROXY_COMMAND,
+        runner=runner,
+        client=engine,
+        timeout=timeout,
+        max_workers=max_workers,
+    )
     failures: list[tuple[str, str]] = []
-    for container in containers:
-        exec_command = [
-            "docker",
-            "exec",
-            container,
-            "sh",
-            "-c",
-            'pid="$(cat /run/tinyproxy.pid)" && runuser -u tinyproxy -- kill -USR1 "$pid"',
-        ]
-        result = runner(exec_command, check=False, capture_output=True, text=True)
-        if result.returncode != 0:
-            detail = (result.stderr or result.stdout or "").strip()
-            failures.append((container, detail))
+    for outcome in outcomes:
+        if outcome.value is None:
+            failures.append((outcome.target, outcome.error or ""))
+        elif outcome.value.returncode != 0:
+            detail = (outcome.value.stderr or outcome.value.stdout or "").strip()
+            failures.append((outcome.target, detail))
 
     return containers, failures
+
+
+PROXY_STATS_COMMAND = ["/llmproxy.py", "--stats"]
+
+
+def proxy_stats(
+    profile: str | None,
+    runner=subprocess.run,
+    client: EngineClient | None = None,
+    timeout: float | None = DEFAULT_TIMEOUT,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> tuple[dict[str, dict], list[tuple[str, str]]]:
+    """Collect llmproxy's counters from each running container of *profile* (all if None).
+
+    Returns the counters by container and the containers that could not
+    report them, with the reason; containers running tinyproxy are among
+    those.
+    """
+    engine = engine_for(runner, client)
+    containers = list_profile_containers(profile, runner=runner, client=engine)
+    if not containers:
+        return {}, []
+
+    outcomes = exec_in_containers(
+        containers,
+        PROXY_STATS_COMMAND,
+        runner=runner,
+        client=engine,
+        timeout=timeout,
+        max_workers=max_workers,
+    )
+    stats: dict[str, dict] = {}
+    failures: list[tuple[str, str]] = []
+    for outcome in outcomes:
+        if outcome.value is None:
+            failures.append((outcome.target, outcome.error or ""))
+        elif outcome.value.returncode != 0:
+            detail = (outcome.value.stderr or outcome.value.stdout or "").strip()
+            failures.append((outcome.target, detail))
+        else:
+            try:
+                stats[outcome.target] = json.loads(outcome.value.stdout)
+            except ValueError:
+                failures.append((outcome.target, "unreadable llmproxy stats"))
+    return stats, failures
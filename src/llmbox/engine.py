@@ -0,0 +1,396 @@
+"""Minimal Docker Engine API client.
+
+Talks HTTP to the daemon directly (a UNIX socket by default, or ``tcp://``
+from ``DOCKER_HOST`` or the current ``docker context``) instead of forking
+the docker CLI for every call.  The connection is kept open and reused
+between requests.  Only the handful of endpoints llmbox needs are
+implemented; anything else should keep using the CLI.
+
+The API version is negotiated with the daemon on first use, like the CLI
+does.  A daemon that cannot be reached or negotiated with means the CLI is
+used instead.
+"""
+
+from __future__ import annotations
+
+import enum
+import functools
+import hashlib
+import http.client
+import json
+import os
+import socket
+import struct
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Generator, Mapping, Sequence
+from urllib.parse import quote, urlencode, urlsplit
+
+DEFAULT_DOCKER_HOST = "unix:///var/run/docker.sock"
+FORCE_CLI_ENV = "LLMBOX_DOCKER_CLI"
+# The newest API version llmbox knows; an older daemon's own version is used.
+# Docker Engine 29 and later refuse anything below 1.44.
+API_VERSION = "1.44"
+
+
+class _Default(enum.Enum):
+    TIMEOUT = enum.auto()
+
+
+# Stands for the client's own timeout where None means "no timeout".
+_DEFAULT_TIMEOUT = _Default.TIMEOUT
+
+
+class EngineError(RuntimeError):
+    """The Docker daemon returned an error response."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float | None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def _demultiplex(payload: bytes) -> tuple[bytes, bytes]:
+    """Split a non-TTY attach stream into (stdout, stderr).
+
+    Each frame is an 8-byte header (stream type, 3 padding bytes, big-endian
+    length) followed by that many bytes of output.
+    """
+    stdout: list[bytes] = []
+    stderr: list[bytes] = []
+    offset = 0
+    while offset + 8 <= len(payload):
+        stream, length = struct.unpack(">BxxxL", payload[offset : offset + 8])
+        chunk = payload[offset + 8 : offset + 8 + length]
+        (stderr if stream == 2 else stdout).append(chunk)
+        offset += 8 + length
+    return b"".join(stdout), b"".join(stderr)
+
+
+class EngineClient:
+    def __init__(self, host: str = DEFAULT_DOCKER_HOST, timeout: float | None = 60.0):
+        parsed = urlsplit(host)
+        if parsed.scheme == "unix":
+            self._socket_path: str | None = parsed.path
+            self._netloc = ""
+        elif parsed.scheme in ("tcp", "http"):
+            self._socket_path = None
+            self._netloc = parsed.netloc
+        else:
+            raise ValueError(f"Unsupported DOCKER_HOST {host!r}")
+        self.host = host
+        self.timeout = timeout
+        self._api_version: str | None = None
+        self._conn: http.client.HTTPConnection | None = None
+        # Guards the shared connection; exec output streams and events use
+        # their own connections, so concurrent callers only queue for the
+        # short request/response exchanges.
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, timeout: float | None = 60.0) -> EngineClient | None:
+        """Return a client for the daemon the CLI would use, or None to use the CLI instead.
+
+        TLS and ssh:// hosts are left to the CLI, as are contexts whose
+        endpoint cannot be read and a UNIX socket that does not exist.
+        """
+        host = os.environ.get("DOCKER_HOST") or context_host()
+        if host is None or os.environ.get("DOCKER_TLS_VERIFY"):
+            return None
+        try:
+            client = cls(host, timeout=timeout)
+        except ValueError:
+            return None
+        if client._socket_path is not None and not os.path.exists(client._socket_path):
+            return None
+        return client
+
+    def _new_connection(
+        self, timeout: float | None | _Default = _DEFAULT_TIMEOUT
+    ) -> http.client.HTTPConnection:
+        if timeout is _DEFAULT_TIMEOUT:
+            timeout = self.timeout
+        if self._socket_path is not None:
+            return _UnixHTTPConnection(self._socket_path, timeout)
+        return http.client.HTTPConnection(self._netloc, timeout=timeout)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> EngineClient:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def api_version(self) -> str:
+        """Return the API version to use with the daemon, negotiating it on the first call.
+
+        Raises:
+            EngineError: If the daemon rejects the request.
+            OSError: If the daemon cannot be reached.
+        """
+        if self._api_version is None:
+            with self._lock:
+                info = json.loads(self._request_locked("GET", "/version", None, None) or b"{}")
+            version = _version_tuple(API_VERSION)
+            if info.get("ApiVersion"):
+                version = min(version, _version_tuple(info["ApiVersion"]))
+            if info.get("MinAPIVersion"):
+                version = max(version, _version_tuple(info["MinAPIVersion"]))
+            self._api_version = ".".join(map(str, version))
+        return self._api_version
+
+    def _url(self, path: str, query: Mapping[str, Any] | None = None) -> str:
+        url = f"/v{self.api_version()}{path}"
+        if query:
+            url += "?" + urlencode({k: v for k, v in query.items() if v is not None})
+        return url
+
+    def _send(
+        self, conn: http.client.HTTPConnection, method: str, url: str, body: Any
+    ) -> http.client.HTTPResponse:
+        headers = {"Host": "docker"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        conn.request(method, url, body=payload, headers=headers)
+        return conn.getresponse()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        query: Mapping[str, Any] | None = None,
+        body: Any = None,
+        timeout: float | None = None,
+    ) -> bytes:
+        """Send one request on the shared connection and return the response body.
+
+        A request that fails because the daemon closed the idle connection is
+        retried once on a fresh connection.
+
+        Raises:
+            EngineError: For any non-2xx response.
+        """
+        url = self._url(path, query)
+        with self._lock:
+            return self._request_locked(method, url, body, timeout)
+
+    def _request_locked(self, method: str, url: str, body: Any, timeout: float | None) -> bytes:
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = self._new_connection()
+            if timeout is not None and self._conn.sock is not None:
+                self._conn.sock.settimeout(timeout)
+            try:
+                response = self._send(self._conn, method, url, body)
+                data = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt == 2:
+                    raise
+                continue
+            except BaseException:
+                self.close()
+                raise
+            if response.will_close:
+                self.close()
+            elif timeout is not None and self._conn.sock is not None:
+                self._conn.sock.settimeout(self.timeout)
+            if response.status >= 400:
+                raise EngineError(response.status, self._error_message(data, response.status))
+            return data
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _error_message(data: bytes, status: int) -> str:
+        try:
+            message = json.loads(data).get("message")
+        except (ValueError, AttributeError):
+            message = None
+        return message or data.decode(errors="replace").strip() or f"HTTP {status}"
+
+    def _json(self, method: str, path: str, **kwargs: Any) -> Any:
+        data = self.request(method, path, **kwargs)
+        return json.loads(data) if data else None
+
+    def ping(self) -> bool:
+        try:
+            return self.request("GET", "/_ping") == b"OK"
+        except (OSError, EngineError):
+            return False
+
+    def ps(
+        self, filters: Mapping[str, Sequence[str]] | None = None, all: bool = False
+    ) -> list[dict[str, Any]]:
+        """List containers, like ``docker ps --filter ...``."""
+        query: dict[str, Any] = {"all": "1" if all else None}
+        if filters:
+            query["filters"] = json.dumps({k: list(v) for k, v in filters.items()})
+        return self._json("GET", "/containers/json", query=query)
+
+    def inspect(self, container: str) -> dict[str, Any]:
+        return self._json("GET", f"/containers/{quote(container, safe='')}/json")
+
+    def rename(self, container: str, name: str) -> None:
+        """Rename *container*; fails with a 409 if *name* is taken, 404 if it is gone."""
+        self.request(
+            "POST", f"/containers/{quote(container, safe='')}/rename", query={"name": name}
+        )
+
+    def stop(self, container: str, grace: int | None = None) -> None:
+        """Stop *container*, killing it after *grace* seconds, like ``docker stop -t``."""
+        self.request("POST", f"/containers/{quote(container, safe='')}/stop", query={"t": grace})
+
+    def exec(
+        self,
+        container: str,
+        cmd: Sequence[str],
+        *,
+        user: str | None = None,
+        timeout: float | None = None,
+    ) -> subprocess.CompletedProcess[str]:
+        """Run *cmd* in *container* and wait for it, like ``docker exec``.
+
+        The result mirrors what ``subprocess.run(..., capture_output=True,
+        text=True)`` returns for the CLI, so callers can handle both alike.
+        """
+        created = self._json(
+            "POST",
+            f"/containers/{quote(container, safe='')}/exec",
+            body={
+                "Cmd": list(cmd),
+                "AttachStdout": True,
+                "AttachStderr": True,
+                "User": user or "",
+            },
+        )
+        exec_id = created["Id"]
+        # The daemon hijacks the connection for the output stream and closes
+        # it when the command exits, so this request gets its own connection.
+        conn = self._new_connection(self.timeout if timeout is None else timeout)
+        try:
+            response = self._send(
+                conn, "POST", self._url(f"/exec/{exec_id}/start"), {"Detach": False, "Tty": False}
+            )
+            payload = response.read()
+            if response.status >= 400:
+                raise EngineError(response.status, self._error_message(payload, response.status))
+        finally:
+            conn.close()
+        stdout, stderr = _demultiplex(payload)
+        info = self._json("GET", f"/exec/{exec_id}/json")
+        return subprocess.CompletedProcess(
+            args=list(cmd),
+            returncode=int(info.get("ExitCode") or 0),
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+        )
+
+    def events(
+        self,
+        filters: Mapping[str, Sequence[str]] | None = None,
+        *,
+        since: str | None = None,
+        until: str | None = None,
+        timeout: float | None = None,
+    ) -> Generator[dict[str, Any], None, None]:
+        """Yield daemon events as they arrive, like ``docker events --format json``.
+
+        Without *until* this blocks waiting for new events until the caller
+        stops iterating.  *timeout* bounds the wait for each event; None waits
+        forever.
+        """
+        query: dict[str, Any] = {"since": since, "until": until}
+        if filters:
+            query["filters"] = json.dumps({k: list(v) for k, v in filters.items()})
+        conn = self._new_connection(timeout)
+        try:
+            response = self._send(conn, "GET", self._url("/events", query), None)
+            if response.status >= 400:
+                payload = response.read()
+                raise EngineError(response.status, self._error_message(payload, response.status))
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+
+def _version_tuple(version: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in version.removeprefix("v").split("."))
+
+
+def _docker_config_dir() -> Path:
+    return Path(os.environ.get("DOCKER_CONFIG") or Path.home() / ".docker")
+
+
+def context_host() -> str | None:
+    """Return the daemon address of the current ``docker context``, as ``DOCKER_HOST`` names one.
+
+    Reads the files ``docker context`` keeps instead of running it.  Returns
+    None when the endpoint cannot be read or uses TLS, so the CLI is used.
+    """
+    config_dir = _docker_config_dir()
+    name = os.environ.get("DOCKER_CONTEXT")
+    if not name:
+        try:
+            name = json.loads((config_dir / "config.json").read_text()).get("currentContext")
+        except FileNotFoundError:
+            name = None
+        except (OSError, ValueError, AttributeError):
+            return None
+    if not name or name == "default":
+        return DEFAULT_DOCKER_HOST
+    digest = hashlib.sha256(name.encode()).hexdigest()
+    if (config_dir / "contexts" / "tls" / digest).exists():
+        return None
+    try:
+        meta = json.loads((config_dir / "contexts" / "meta" / digest / "meta.json").read_text())
+        endpoint = meta["Endpoints"]["docker"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if endpoint.get("SkipTLSVerify"):
+        return None
+    return endpoint.get("Host") or None
+
+
+@functools.cache
+def default_client() -> EngineClient | None:
+    """Return the shared client for this process, or None to use the docker CLI.
+
+    Setting ``LLMBOX_DOCKER_CLI=1`` forces the CLI, as does a daemon that
+    does not answer the version negotiation (no permission on the socket,
+    or an API version llmbox cannot use).
+    """
+    if os.environ.get(FORCE_CLI_ENV, "") not in ("", "0"):
+        return None
+    client = EngineClient.from_env()
+    if client is None:
+        return None
+    try:
+        client.api_version()
+    except (OSError, EngineError, ValueError):
+        client.close()
+        return None
+    return client
@@ -0,0 +1,65 @@
+"""Run one operation against many containers concurrently.
+
+Most of the time spent on a per-container operation is waiting on the Docker
+daemon, so a small thread pool turns N sequential round trips into roughly
+N / max_workers.  Failures and timeouts are collected per target instead of
+aborting the batch.
+"""
+
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass
+from typing import Callable, Generic, Sequence, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 30.0
+
+
+@dataclass(frozen=True)
+class Outcome(Generic[T]):
+    target: str
+    value: T | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def fan_out(
+    targets: Sequence[str],
+    operation: Callable[[str, float | None], T],
+    *,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: float | None = DEFAULT_TIMEOUT,
+) -> list[Outcome[T]]:
+    """Call ``operation(target, timeout)`` for every target, at most *max_workers* at once.
+
+    Threads cannot be interrupted, so *timeout* is handed to the operation,
+    which must enforce it (subprocess and socket timeouts both raise here).
+    Exceptions become failed outcomes.  Results are returned in the order of
+    *targets*.
+    """
+
+    def call(target: str) -> Outcome[T]:
+        try:
+            return Outcome(target, value=operation(target, timeout))
+        except (TimeoutError, subprocess.TimeoutExpired):
+            return Outcome(
+                target, error=f"timed out after {timeout:g}s" if timeout else "timed out"
+            )
+        except Exception as exc:
+            return Outcome(target, error=str(exc) or type(exc).__name__)
+
+    if not targets:
+        return []
+    workers = max(1, min(max_workers, len(targets)))
+    if workers == 1:
+        return [call(target) for target in targets]
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llmbox-fanout") as pool:
+        return list(pool.map(call, targets))
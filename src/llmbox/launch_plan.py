@@ -0,0 +1,168 @@
+"""Cached docker launch commands for ``llmbox run``.
+
+Building a run command means validating the profile, resolving every mount
+and re-parsing the global volumes.  None of that changes between launches of
+an unchanged profile, so the finished argv is cached per profile under the
+state directory, keyed by a hash of everything that went into it.  Only the
+container name, which embeds a timestamp, is filled in fresh on each launch.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Sequence
+
+from . import __version__
+from .paths import config_file_path, default_data_dir
+from .toolchain import current_name, toolchain_dir
+from .volumes import VolumeMount
+
+PLAN_FORMAT = 7
+
+
+def plan_file_path(state_dir: Path, profile: str) -> Path:
+    return state_dir / "plans" / f"{profile}.json"
+
+
+def _read_bytes(path: Path) -> bytes:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return b""
+
+
+def plan_key(
+    config_dir: Path, profile_fingerprint: bytes, image_name: str, extra_args: Sequence[str]
+) -> str:
+    """Hash every input that can change the command build_run_command() produces.
+
+    Covers config.yaml, the stored profile, the image and extra docker args,
+    the current toolchain generation, plus the llmbox version and the
+    home/data directories that relative and default paths are resolved
+    against.
+    """
+    digest = hashlib.sha256()
+    for part in (
+        str(PLAN_FORMAT),
+        __version__,
+        str(config_dir),
+        str(Path.home()),
+        str(default_data_dir()),
+        image_name,
+        json.dumps(list(extra_args)),
+        current_name(toolchain_dir()) or "",
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(hashlib.sha256(_read_bytes(config_file_path(config_dir))).digest())
+    digest.update(hashlib.sha256(profile_fingerprint).digest())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class LaunchPlan:
+    key: str
+    command: list[str]
+    name_index: int
+    persist_dir: str | None
+    global_volumes: list[tuple[str, str]]
+    volumes: list[tuple[str, str]]
+    blocklist_mode: str = "inherit"
+    """The profile's blocklist policy, so a hit can refresh its filter directory."""
+    blocklist_entries: list[str] = field(default_factory=list)
+    pool_size: int = 0
+    snapshot_image: str | None = None
+    """The profile's snapshot the command starts, checked against its base on every launch."""
+    snapshot_base_id: str | None = None
+    cache_dirs: list[str] = field(default_factory=list)
+    """Host directories of the caches the command mounts, created before each launch."""
+
+    @classmethod
+    def from_command(
+        cls,
+        key: str,
+        command: Sequence[str],
+        name: str,
+        persist_dir: str | None,
+        global_volumes: Sequence[VolumeMount],
+        volumes: Sequence[VolumeMount],
+        blocklist_mode: str = "inherit",
+        blocklist_entries: Sequence[str] = (),
+        pool_size: int = 0,
+        snapshot_image: str | None = None,
+        snapshot_base_id: str | None = None,
+        cache_dirs: Sequence[str] = (),
+    ) -> LaunchPlan:
+        return cls(
+            key=key,
+            command=list(command),
+            name_index=list(command).index(name),
+            persist_dir=persist_dir,
+            global_volumes=[(str(v.host), str(v.container)) for v in global_volumes],
+            volumes=[(str(v.host), str(v.container)) for v in volumes],
+            blocklist_mode=blocklist_mode,
+            blocklist_entries=list(blocklist_entries),
+            pool_size=pool_size,
+            snapshot_image=snapshot_image,
+            snapshot_base_id=snapshot_base_id,
+            cache_dirs=list(cache_dirs),
+        )
+
+    def command_for(self, name: str) -> list[str]:
+        """Return the cached command with *name* as the container name."""
+        command = list(self.command)
+        command[self.name_index] = name
+        return command
+
+
+def load_plan(path: Path, key: str) -> LaunchPlan | None:
+    """Return the plan stored at *path* if it was built from inputs hashing to *key*."""
+    try:
+        raw = json.loads(path.read_bytes())
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(raw, dict) or raw.get("format") != PLAN_FORMAT or raw.get("key") != key:
+        return None
+    try:
+        return LaunchPlan(
+            key=raw["key"],
+            command=list(raw["command"]),
+            name_index=int(raw["name_index"]),
+            persist_dir=raw["persist_dir"],
+            global_volumes=[(host, container) for host, container in raw["global_volumes"]],
+            volumes=[(host, container) for host, container in raw["volumes"]],
+            blocklist_mode=str(raw["blocklist_mode"]),
+            blocklist_entries=[str(entry) for entry in raw["blocklist_entries"]],
+            pool_size=int(raw["pool_size"]),
+            snapshot_image=raw["snapshot_image"],
+            snapshot_base_id=raw["snapshot_base_id"],
+            cache_dirs=[str(path) for path in raw["cache_dirs"]],
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def save_plan(path: Path, plan: LaunchPlan) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "format": PLAN_FORMAT,
+        "key": plan.key,
+        "command": plan.command,
+        "name_index": plan.name_index,
+        "persist_dir": plan.persist_dir,
+        "global_volumes": plan.global_volumes,
+        "volumes": plan.volumes,
+        "blocklist_mode": plan.blocklist_mode,
+        "blocklist_entries": plan.blocklist_entries,
+        "pool_size": plan.pool_size,
+        "snapshot_image": plan.snapshot_image,
+        "snapshot_base_id": plan.snapshot_base_id,
+        "cache_dirs": plan.cache_dirs,
+    }
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload))
+    tmp_path.replace(path)
@@ -0,0 +1,33 @@
+"""Filesystem locations used by llmbox.
+
+Kept free of third-party imports so that modules needed on every invocation
+(``cli``, ``docker``) can use them without pulling in pydantic or PyYAML.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+
+def default_config_dir() -> Path:
+    base = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"))
+    return base / "llmbox"
+
+
+def default_state_dir() -> Path:
+    base = Path(os.environ.get("XDG_STATE_HOME", Path.home() / ".local/state"))
+    return base / "llmbox"
+
+
+def default_data_dir() -> Path:
+    base = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local/share"))
+    return base / "llmbox"
+
+
+def config_file_path(config_dir: Path) -> Path:
+    return config_dir / "config.yaml"
+
+
+def state_file_path(state_dir: Path) -> Path:
+    return state_dir / "state.yaml"
@@ -0,0 +1,398 @@
+"""Warm pools of pre-initialized containers, so ``llmbox run`` can skip the entrypoint.
+
+A pool member is started from the profile's launch plan with ``docker run
+--detach`` and ``LLM_POOL_TTL`` set.  entrypoint.sh does all of its usual
+setup and then, instead of starting the session, marks the container ready
+(its health check turns healthy) and parks until it is claimed or the TTL
+runs out, at which point it exits and ``--rm`` removes it.
+
+``llmbox run`` claims a ready member by renaming it to an ordinary container
+name.  Renaming a container that was already renamed fails, so two launches
+never claim the same member.  The session is then started with ``docker exec
+-it ... /start-session.sh``, and the container is stopped when it ends.
+Members are told apart from claimed containers by the ``llmbox-pool-`` name
+prefix.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import secrets
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Sequence
+
+from .docker import container_name, engine_for
+from .fanout import Outcome, fan_out
+
+if TYPE_CHECKING:
+    from .engine import EngineClient
+
+POOL_PREFIX = "llmbox-pool-"
+POOL_LABEL = "llmbox.pool"
+KEY_LABEL = "llmbox.pool.key"
+EXPIRES_LABEL = "llmbox.pool.expires"
+
+# Members closer than this (seconds) to their TTL are not claimed: the
+# parked entrypoint could give up before the session tells it to stay.
+CLAIM_MARGIN = 30
+# docker run --detach returns once the container is created, but may pull first.
+START_TIMEOUT = 300.0
+# How long ``llmbox pool fill --wait`` waits for new members to turn healthy.
+READY_TIMEOUT = 300.0
+
+SESSION_COMMAND = ["/start-session.sh"]
+READY_ARGS = [
+    "--health-cmd",
+    "test -e /run/llmbox-ready",
+    "--health-interval",
+    "1s",
+    "--health-retries",
+    "1",
+]
+
+_PS_FORMAT = "\t".join(
+    [
+        "{{.ID}}",
+        "{{.Names}}",
+        "{{.Status}}",
+        f'{{{{.Label "{POOL_LABEL}"}}}}',
+        f'{{{{.Label "{KEY_LABEL}"}}}}',
+        f'{{{{.Label "{EXPIRES_LABEL}"}}}}',
+    ]
+)
+
+
+@dataclass(frozen=True)
+class PoolMember:
+    id: str
+    name: str
+    profile: str
+    key: str
+    """Launch plan key the member was started from; others are stale."""
+    expires: float
+    ready: bool
+    """The entrypoint finished and the member is parked."""
+
+
+def pool_lock_path(state_dir: Path, profile: str) -> Path:
+    return state_dir / "pool" / f"{profile}.lock"
+
+
+@contextmanager
+def fill_lock(path: Path) -> Iterator[bool]:
+    """Hold an exclusive lock on *path* if it is free; yields whether it was acquired."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def member_name(profile: str) -> str:
+    # Several members can start within the same second.
+    suffix = container_name(profile).removeprefix("llmbox-")
+    return f"{POOL_PREFIX}{suffix}-{secrets.token_hex(2)}"
+
+
+def pool_command(
+    plan_command: Sequence[str],
+    name_index: int,
+    profile: str,
+    key: str,
+    ttl: int,
+    now: float,
+) -> list[str]:
+    """Turn a cached ``docker run`` command into one that starts a detached pool member."""
+    command = list(plan_command)
+    command[name_index] = member_name(profile)
+    command[name_index + 1 : name_index + 1] = [
+        "--detach",
+        "--label",
+        f"{POOL_LABEL}={profile}",
+        "--label",
+        f"{KEY_LABEL}={key}",
+        "--label",
+        f"{EXPIRES_LABEL}={int(now + ttl)}",
+        "-e",
+        f"LLM_POOL_TTL={ttl}",
+        *READY_ARGS,
+    ]
+    return command
+
+
+def _member(
+    container_id: str, name: str, status: str, profile: str, key: str, expires: str
+) -> PoolMember | None:
+    name = name.lstrip("/")
+    if not name.startswith(POOL_PREFIX):
+        return None
+    try:
+        expiry = float(expires)
+    except ValueError:
+        expiry = 0.0
+    return PoolMember(
+        id=container_id[:12],
+        name=name,
+        profile=profile,
+        key=key,
+        expires=expiry,
+        ready="(healthy)" in status,
+    )
+
+
+def list_members(
+    profile: str | None, runner=subprocess.run, client: EngineClient | None = None
+) -> list[PoolMember]:
+    """Return the unclaimed pool members of *profile*, or of every profile if None."""
+    label = POOL_LABEL if profile is None else f"{POOL_LABEL}={profile}"
+    members: list[PoolMember | None] = []
+    engine = engine_for(runner, client)
+    if engine is not None:
+        from .engine import EngineError
+
+        try:
+            found = engine.ps(filters={"label": [label]})
+        except TimeoutError as exc:
+            raise RuntimeError(str(exc) or "Failed to list pool containers") from exc
+        except (OSError, EngineError):
+            engine = None
+            found = []
+        for container in found:
+            labels = container.get("Labels") or {}
+            members.append(
+                _member(
+                    container["Id"],
+                    (container.get("Names") or [""])[0],
+                    container.get("Status") or "",
+                    labels.get(POOL_LABEL, ""),
+                    labels.get(KEY_LABEL, ""),
+                    labels.get(EXPIRES_LABEL, ""),
+                )
+            )
+    if engine is None:
+        command = ["docker", "ps", "--filter", f"label={label}", "--format", _PS_FORMAT]
+        result = runner(command, check=False, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "Failed to list pool containers")
+        for line in result.stdout.splitlines():
+            fields = line.split("\t")
+            if len(fields) == 6:
+                members.append(_member(*fields))
+    return [member for member in members if member is not None]
+
+
+def _rename(
+    container: str, name: str, runner=subprocess.run, engine: EngineClient | None = None
+) -> bool:
+    if engine is not None:
+        from .engine import EngineError
+
+        try:
+            engine.rename(container, name)
+        except (OSError, EngineError):
+            return False
+        return True
+    result = runner(["docker", "rename", container, name], check=False, capture_output=True)
+    return result.returncode == 0
+
+
+def claim(
+    profile: str,
+    key: str,
+    name: str,
+    now: float,
+    runner=subprocess.run,
+    client: EngineClient | None = None,
+) -> str | None:
+    """Claim a ready member of *profile* started from plan *key* by renaming it to *name*.
+
+    Returns the claimed container's ID, or None if no member could be claimed.
+    """
+    engine = engine_for(runner, client)
+    candidates = [
+        member
+        for member in list_members(profile, runner=runner, client=engine)
+        if member.ready and member.key == key and member.expires - now > CLAIM_MARGIN
+    ]
+    # Oldest first, so the pool turns over instead of members idling to expiry.
+    for member in sorted(candidates, key=lambda member: member.expires):
+        if _rename(member.id, name, runner=runner, engine=engine):
+            return member.id
+    return None
+
+
+def stop_containers(
+    containers: Sequence[str],
+    runner=subprocess.run,
+    client: EngineClient | None = None,
+    grace: int = 1,
+) -> list[Outcome[None]]:
+    engine = engine_for(runner, client)
+
+    def stop_one(container: str, timeout: float | None) -> None:
+        if engine is not None:
+            from .engine import EngineError
+
+            try:
+                engine.stop(container, grace=grace)
+                return
+            except TimeoutError:
+                raise
+            except (OSError, EngineError):
+                pass
+        result = runner(
+            ["docker", "stop", "--time", str(grace), container],
+            check=False,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"Failed to stop {container}")
+
+    return fan_out(containers, stop_one)
+
+
+@dataclass(frozen=True)
+class FillResult:
+    started: list[str]
+    retired: list[str]
+    failures: list[tuple[str, str]]
+
+
+def fill(
+    profile: str,
+    key: str,
+    plan_command: Sequence[str],
+    name_index: int,
+    size: int,
+    ttl: int,
+    now: float,
+    runner=subprocess.run,
+    client: EngineClient | None = None,
+) -> FillResult:
+    """Retire expired and stale members of *profile* and start new ones up to *size*.
+
+    Members still starting count towards *size*.  New members are started
+    concurrently.
+    """
+    engine = engine_for(runner, client)
+    members = list_members(profile, runner=runner, client=engine)
+    stale = [member for member in members if member.key != key or member.expires <= now]
+    failures: list[tuple[str, str]] = []
+    if stale:
+        for outcome in stop_containers([m.id for m in stale], runner=runner, client=engine):
+            if not outcome.ok:
+                failures.append((outcome.target, outcome.error or ""))
+
+    missing = max(0, size - (len(members) - len(stale)))
+    commands = {}
+    for _ in range(missing):
+        command = pool_command(plan_command, name_index, profile, key, ttl, now)
+        commands[command[name_index]] = command
+
+    def start_one(name: str, timeout: float | None) -> str:
+        result = runner(
+            commands[name], check=False, capture_output=True, text=True, timeout=timeout
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "docker run failed")
+        return name
+
+    started: list[str] = []
+    for outcome in fan_out(list(commands), start_one, timeout=START_TIMEOUT):
+        if outcome.ok:
+            started.append(outcome.target)
+        else:
+            failures.append((outcome.target, outcome.error or ""))
+    return FillResult(started, [member.name for member in stale], failures)
+
+
+def wait_ready(
+    profile: str,
+    names: Sequence[str],
+    since: float,
+    timeout: float = READY_TIMEOUT,
+    runner=subprocess.run,
+    client: EngineClient | None = None,
+) -> list[str]:
+    """Wait for the members *names* of *profile*, started at *since*, to become ready.
+
+    The Engine API's event stream reports health changes as they happen,
+    including those since *since*; the docker CLI is polled instead.
+
+    Returns the members that are not ready, once all are or when one exits or
+    *timeout* seconds pass.
+
+    Raises:
+        RuntimeError: If the containers cannot be listed.
+    """
+    waiting = set(names)
+    deadline = time.time() + timeout
+    engine = engine_for(runner, client)
+    if engine is not None:
+        from .engine import EngineError
+
+        events = engine.events(
+            filters={
+                "type": ["container"],
+                "event": ["health_status", "die"],
+                "label": [f"{POOL_LABEL}={profile}"],
+            },
+            since=str(int(since)),
+            until=str(int(deadline) + 1),
+            timeout=timeout,
+        )
+        try:
+            for event in events:
+                name = ((event.get("Actor") or {}).get("Attributes") or {}).get("name")
+                if name not in waiting:
+                    continue
+                if event.get("Action") == "health_status: healthy":
+                    waiting.discard(name)
+                elif event.get("Action") == "die":
+                    break
+                if not waiting:
+                    break
+        except TimeoutError:
+            pass
+        except (OSError, EngineError):
+            engine = None
+        finally:
+            events.close()
+    if engine is None:
+        while waiting:
+            members = list_members(profile, runner=runner)
+            present = {member.name for member in members}
+            waiting -= {member.name for member in members if member.ready}
+            if not waiting or waiting - present or time.time() >= deadline:
+                break
+            time.sleep(1)
+    return sorted(waiting)
+
+
+def spawn_fill(profile: str) -> None:
+    """Top up the pool of *profile* from a detached ``llmbox pool fill`` process."""
+    subprocess.Popen(
+        [sys.executable, "-m", "llmbox", "pool", "fill", "--quiet", profile],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def run_session(container: str, runner=subprocess.run, client: EngineClient | None = None) -> None:
+    """Start the interactive session in a claimed member, then stop the container."""
+    try:
+        runner(["docker", "exec", "-it", container, *SESSION_COMMAND], check=True)
+    finally:
+        stop_containers([container], runner=runner, client=client)
@@ -0,0 +1,215 @@
+"""SQLite-backed profile store.
+
+An alternative to one YAML file per profile for setups with thousands of
+profiles: every lookup is an indexed query instead of a directory scan, and
+rename/copy/delete run in a single transaction.  Profiles, their volumes and
+persist_dir, and the default-profile state all live in ``profiles.db`` under
+the config directory.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .profiles import ProfileData, ProfileManager, validate_profile_name
+from .settings import State
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+
+def database_path(config_dir: Path) -> Path:
+    return config_dir / "profiles.db"
+
+
+class SqliteProfileManager(ProfileManager):
+    """ProfileManager storing profiles as JSON rows keyed by name.
+
+    Each profile row holds the same document the YAML backend writes, so new
+    ProfileData fields need no schema migration.
+    """
+
+    def __init__(self, config_dir: Path):
+        super().__init__(config_dir)
+        self.db_path = database_path(config_dir)
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.config_dir.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode; _transaction() issues BEGIN IMMEDIATE explicitly so
+            # existence checks and the writes that depend on them are atomic.
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _exists(self, profile: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM profiles WHERE name = ?", (profile,)).fetchone()
+        return row is not None
+
+    def _require(self, profile: str) -> None:
+        if not self._exists(profile):
+            raise FileNotFoundError(f"Profile {profile} does not exist")
+
+    def _reject_existing(self, profile: str) -> None:
+        if self._exists(profile):
+            raise FileExistsError(f"Profile {profile} already exists")
+
+    def list_profiles(self) -> list[str]:
+        return [row[0] for row in self.conn.execute("SELECT name FROM profiles ORDER BY name")]
+
+    def first_profile(self) -> str | None:
+        row = self.conn.execute("SELECT name FROM profiles ORDER BY name LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def exists(self, profile: str) -> bool:
+        return self._exists(validate_profile_name(profile))
+
+    def load(self, profile: str) -> ProfileData:
+        validate_profile_name(profile)
+        row = self.conn.execute("SELECT data FROM profiles WHERE name = ?", (profile,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Profile {profile} does not exist")
+        return ProfileData.model_validate_json(row[0])
+
+    def fingerprint(self, profile: str) -> bytes:
+        validate_profile_name(profile)
+        row = self.conn.execute("SELECT data FROM profiles WHERE name = ?", (profile,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Profile {profile} does not exist")
+        return row[0].encode()
+
+    def save(self, profile: str, data: ProfileData) -> None:
+        validate_profile_name(profile)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO profiles (name, data) VALUES (?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET data = excluded.data",
+                (profile, data.model_dump_json()),
+            )
+
+    def create(self, profile: str) -> ProfileData:
+        validate_profile_name(profile)
+        data = ProfileData()
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO profiles (name, data) VALUES (?, ?)",
+                    (profile, data.model_dump_json()),
+                )
+        except sqlite3.IntegrityError:
+            raise FileExistsError(f"Profile {profile} already exists") from None
+        return data
+
+    def delete(self, profiles: Iterable[str]) -> None:
+        names = [validate_profile_name(profile) for profile in profiles]
+        with self._transaction() as conn:
+            for name in names:
+                self._require(name)
+                conn.execute("DELETE FROM profiles WHERE name = ?", (name,))
+
+    def rename(self, old: str, new: str) -> None:
+        validate_profile_name(old)
+        validate_profile_name(new)
+        with self._transaction() as conn:
+            self._require(old)
+            self._reject_existing(new)
+            conn.execute("UPDATE profiles SET name = ? WHERE name = ?", (new, old))
+
+    def copy(self, source: str, destination: str) -> None:
+        if source == destination:
+            raise ValueError("Source and destination profiles must differ")
+        validate_profile_name(source)
+        validate_profile_name(destination)
+        with self._transaction() as conn:
+            self._require(source)
+            self._reject_existing(destination)
+            conn.execute(
+                "INSERT INTO profiles (name, data) SELECT ?, data FROM profiles WHERE name = ?",
+                (destination, source),
+            )
+
+    def load_state(self) -> State:
+        rows = self.conn.execute("SELECT key, value FROM state").fetchall()
+        # Keys a newer or older llmbox wrote must not make the state unreadable.
+        return State.model_validate(
+            {key: json.loads(value) for key, value in rows if key in State.model_fields}
+        )
+
+    def save_state(self, state: State) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO state (key, value) VALUES (?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [(key, json.dumps(value)) for key, value in state.model_dump().items()],
+            )
+
+    def import_from(self, source: ProfileManager) -> int:
+        """Replace the database contents with the profiles and state from *source*.
+
+        Runs as a single transaction and returns the number of profiles imported.
+        """
+        rows = [(name, source.load(name).model_dump_json()) for name in source.list_profiles()]
+        state = source.load_state()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM profiles")
+            conn.executemany(
+                "INSERT INTO profiles (name, data) VALUES (?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET data = excluded.data",
+                rows,
+            )
+            conn.executemany(
+                "INSERT INTO state (key, value) VALUES (?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [(key, json.dumps(value)) for key, value in state.model_dump().items()],
+            )
+        return len(rows)
+
+    def export_to(self, target: ProfileManager) -> int:
+        """Make *target* mirror the database: every profile, and the state if it has a state dir.
+
+        Profiles in *target* that are not in the database are removed.  Returns
+        the number of profiles exported.
+        """
+        exported: set[str] = set()
+        for name, data in self.conn.execute("SELECT name, data FROM profiles ORDER BY name"):
+            target.save(name, ProfileData.model_validate_json(data))
+            exported.add(name)
+        target.delete(set(target.list_profiles()) - exported)
+        if target.state_dir is not None:
+            target.save_state(self.load_state())
+        return len(exported)
@@ -2,20 +2,67 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
-from typing import Iterable, Sequence
+from typing import Iterable, Literal, Sequence
 
-import yaml
 from pydantic import BaseModel, ConfigDict, Field, field_serializer, field_validator
 
-from .settings import State
+from .settings import (
+    ProxySettings,
+    State,
+    UpdateMode,
+    load_config,
+    load_state,
+    read_yaml_mapping,
+    save_state,
+    write_yaml_file,
+)
 from .volumes import VolumeMount, parse_mount_spec
 
 PROFILE_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
 
 
+class BlocklistPolicy(BaseModel):
+    """How a profile's proxy filter relates to the global blocklist.
+
+    ``entries`` use the ``blocklist.txt`` syntax; see blocklist_layers.
+    """
+
+    mode: Literal["inherit", "extend", "replace", "allowlist"] = "inherit"
+    entries: list[str] = Field(default_factory=list)
+
+    model_config = ConfigDict(extra="forbid")
+
+    @field_validator("entries")
+    @classmethod
+    def _strip_entries(cls, value: list[str]) -> list[str]:
+        return [entry.strip() for entry in value if entry.strip()]
+
+
+class ProfileSnapshot(BaseModel):
+    """An image committed from one of the profile's containers; see snapshots."""
+
+    image: str
+    base_image: str
+    """The image the committed container was started from, by name ..."""
+    base_id: str
+    """... and by ID at the time; the snapshot is stale once they differ."""
+
+    model_config = ConfigDict(extra="forbid")
+
+
 class ProfileData(BaseModel):
     volumes: list[VolumeMount] = Field(default_factory=list)
     persist_dir: str | None = None
+    blocklist: BlocklistPolicy = Field(default_factory=BlocklistPolicy)
+    pool_size: int = Field(default=0, ge=0)
+    """Warm containers to keep ready for ``llmbox run``; see pool."""
+    update_ttl: int | None = Field(default=None, ge=0)
+    """Overrides the global ``update_ttl`` for this profile."""
+    update_mode: UpdateMode | None = None
+    """Overrides the global ``update_mode`` for this profile."""
+    proxy: ProxySettings = Field(default_factory=ProxySettings)
+    """Overrides the global ``proxy`` settings field by field."""
+    snapshot: ProfileSnapshot | None = None
 
     model_config = ConfigDict(extra="forbid")
 
@@ -51,8 +98,14 @@ def validate_profile_name(name: str) -> str:
 
 
 class ProfileManager:
-    def __init__(self, config_dir: Path):
+    """Profile storage backed by one YAML file per profile under ``profiles/``.
+
+    State (the default profile) lives in ``state.yaml`` under *state_dir*.
+    """
+
+    def __init__(self, config_dir: Path, state_dir: Path | None = None):
         self.config_dir = config_dir
+        self.state_dir = state_dir
         self.profiles_dir = config_dir / "profiles"
 
     def _profile_path(self, profile: str) -> Path:
@@ -65,23 +118,29 @@ class ProfileManager:
         profiles = [path.stem for path in self.profiles_dir.glob("*.yaml") if path.is_file()]
         return sorted(profiles)
 
+    def first_profile(self) -> str | None:
+        """Return the alphabetically first profile name, if any."""
+        return min(self.list_profiles(), default=None)
+
     def exists(self, profile: str) -> bool:
         return self._profile_path(profile).exists()
 
     def load(self, profile: str) -> ProfileData:
-        path = self._profile_path(profile)
-        if not path.exists():
+        loaded = read_yaml_mapping(self._profile_path(profile), "Profile file")
+        if loaded is None:
             raise FileNotFoundError(f"Profile {profile} does not exist")
-
-        loaded = yaml.safe_load(path.read_text()) or {}
-        if not isinstance(loaded, dict):
-            raise ValueError(f"Profile file {path} must contain a mapping")
         return ProfileData.model_validate(loaded)
 
+    def fingerprint(self, profile: str) -> bytes:
+        """Return the stored representation of *profile*, for change detection."""
+        try:
+            return self._profile_path(profile).read_bytes()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Profile {profile} does not exist") from None
+
     def save(self, profile: str, data: ProfileData) -> None:
         self.profiles_dir.mkdir(parents=True, exist_ok=True)
-        path = self._profile_path(profile)
-        path.write_text(yaml.safe_dump(data.model_dump(), sort_keys=True))
+        write_yaml_file(self._profile_path(profile), data.model_dump())
 
     def create(self, profile: str) -> ProfileData:
         path = self._profile_path(profile)
@@ -90,7 +149,7 @@ class ProfileManager:
 
         data = ProfileData()
         self.profiles_dir.mkdir(parents=True, exist_ok=True)
-        path.write_text(yaml.safe_dump(data.model_dump(), sort_keys=True))
+        write_yaml_file(path, data.model_dump())
         return data
 
     def ensure(self, profile: str) -> tuple[ProfileData, bool]:
@@ -128,6 +187,25 @@ class ProfileManager:
 
         self.save(destination, data)
 
+    def load_state(self) -> State:
+        if self.state_dir is None:
+            return State()
+        return load_state(self.state_dir)
+
+    def save_state(self, state: State) -> None:
+        if self.state_dir is None:
+            raise ValueError("ProfileManager was created without a state directory")
+        save_state(self.state_dir, state)
+
+
+def open_profile_manager(config_dir: Path, state_dir: Path) -> ProfileManager:
+    """Return the profile store selected by ``profile_store`` in config.yaml."""
+    if load_config(config_dir).profile_store == "sqlite":
+        from .profile_db import SqliteProfileManager
+
+        return SqliteProfileManager(config_dir)
+    return ProfileManager(config_dir, state_dir)
+
 
 def choose_existing_default(profiles: Sequence[str], default_profile: str | None) -> str | None:
     if default_profile and default_profile in profiles:
@@ -135,14 +213,35 @@ def choose_existing_default(profiles: Sequence[str], default_profile: str | None
     return None
 
 
+def existing_default(manager: ProfileManager, state: State) -> str | None:
+    """Return the recorded default profile if it still exists.
+
+    Unlike choose_existing_default() this does a single lookup instead of
+    listing every profile.
+    """
+    name = state.default_profile
+    if not name:
+        return None
+    try:
+        return name if manager.exists(name) else None
+    except ValueError:
+        return None
+
+
+def fallback_default(manager: ProfileManager) -> str | None:
+    """Profile to use when there is no usable default: "default", else the first by name."""
+    if manager.exists("default"):
+        return "default"
+    return manager.first_profile()
+
+
 def resolve_default_profile(manager: ProfileManager, state: State) -> str:
     """Resolve the current default profile name.
 
     Raises:
         ValueError: If no default profile is set or it no longer exists.
     """
-    profiles = manager.list_profiles()
-    chosen = choose_existing_default(profiles, state.default_profile)
+    chosen = existing_default(manager, state)
     if chosen:
         return chosen
     raise ValueError("No default profile is set. Create one or set a default profile first.")
@@ -165,14 +264,13 @@ def resolve_profile_for_run(
             raise FileNotFoundError(f"Profile {profile} does not exist")
         return profile, False, None, False
 
-    profiles = manager.list_profiles()
-    chosen = choose_existing_default(profiles, state.default_profile)
+    chosen = existing_default(manager, state)
     if chosen:
         return chosen, False, None, False
 
     # No recorded default or missing
-    if profiles:
-        fallback = "default" if "default" in profiles else sorted(profiles)[0]
+    fallback = fallback_default(manager)
+    if fallback:
         return fallback, False, fallback, True
 
     # No profiles exist at all; create default
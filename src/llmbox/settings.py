@@ -1,46 +1,202 @@
 from __future__ import annotations
 
-import os
+from ipaddress import IPv4Address, IPv4Network
 from pathlib import Path
-from typing import Any, Callable, Mapping
+from typing import Any, Callable, Literal, Mapping
 
 import yaml
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_serializer, field_validator
 from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, SettingsConfigDict
 
+from .caches import CACHE_NAME as _CACHE_NAME
+from .caches import CacheMount
+from .paths import config_file_path, default_config_dir, default_state_dir, state_file_path
+
 ConfigSource = Callable[[BaseSettings], Mapping[str, Any]]
+UpdateMode = Literal["foreground", "background"]
+
+# libyaml is several times faster than the pure-Python loader; fall back when
+# PyYAML was built without it.
+try:
+    from yaml import CSafeDumper as _YamlDumper
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # pragma: no cover - depends on the PyYAML build
+    from yaml import SafeDumper as _YamlDumper
+    from yaml import SafeLoader as _YamlLoader
 
+# path -> ((st_mtime_ns, st_size), parsed document)
+_yaml_cache: dict[Path, tuple[tuple[int, int], Any]] = {}
 
-def default_config_dir() -> Path:
-    base = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"))
-    return base / "llmbox"
 
+ProxyEngine = Literal["tinyproxy", "llmproxy"]
+ProxyLogLevel = Literal["Critical", "Error", "Warning", "Notice", "Connect", "Info"]
 
-def default_state_dir() -> Path:
-    base = Path(os.environ.get("XDG_STATE_HOME", Path.home() / ".local/state"))
-    return base / "llmbox"
 
+class ProxySettings(BaseModel):
+    """Container proxy tuning; unset fields keep the defaults in llm-init.py."""
 
-def default_data_dir() -> Path:
-    base = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local/share"))
-    return base / "llmbox"
+    engine: ProxyEngine | None = None
+    """tinyproxy, or llmproxy.py, the asyncio proxy shipped in the image."""
+    max_clients: int | None = Field(default=None, gt=0)
+    timeout: int | None = Field(default=None, gt=0)
+    """Seconds an idle connection is kept open."""
+    log_level: ProxyLogLevel | None = None
+    connect_ports: list[int] | None = None
+    """Ports CONNECT may tunnel to; tinyproxy's default is 443 and 80 here."""
+
+    model_config = ConfigDict(extra="forbid")
 
+    @field_validator("connect_ports")
+    @classmethod
+    def _check_ports(cls, value: list[int] | None) -> list[int] | None:
+        if value is not None:
+            if not value:
+                raise ValueError("connect_ports must not be empty")
+            for port in value:
+                if not 0 < port < 65536:
+                    raise ValueError(f"Invalid port: {port}")
+        return value
+
+    def over(self, base: ProxySettings) -> ProxySettings:
+        """Return these settings with unset fields taken from *base*."""
+        return base.model_copy(update=self.model_dump(exclude_none=True))
+
+    def environment(self) -> dict[str, str]:
+        """The LLM_PROXY_* variables llm-init.py configures the proxy from."""
+        environment: dict[str, str] = {}
+        if self.engine is not None:
+            environment["LLM_PROXY_ENGINE"] = self.engine
+        if self.max_clients is not None:
+            environment["LLM_PROXY_MAX_CLIENTS"] = str(self.max_clients)
+        if self.timeout is not None:
+            environment["LLM_PROXY_TIMEOUT"] = str(self.timeout)
+        if self.log_level is not None:
+            environment["LLM_PROXY_LOG_LEVEL"] = self.log_level
+        if self.connect_ports is not None:
+            environment["LLM_PROXY_CONNECT_PORTS"] = ",".join(map(str, self.connect_ports))
+        return environment
+
+
+class CacheProxySettings(BaseModel):
+    """The host's package cache (``llmbox cache-proxy serve``) and whether containers use it."""
+
+    enabled: bool = False
+    """Point npm, pip, uv and dnf in new containers at the cache."""
+    port: int = Field(default=3143, gt=0, lt=65536)
+    bind: str | None = None
+    """Address to listen on; docker_host_ip, or the docker bridge's gateway, when unset."""
+    max_size: int = Field(default=20 * 1024**3, gt=0)
+    """Bytes stored before the least recently used downloads are evicted."""
+    metadata_ttl: int = Field(default=300, ge=0)
+    """Seconds package metadata is served before upstream is asked again."""
+    mirrors: dict[str, str] = Field(
+        default_factory=lambda: {
+            "npm": "https://registry.npmjs.org",
+            "pypi": "https://pypi.org",
+            "pypi-files": "https://files.pythonhosted.org",
+            "fedora": "https://dl.fedoraproject.org/pub/fedora/linux",
+        }
+    )
+    """Path prefix -> upstream base URL."""
 
-def config_file_path(config_dir: Path) -> Path:
-    return config_dir / "config.yaml"
+    model_config = ConfigDict(extra="forbid")
 
+    def environment(self) -> dict[str, str]:
+        """Variables pointing a container's package managers at the cache; none if disabled."""
+        if not self.enabled:
+            return {}
+        base = f"http://host.docker.internal:{self.port}"
+        return {
+            "LLM_CACHE_PROXY": base,
+            "NPM_CONFIG_REGISTRY": f"{base}/npm/",
+            "PIP_INDEX_URL": f"{base}/pypi/simple/",
+            "PIP_TRUSTED_HOST": "host.docker.internal",
+            "UV_DEFAULT_INDEX": f"{base}/pypi/simple/",
+        }
+
+
+class CacheMountSettings(BaseModel):
+    """A package-manager cache mounted into every container; see caches.py."""
+
+    target: str
+    """Where the cache is mounted in the container."""
+    backend: Literal["dir", "volume"] = "dir"
+    owner: Literal["user", "root"] = "user"
+    """Who writes the cache; the user's mount point is handed to them."""
+    max_size: int | None = Field(default=None, gt=0)
+    """Size ``llmbox cache prune`` trims the cache to."""
+    environment: dict[str, str] = Field(default_factory=dict)
+    """Variables the container gets while the cache is mounted."""
 
-def state_file_path(state_dir: Path) -> Path:
-    return state_dir / "state.yaml"
+    model_config = ConfigDict(extra="forbid")
+
+    @field_validator("target")
+    @classmethod
+    def _check_target(cls, value: str) -> str:
+        if not value.startswith("/"):
+            raise ValueError(f"Cache target must be an absolute path: {value}")
+        return value
+
+
+def _default_caches() -> dict[str, CacheMountSettings]:
+    return {
+        # dnf runs as root; a volume keeps root-owned files off the host.
+        "dnf": CacheMountSettings(target="/var/cache/libdnf5", backend="volume", owner="root"),
+        # The cache is on another filesystem than the projects, so uv
+        # cannot hardlink from it.
+        "uv": CacheMountSettings(
+            target="/home/llm/.cache/uv", environment={"UV_LINK_MODE": "copy"}
+        ),
+        "npm": CacheMountSettings(target="/home/llm/.npm"),
+    }
 
 
 class GlobalConfig(BaseModel):
     image_name: str = "llm"
     volumes: list[str] = Field(default_factory=list)
     persist_dir: str | None = None
+    profile_store: Literal["yaml", "sqlite"] = "yaml"
+    pool_ttl: int = Field(default=1800, gt=0)
+    """Seconds an unclaimed warm pool container is kept before it retires."""
+    update_ttl: int = Field(default=86400, ge=0)
+    """Seconds between upstream checks for coding agent updates."""
+    update_mode: UpdateMode = "foreground"
+    """Whether the shell waits for agent updates or they run behind it."""
+    history_shards: bool = False
+    """Give each profile its own bash history file; see compact-history.py."""
+    history_max_entries: int = Field(default=100_000, gt=0)
+    history_max_age_days: int | None = Field(default=None, gt=0)
+    docker_subnet: IPv4Network | None = None
+    """The containers' Docker network; detected in each container when unset."""
+    docker_host_ip: IPv4Address | None = None
+    """What host.docker.internal resolves to; detected when unset."""
+    proxy: ProxySettings = Field(default_factory=ProxySettings)
+    cache_proxy: CacheProxySettings = Field(default_factory=CacheProxySettings)
+    caches: dict[str, CacheMountSettings] = Field(default_factory=_default_caches)
+    """Package-manager caches kept across containers, by name."""
 
     model_config = ConfigDict(extra="forbid")
 
+    @field_validator("caches")
+    @classmethod
+    def _check_cache_names(
+        cls, value: dict[str, CacheMountSettings]
+    ) -> dict[str, CacheMountSettings]:
+        for name in value:
+            if not _CACHE_NAME.fullmatch(name):
+                raise ValueError(f"Invalid cache name: {name!r}")
+        return value
+
+    def cache_mounts(self) -> list[CacheMount]:
+        return [
+            CacheMount(name, cache.target, cache.backend, cache.owner, cache.environment)
+            for name, cache in self.caches.items()
+        ]
+
+    @field_serializer("docker_subnet", "docker_host_ip")
+    def _serialize_address(self, value: IPv4Network | IPv4Address | None) -> str | None:
+        return None if value is None else str(value)
+
 
 class State(BaseModel):
     default_profile: str | None = None
@@ -83,6 +239,8 @@ class ConfigFileSource(PydanticBaseSettingsSource):
         self.init_settings = init_settings
         self.env_settings = env_settings
 
+        self._data: dict[str, Any] | None = None
+
     def __call__(self) -> dict[str, Any]:
         return self._load()
 
@@ -93,6 +251,11 @@ class ConfigFileSource(PydanticBaseSettingsSource):
         return None, field_name, False
 
     def _load(self) -> dict[str, Any]:
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    def _read(self) -> dict[str, Any]:
         init_data = dict(self.init_settings())
         env_data = dict(self.env_settings())
 
@@ -115,41 +278,83 @@ def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
+def read_yaml_file(path: Path) -> Any:
+    """Parse the YAML document at *path*.
+
+    Results are cached per process and reused for as long as the file's mtime
+    and size are unchanged, so repeated loads within one command only cost a
+    stat().  The returned object is shared with the cache and must not be
+    mutated.
+
+    Raises:
+        FileNotFoundError: If *path* does not exist.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        _yaml_cache.pop(path, None)
+        raise
+
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _yaml_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    loaded = yaml.load(path.read_bytes(), Loader=_YamlLoader)
+    _yaml_cache[path] = (key, loaded)
+    return loaded
+
+
+def read_yaml_mapping(path: Path, description: str) -> dict[str, Any] | None:
+    """Like read_yaml_file(), but return None for a missing file and require a mapping.
+
+    An empty file reads as an empty mapping.  *description* names the file in
+    error messages, e.g. ``"Config file"``.
+    """
+    try:
+        loaded = read_yaml_file(path)
+    except FileNotFoundError:
+        return None
+    if loaded is None:
+        return {}
+    if not isinstance(loaded, dict):
+        raise ValueError(f"{description} {path} must contain a mapping")
+    return loaded
+
+
+def write_yaml_file(path: Path, data: Any) -> None:
+    """Write *data* to *path* as YAML and drop any cached parse of the old contents."""
+    path.write_text(yaml.dump(data, Dumper=_YamlDumper, sort_keys=True))
+    _yaml_cache.pop(path, None)
+
+
 def load_config(config_dir: Path) -> GlobalConfig:
-    cfg_path = config_file_path(config_dir)
-    if not cfg_path.exists():
+    loaded = read_yaml_mapping(config_file_path(config_dir), "Config file")
+    if loaded is None:
         return GlobalConfig()
-    loaded = yaml.safe_load(cfg_path.read_text()) or {}
-    if not isinstance(loaded, dict):
-        raise ValueError(f"Config file {cfg_path} must contain a mapping")
     return GlobalConfig.model_validate(loaded)
 
 
 def save_config(config_dir: Path, config: GlobalConfig) -> None:
     ensure_dir(config_dir)
-    config_file_path(config_dir).write_text(yaml.safe_dump(config.model_dump(), sort_keys=True))
+    write_yaml_file(config_file_path(config_dir), config.model_dump())
 
 
 def load_state(state_dir: Path) -> State:
-    state_path = state_file_path(state_dir)
-    if not state_path.exists():
+    loaded = read_yaml_mapping(state_file_path(state_dir), "State file")
+    if loaded is None:
         return State()
 
-    loaded = yaml.safe_load(state_path.read_text()) or {}
-    if not isinstance(loaded, dict):
-        raise ValueError(f"State file {state_path} must contain a mapping")
-
-    # Backward compatibility: migrate legacy last_profile -> default_profile
-    if "default_profile" not in loaded and "last_profile" in loaded:
-        loaded["default_profile"] = loaded["last_profile"]
     # Drop legacy/unknown keys before validation to avoid extra errors
     allowed_keys = {"default_profile"}
-    loaded = {k: v for k, v in loaded.items() if k in allowed_keys}
+    data = {k: v for k, v in loaded.items() if k in allowed_keys}
+    # Backward compatibility: migrate legacy last_profile -> default_profile
+    if "default_profile" not in loaded and "last_profile" in loaded:
+        data["default_profile"] = loaded["last_profile"]
 
-    return State.model_validate(loaded)
+    return State.model_validate(data)
 
 
 def save_state(state_dir: Path, state: State) -> None:
     ensure_dir(state_dir)
-    state_file = state_file_path(state_dir)
-    state_file.write_text(yaml.safe_dump(state.model_dump(), sort_keys=True))
+    write_yaml_file(state_file_path(state_dir), state.model_dump())
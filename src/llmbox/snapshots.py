@@ -0,0 +1,231 @@
+"""Per-profile snapshot images, so customized profiles start ready to use.
+
+``llmbox profile commit`` runs ``docker commit`` on a running container of
+the profile and records the resulting tag in the profile, together with the
+ID of the base image it was started from.  ``llmbox run`` then starts the
+profile from the snapshot instead of the base image.  Volumes and bind
+mounts, including ``~/.persist``, are not part of a snapshot.
+
+The committed container's environment holds the settings of the launch it
+came from, and ``docker commit`` would make them defaults of the snapshot.
+So every variable is set back to the base image's value, or to an empty
+value if the base image does not define it.  Docker cannot unset a variable
+in an image, so the blanked names are listed in ``LLM_SNAPSHOT_UNSET`` and
+entrypoint.sh and start-session.sh unset those that are still empty.  Other
+empty variables, such as ``-e FOO=`` given on purpose, are left alone.
+
+When the base image is rebuilt its ID changes and the snapshot is discarded:
+the customizations only exist as container changes, so they cannot be
+replayed onto the new base.  The profile starts from the base image again
+until it is committed anew.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import subprocess
+from typing import TYPE_CHECKING, Mapping
+
+from .docker import engine_for
+from .pool import POOL_PREFIX
+
+if TYPE_CHECKING:
+    from .engine import EngineClient
+
+SNAPSHOT_REPOSITORY = "llmbox-snapshot"
+BASE_LABEL = "llmbox.snapshot.base"
+PROFILE_LABEL = "llmbox.profile"
+# Space-separated names of the variables a snapshot blanked.
+UNSET_VARIABLE = "LLM_SNAPSHOT_UNSET"
+
+_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def snapshot_tag(profile: str) -> str:
+    """Return the image tag for *profile*'s snapshot.
+
+    Profile names are valid tags except that a tag cannot start with ``.``
+    or ``-``.
+    """
+    tag = profile if profile[0].isalnum() or profile[0] == "_" else f"_{profile}"
+    return f"{SNAPSHOT_REPOSITORY}:{tag[:128]}"
+
+
+def image_id(image: str, runner=subprocess.run) -> str | None:
+    """Return the ID of *image*, or None if there is no such image.
+
+    Raises:
+        RuntimeError: If the docker CLI fails for another reason.
+    """
+    try:
+        result = runner(
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image],
+            check=False,
+            capture_output=True,
+            text=True,
+        )
+    except OSError as exc:
+        raise RuntimeError(f"Cannot inspect {image}: {exc}") from exc
+    if result.returncode == 0:
+        return result.stdout.strip()
+    if "no such image" in result.stderr.lower():
+        return None
+    raise RuntimeError(f"Cannot inspect {image}: {result.stderr.strip()}")
+
+
+def profile_containers(profile: str, runner=subprocess.run) -> list[tuple[str, str]]:
+    """Return (ID, name) of *profile*'s running containers, newest first.
+
+    Unclaimed warm pool members are left out; they were never used.
+
+    Raises:
+        RuntimeError: If the docker CLI fails.
+    """
+    try:
+        result = runner(
+            [
+                "docker",
+                "ps",
+                "--filter",
+                f"label={PROFILE_LABEL}={profile}",
+                "--format",
+                "{{.ID}}\t{{.Names}}",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as exc:
+        raise RuntimeError(f"Cannot list containers: {exc}") from exc
+    containers: list[tuple[str, str]] = []
+    for line in result.stdout.splitlines():
+        container, _, name = line.partition("\t")
+        if container and not name.startswith(POOL_PREFIX):
+            containers.append((container, name))
+    return containers
+
+
+def _parse_env(entries: object) -> dict[str, str]:
+    if not isinstance(entries, list):
+        return {}
+    variables: dict[str, str] = {}
+    for entry in entries:
+        variable, _, value = str(entry).partition("=")
+        variables[variable] = value
+    return variables
+
+
+def image_env(image: str, runner=subprocess.run) -> dict[str, str]:
+    """Return the environment *image* starts containers with.
+
+    Raises:
+        RuntimeError: If the docker CLI fails.
+    """
+    try:
+        result = runner(
+            ["docker", "image", "inspect", "--format", "{{json .Config.Env}}", image],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        return _parse_env(json.loads(result.stdout))
+    except (OSError, subprocess.CalledProcessError, ValueError) as exc:
+        raise RuntimeError(f"Cannot inspect {image}: {exc}") from exc
+
+
+def container_env(
+    container: str, runner=subprocess.run, client: EngineClient | None = None
+) -> dict[str, str]:
+    """Return the environment *container* was started with.
+
+    Raises:
+        RuntimeError: If the container cannot be inspected.
+    """
+    engine = engine_for(runner, client)
+    if engine is not None:
+        from .engine import EngineError
+
+        try:
+            return _parse_env((engine.inspect(container).get("Config") or {}).get("Env"))
+        except TimeoutError as exc:
+            raise RuntimeError(f"Cannot inspect {container}: {exc}") from exc
+        except (OSError, EngineError):
+            pass
+    try:
+        result = runner(
+            ["docker", "container", "inspect", "--format", "{{json .Config.Env}}", container],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        return _parse_env(json.loads(result.stdout))
+    except (OSError, subprocess.CalledProcessError, ValueError) as exc:
+        raise RuntimeError(f"Cannot inspect {container}: {exc}") from exc
+
+
+def _quote(value: str) -> str:
+    """Quote *value* for a Dockerfile ENV instruction, which expands ``$``."""
+    for special in ("\\", '"', "$"):
+        value = value.replace(special, f"\\{special}")
+    return f'"{value}"'
+
+
+def commit_command(
+    container: str,
+    tag: str,
+    base_id: str,
+    environment: Mapping[str, str],
+    base_environment: Mapping[str, str],
+) -> list[str]:
+    """Return the ``docker commit`` argv, resetting *environment* to *base_environment*.
+
+    Variables the base image does not define are blanked and listed in
+    ``LLM_SNAPSHOT_UNSET``, including those an earlier snapshot blanked.
+    """
+    command = ["docker", "commit"]
+    unset: list[str] = []
+    for variable, value in sorted(environment.items()):
+        if variable == UNSET_VARIABLE:
+            continue
+        if variable not in base_environment and _NAME.fullmatch(variable):
+            unset.append(variable)
+        base = base_environment.get(variable, "")
+        if value != base:
+            command.extend(["--change", f"ENV {variable}={_quote(base)}"])
+    if unset or UNSET_VARIABLE in environment:
+        command.extend(["--change", f"ENV {UNSET_VARIABLE}={_quote(' '.join(unset))}"])
+    command.extend(["--change", f"LABEL {BASE_LABEL}={base_id}", container, tag])
+    return command
+
+
+def commit(container: str, tag: str, base_id: str, runner=subprocess.run) -> str:
+    """Commit *container* as *tag* and return the new image's ID.
+
+    Raises:
+        RuntimeError: If the container or the base image cannot be inspected.
+        subprocess.CalledProcessError: If ``docker commit`` fails.
+    """
+    command = commit_command(
+        container,
+        tag,
+        base_id,
+        container_env(container, runner=runner),
+        image_env(base_id, runner=runner),
+    )
+    result = runner(command, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def is_current(snapshot: str, base_image: str, base_id: str, runner=subprocess.run) -> bool:
+    """Return whether *snapshot* still exists and *base_image* is still *base_id*.
+
+    Raises:
+        RuntimeError: If the docker CLI fails.
+    """
+    return image_id(snapshot, runner) is not None and image_id(base_image, runner) == base_id
+
+
+def remove(tag: str, runner=subprocess.run) -> None:
+    """Remove the snapshot tag; an image still in use by a container stays."""
+    runner(["docker", "image", "rm", tag], check=False, capture_output=True)
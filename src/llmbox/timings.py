@@ -0,0 +1,121 @@
+"""Startup timing for ``llmbox run --timings``.
+
+The container is started as ``docker create`` plus ``docker start -ai`` so
+both can be timed on the host, with a host directory mounted for
+entrypoint.sh to write its phase marks into.  Host and container times are
+both CLOCK_BOOTTIME, which the container shares with the host kernel, so
+they form one timeline.  When Docker runs in a VM the clocks differ; the
+docker start row is then left out and the phases are still shown relative
+to each other.
+"""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+TIMINGS_MOUNT = "/llmbox-timings"
+MARKS_FILE = "entrypoint.jsonl"
+# Recorded after every timed run, for tracking start latency over time.
+HISTORY_FILE = "timings.jsonl"
+
+
+def boottime() -> float:
+    return time.clock_gettime(time.CLOCK_BOOTTIME)
+
+
+@dataclass(frozen=True)
+class HostTimings:
+    create_started: float
+    created: float
+    """Also when ``docker start`` was issued."""
+    returncode: int
+    """Exit status of ``docker start``, i.e. of the session."""
+
+
+def timed_command(command: Sequence[str], name_index: int, host_dir: Path) -> list[str]:
+    """Add the timings mount and environment to a ``docker run`` command."""
+    command = list(command)
+    command[name_index + 1 : name_index + 1] = [
+        "-v",
+        f"{host_dir}:{TIMINGS_MOUNT}",
+        "-e",
+        f"LLM_TIMINGS_FILE={TIMINGS_MOUNT}/{MARKS_FILE}",
+    ]
+    return command
+
+
+def run_timed(command: Sequence[str], runner=subprocess.run) -> HostTimings:
+    """Run a ``docker run`` command as create + start, timing both from the host.
+
+    Raises:
+        subprocess.CalledProcessError: If the container cannot be created.
+    """
+    if list(command[:2]) != ["docker", "run"]:
+        raise ValueError("Expected a docker run command")
+    create_started = boottime()
+    created = runner(["docker", "create", *command[2:]], check=True, capture_output=True, text=True)
+    created_at = boottime()
+    container = created.stdout.strip()
+    started = runner(["docker", "start", "--attach", "--interactive", container], check=False)
+    return HostTimings(create_started, created_at, started.returncode)
+
+
+def read_marks(path: Path) -> list[tuple[str, float]]:
+    """Return the (phase, time) marks entrypoint.sh wrote to *path*, in order."""
+    marks: list[tuple[str, float]] = []
+    try:
+        lines = path.read_text().splitlines()
+    except FileNotFoundError:
+        return marks
+    for line in lines:
+        try:
+            record = json.loads(line)
+            marks.append((str(record["phase"]), float(record["t"])))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return marks
+
+
+def breakdown(host: HostTimings, marks: Sequence[tuple[str, float]]) -> list[tuple[str, float]]:
+    """Return (label, seconds) rows from ``docker create`` up to the session starting.
+
+    Each entrypoint phase lasts until the next mark; the final ``session``
+    (or ``parked``) mark ends the last phase.
+    """
+    rows = [("docker create", host.created - host.create_started)]
+    if not marks:
+        return rows
+    first = marks[0][1]
+    same_clock = host.created <= first <= boottime()
+    if same_clock:
+        rows.append(("docker start", first - host.created))
+    for (phase, started), (_, ended) in zip(marks, marks[1:]):
+        rows.append((phase, ended - started))
+    if same_clock:
+        rows.append(("total", marks[-1][1] - host.create_started))
+    else:
+        rows.append(("total (entrypoint only)", marks[-1][1] - first))
+    return rows
+
+
+def format_breakdown(rows: Sequence[tuple[str, float]]) -> str:
+    width = max((len(label) for label, _ in rows), default=0)
+    return "\n".join(f"{label:<{width}}  {seconds * 1000:8.0f}ms" for label, seconds in rows)
+
+
+def record(history: Path, profile: str, container: str, rows: Sequence[tuple[str, float]]) -> None:
+    """Append one timed run to *history* as a JSON line."""
+    history.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "at": round(time.time(), 3),
+        "profile": profile,
+        "container": container,
+        "phases": {label: round(seconds, 4) for label, seconds in rows},
+    }
+    with history.open("a") as handle:
+        handle.write(json.dumps(entry) + "\n")
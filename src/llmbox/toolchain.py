@@ -0,0 +1,210 @@
+"""A shared, host-managed install of the coding agents.
+
+Without it every container installs and updates Claude Code, Codex and
+Copilot in its own ``~/.local``.  ``llmbox toolchain update`` instead installs
+them once into a new generation directory under the data dir::
+
+    toolchain/
+      generations/1/   bin/ lib/node_modules/ versions.json
+      generations/2/
+      current -> generations/2
+
+build_run_command() mounts the generation ``current`` points at read-only at
+TOOLCHAIN_MOUNT, where the container's PATH puts it ahead of the image's
+copies.  A container keeps the generation it started with, so an update only
+affects containers started afterwards; older generations are removed once no
+running container uses them.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+from .paths import default_data_dir
+
+TOOLCHAIN_MOUNT = "/opt/llmbox-toolchain"
+TOOLCHAIN_LABEL = "llmbox.toolchain"
+VERSIONS_FILE = "versions.json"
+# Generations kept besides the current one, in use or not, for rolling back.
+KEEP_PREVIOUS = 1
+
+# Runs in a throwaway container of the llmbox image, with the new generation
+# mounted at TOOLCHAIN_MOUNT.  npm's bin links are relative, so the tree works
+# wherever it is mounted; the native Claude binary is copied into bin/.
+_INSTALL_SCRIPT = f"""
+set -euo pipefail
+mkdir -p "$HOME"
+npm install -g @openai/codex @github/copilot
+curl -fsSL https://claude.ai/install.sh | bash
+claude=$(readlink -f "$HOME/.local/bin/claude")
+install -m 755 "$claude" {TOOLCHAIN_MOUNT}/bin/claude
+modules={TOOLCHAIN_MOUNT}/lib/node_modules
+jq -n \\
+    --arg claude "${{claude##*/}}" \\
+    --arg codex "$(jq -r .version "$modules/@openai/codex/package.json")" \\
+    --arg copilot "$(jq -r .version "$modules/@github/copilot/package.json")" \\
+    '{{claude: $claude, codex: $codex, copilot: $copilot}}' \\
+    >{TOOLCHAIN_MOUNT}/{VERSIONS_FILE}
+"""
+
+
+def toolchain_dir(data_dir: Path | None = None) -> Path:
+    return (data_dir or default_data_dir()) / "toolchain"
+
+
+def current_name(root: Path) -> str | None:
+    """Return the name of the current generation, or None if there is none.
+
+    A single readlink, so it is cheap enough for every ``llmbox run``.
+    """
+    try:
+        return Path(os.readlink(root / "current")).name
+    except OSError:
+        return None
+
+
+def current_generation(root: Path) -> Path | None:
+    name = current_name(root)
+    if name is None:
+        return None
+    generation = root / "generations" / name
+    return generation if generation.is_dir() else None
+
+
+def generations(root: Path) -> list[Path]:
+    """Return the generation directories, oldest first."""
+    try:
+        entries = list((root / "generations").iterdir())
+    except FileNotFoundError:
+        return []
+    return sorted((entry for entry in entries if entry.name.isdigit()), key=lambda p: int(p.name))
+
+
+def new_generation(root: Path) -> Path:
+    existing = generations(root)
+    number = int(existing[-1].name) + 1 if existing else 1
+    generation = root / "generations" / str(number)
+    generation.mkdir(parents=True)
+    (generation / "bin").mkdir()
+    return generation
+
+
+def activate(root: Path, generation: Path) -> None:
+    """Point ``current`` at *generation*, replacing the old link atomically."""
+    link = root / f".current.{os.getpid()}"
+    link.unlink(missing_ok=True)
+    link.symlink_to(Path("generations") / generation.name)
+    link.replace(root / "current")
+
+
+def deactivate(root: Path) -> bool:
+    """Remove the ``current`` link; returns whether there was one."""
+    try:
+        (root / "current").unlink()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def read_versions(generation: Path) -> dict[str, str]:
+    try:
+        raw = json.loads((generation / VERSIONS_FILE).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    return (
+        {str(agent): str(version) for agent, version in raw.items()}
+        if isinstance(raw, dict)
+        else {}
+    )
+
+
+def install_command(image_name: str, generation: Path) -> list[str]:
+    """Return the ``docker run`` argv that installs the agents into *generation*.
+
+    The installer runs as the calling user, so the files stay removable from
+    the host, and without the sandbox's firewall and proxy, like an image build.
+    """
+    return [
+        "docker",
+        "run",
+        "--rm",
+        "--user",
+        f"{os.getuid()}:{os.getgid()}",
+        "--entrypoint",
+        "bash",
+        "-e",
+        "HOME=/tmp/toolchain-home",
+        "-e",
+        f"NPM_CONFIG_PREFIX={TOOLCHAIN_MOUNT}",
+        "-v",
+        f"{generation}:{TOOLCHAIN_MOUNT}",
+        image_name,
+        "-c",
+        _INSTALL_SCRIPT,
+    ]
+
+
+def generations_in_use(runner=subprocess.run) -> set[str]:
+    """Return the generations mounted by running containers, from their labels.
+
+    Raises:
+        RuntimeError: If the docker CLI fails.
+    """
+    try:
+        result = runner(
+            [
+                "docker",
+                "ps",
+                "--filter",
+                f"label={TOOLCHAIN_LABEL}",
+                "--format",
+                f'{{{{.Label "{TOOLCHAIN_LABEL}"}}}}',
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as exc:
+        raise RuntimeError(f"Cannot list containers: {exc}") from exc
+    return {line.strip() for line in result.stdout.splitlines() if line.strip()}
+
+
+def prune(root: Path, in_use: set[str], keep: int = KEEP_PREVIOUS) -> list[Path]:
+    """Remove generations that are not current, not in use and not among the *keep* newest."""
+    current = current_name(root)
+    older = [generation for generation in generations(root) if generation.name != current]
+    removed: list[Path] = []
+    for generation in older[: max(0, len(older) - keep)]:
+        if generation.name in in_use:
+            continue
+        shutil.rmtree(generation, ignore_errors=True)
+        removed.append(generation)
+    return removed
+
+
+def update(image_name: str, root: Path, runner=subprocess.run) -> tuple[Path, bool]:
+    """Install the latest agents into a new generation and make it current.
+
+    Returns the current generation and whether it changed; when the
+    versions match the current generation the new one is discarded.
+
+    Raises:
+        subprocess.CalledProcessError: If the install fails.
+    """
+    generation = new_generation(root)
+    try:
+        runner(install_command(image_name, generation), check=True)
+    except BaseException:
+        shutil.rmtree(generation, ignore_errors=True)
+        raise
+    current = current_generation(root)
+    versions = read_versions(generation)
+    if current is not None and versions and read_versions(current) == versions:
+        shutil.rmtree(generation, ignore_errors=True)
+        return current, False
+    activate(root, generation)
+    return generation, True
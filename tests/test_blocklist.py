@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from llmbox import cli
+from llmbox.blocklist import (
+    MAX_PATTERN_LENGTH,
+    CompiledLine,
+    compile_blocklist,
+    compile_lines,
+    compile_patterns,
+    is_blocked_by_domains,
+    parse_entry,
+    parse_source,
+    verify,
+)
+
+
+def _blocked(patterns: list[str], subject: str) -> bool:
+    return any(re.search(pattern, subject, re.IGNORECASE) for pattern in patterns)
+
+
+def test_parse_entry_kinds() -> None:
+    assert parse_entry("Example.COM") == ("domain", "example.com")
+    assert parse_entry("*.example.com") == ("subdomains", "example.com")
+    assert parse_entry("*.zip") == ("subdomains", "zip")
+    assert parse_entry(r"^[0-9.]+$") == ("regex", r"^[0-9.]+$")
+    assert parse_entry("re:example.com") == ("regex", "example.com")
+    assert parse_entry("localhost") == ("regex", "localhost")
+    assert parse_entry("  # comment") is None
+    assert parse_entry("") is None
+
+
+def test_compile_factors_suffixes_and_drops_redundant_entries() -> None:
+    source = parse_source(
+        ["example.com", "ads.example.com", "*.track.example.org", "google.com", r"foo\.bar"]
+    )
+    patterns = compile_patterns(source)
+    assert patterns[0] == r"foo\.bar"
+    assert len(patterns) == 3
+    assert r"(example|google)\.com" in patterns[1]
+
+    assert _blocked(patterns, "https://www.google.com/search?q=1")
+    assert _blocked(patterns, "ads.example.com:443")
+    assert _blocked(patterns, "a.track.example.org:443")
+    assert not _blocked(patterns, "track.example.org:443")
+    assert not _blocked(patterns, "notgoogle.com:443")
+    assert not _blocked(patterns, "http://example.invalid/?u=google.com")
+    assert _blocked(patterns, "http://user@google.com/")
+    assert _blocked(patterns, "http://ok.com:80@www.google.com/")
+    assert not _blocked(patterns, "http://google.com@example.invalid/")
+    assert is_blocked_by_domains(source, "http://ok.com@google.com/")
+    assert not is_blocked_by_domains(source, "http://google.com@example.invalid/?a@b")
+
+
+def test_compile_splits_long_groups_and_verifies() -> None:
+    names = [f"host{i:04d}.sub{i % 7}.example.com" for i in range(3000)]
+    source = parse_source([*names, *(f"site{i}.net" for i in range(500))])
+    lines = compile_lines(source)
+    assert all(len(line.pattern) <= MAX_PATTERN_LENGTH for line in lines)
+    assert len(lines) < 200
+    assert verify(source, lines) == []
+
+
+def test_verify_reports_a_broken_line() -> None:
+    source = parse_source(["example.com", "google.com"])
+    (line,) = compile_lines(source)
+    broken = CompiledLine(line.pattern.replace("google", "gogle"), line.domains, line.subdomains)
+    assert "google.com:443" in verify(source, [broken])
+    assert "missing google.com" in verify(
+        source, [CompiledLine(line.pattern, line.domains - {"google.com"}, line.subdomains)]
+    )
+
+
+def test_compile_blocklist_seeds_source_from_filter_file(tmp_path: Path) -> None:
+    filter_dir = tmp_path / "proxy"
+    filter_dir.mkdir()
+    (filter_dir / "blocklist").write_text("^[0-9.]+$\nexample.com\n")
+
+    result = compile_blocklist(tmp_path)
+    assert (tmp_path / "blocklist.txt").read_text() == "^[0-9.]+$\nre:example.com\n"
+    assert result.patterns == ["^[0-9.]+$", "example.com"]
+    lines = (filter_dir / "blocklist").read_text().splitlines()
+    assert lines[0].startswith("# Generated by llmbox blocklist compile")
+    assert lines[1:] == result.patterns
+
+    # Recompiling from the seeded source gives the same result.
+    assert compile_blocklist(tmp_path).patterns == result.patterns
+
+
+def test_blocklist_compile_cli_benchmark(tmp_path: Path, monkeypatch) -> None:
+    config_base = tmp_path / "config"
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(config_base))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    source = config_base / "llmbox" / "blocklist.txt"
+    source.parent.mkdir(parents=True)
+    source.write_text("".join(f"tracker{i}.example.com\n" for i in range(50)))
+
+    result = CliRunner().invoke(cli.cli, ["blocklist", "compile", "--benchmark"])
+    assert result.exit_code == 0, result.output
+    assert "Compiled 50 domains (0 redundant) and 0 regexes" in result.output
+    assert "Per-request match cost" in result.output
+    assert (config_base / "llmbox" / "proxy" / "blocklist").is_file()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from llmbox import blocklist_layers, cli
+from llmbox.blocklist_layers import DEFAULT_DENY_MARKER, profile_filter_dir
+
+
+@pytest.fixture
+def config_dir(tmp_path: Path) -> Path:
+    filter_dir = tmp_path / "config" / "proxy"
+    filter_dir.mkdir(parents=True)
+    (filter_dir / "blocklist").write_text("# Generated\n^global\\.example$\n")
+    return tmp_path / "config"
+
+
+def _patterns(directory: Path) -> list[str]:
+    lines = (directory / "blocklist").read_text().splitlines()
+    return [line for line in lines if not line.startswith("#")]
+
+
+def test_modes_layer_over_the_global_filter(config_dir: Path, tmp_path: Path) -> None:
+    data_dir = tmp_path / "data"
+    assert profile_filter_dir(config_dir, "loose", "inherit", ["x.com"], data_dir) is None
+
+    extended = profile_filter_dir(config_dir, "dev", "extend", ["re:^extra$"], data_dir)
+    assert extended is not None
+    assert extended == data_dir / "blocklists" / "profiles" / "dev" / "extend"
+    assert _patterns(extended) == ["^global\\.example$", "^extra$"]
+
+    replaced = profile_filter_dir(config_dir, "tight", "replace", ["re:^only$"], data_dir)
+    assert replaced is not None
+    assert _patterns(replaced) == ["^only$"]
+    assert not (replaced / DEFAULT_DENY_MARKER).exists()
+
+    # Containers started under replace keep a directory without the marker.
+    allowed = profile_filter_dir(config_dir, "tight", "allowlist", ["re:^only$"], data_dir)
+    assert allowed is not None and allowed != replaced
+    assert (allowed / DEFAULT_DENY_MARKER).exists()
+    assert not (replaced / DEFAULT_DENY_MARKER).exists()
+
+    with pytest.raises(ValueError, match="Unknown blocklist mode"):
+        profile_filter_dir(config_dir, "dev", "bogus", [], data_dir)
+
+
+def test_unchanged_inputs_reuse_the_cache_entry(
+    config_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data_dir = tmp_path / "data"
+    first = profile_filter_dir(config_dir, "a", "extend", ["example.com"], data_dir)
+    assert first is not None
+    inode = (first / "blocklist").stat().st_ino
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache entry should be reused")
+
+    monkeypatch.setattr(blocklist_layers, "compile_verified", fail)
+    profile_filter_dir(config_dir, "a", "extend", ["example.com"], data_dir)
+    shared = profile_filter_dir(config_dir, "b", "extend", ["example.com"], data_dir)
+    assert shared is not None
+    assert (first / "blocklist").stat().st_ino == inode
+    assert os.path.samefile(first / "blocklist", shared / "blocklist")
+    monkeypatch.undo()
+
+    # A changed global filter rebuilds extend layers; unused entries are pruned.
+    monkeypatch.setattr(blocklist_layers, "PRUNE_GRACE", -1)
+    (config_dir / "proxy" / "blocklist").write_text("^changed$\n")
+    profile_filter_dir(config_dir, "a", "extend", ["example.com"], data_dir)
+    profile_filter_dir(config_dir, "b", "extend", ["example.com"], data_dir)
+    profile_filter_dir(config_dir, "c", "replace", ["example.com"], data_dir)
+    assert _patterns(first)[0] == "^changed$"
+    assert len(list((data_dir / "blocklists" / "cache").iterdir())) == 2
+
+
+def test_run_mounts_the_profile_filter(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in ("CONFIG", "STATE", "DATA"):
+        monkeypatch.setenv(f"XDG_{name}_HOME", str(tmp_path / name.lower()))
+    monkeypatch.setattr(cli.time, "sleep", lambda seconds: None)
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+
+    result = runner.invoke(
+        cli.cli, ["config", "blocklist", "dev", "-m", "allowlist", "-a", "pypi.org"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "mode: allowlist\n  pypi.org" in result.output
+    assert runner.invoke(cli.cli, ["config", "blocklist", "dev", "-a", "not a domain"]).exit_code
+
+    filter_dir = tmp_path / "data" / "llmbox" / "blocklists" / "profiles" / "dev" / "allowlist"
+    result = runner.invoke(cli.cli, ["run", "-n", "dev"])
+    assert result.exit_code == 0, result.output
+    assert f"{filter_dir}:/etc/tinyproxy/filter:ro" in result.output
+    assert (filter_dir / DEFAULT_DENY_MARKER).exists()
+
+    # A plan cache hit still restores the filter directory.
+    (filter_dir / "blocklist").unlink()
+    result = runner.invoke(cli.cli, ["run", "--explain", "-n", "dev"])
+    assert "Launch plan: hit" in result.output
+    assert "pypi" in (filter_dir / "blocklist").read_text()
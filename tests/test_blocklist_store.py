@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from llmbox import cli
+from llmbox.blocklist_store import (
+    ImportStats,
+    iter_entries,
+    iter_import,
+    parse_import_line,
+    update_set,
+)
+
+
+def test_parse_import_line_formats() -> None:
+    assert parse_import_line("0.0.0.0 ads.example.com tracker.example.net # x") == (
+        ["ads.example.com", "tracker.example.net"],
+        False,
+    )
+    assert parse_import_line("127.0.0.1 localhost") == ([], False)
+    assert parse_import_line("::1 ip6-localhost") == ([], False)
+    assert parse_import_line("Example.COM.") == (["example.com"], False)
+    assert parse_import_line("*.example.org") == (["*.example.org"], False)
+    assert parse_import_line("# comment") == ([], False)
+    assert parse_import_line("||example.com^") == ([], True)
+    assert parse_import_line("example.com", format="hosts") == ([], False)
+
+
+def test_update_set_merges_sorted_runs(tmp_path: Path) -> None:
+    path = tmp_path / "domains.txt"
+    first = update_set(path, add=["c.com", "a.com", "b.com", "a.com"], run_size=2)
+    assert (first.added, first.total) == (3, 3)
+    assert list(iter_entries(path)) == ["a.com", "b.com", "c.com"]
+
+    second = update_set(path, add=["d.com", "b.com"], remove={"a.com", "zzz.com"}, run_size=1)
+    assert (second.added, second.removed, second.total) == (1, 1, 3)
+    assert path.read_text() == "b.com\nc.com\nd.com\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["domains.txt"]
+
+
+def test_iter_import_counts(tmp_path: Path) -> None:
+    stats = ImportStats()
+    handle = io.StringIO("0.0.0.0 a.com b.com\nnot a domain\nc.com\n")
+    assert list(iter_import([handle], stats=stats)) == ["a.com", "b.com", "c.com"]
+    assert (stats.read, stats.rejected) == (3, 1)
+
+
+def test_blocklist_cli_add_import_remove_list(tmp_path: Path, monkeypatch) -> None:
+    config_base = tmp_path / "config"
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(config_base))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    hosts = tmp_path / "hosts"
+    hosts.write_text("127.0.0.1 localhost\n0.0.0.0 ads.example.com\n0.0.0.0 track.example.net\n")
+    runner = CliRunner()
+
+    result = runner.invoke(cli.cli, ["blocklist", "add", "example.org", "*.zip"])
+    assert result.exit_code == 0, result.output
+    assert "Added 2 domains (2 managed)" in result.output
+
+    result = runner.invoke(cli.cli, ["blocklist", "import", str(hosts)])
+    assert result.exit_code == 0, result.output
+    assert "Imported 2 entries: 2 new (4 managed)" in result.output
+    compiled = (config_base / "llmbox" / "proxy" / "blocklist").read_text()
+    assert "track\\.example\\.net" in compiled
+
+    result = runner.invoke(cli.cli, ["blocklist", "remove", "ads.example.com"])
+    assert result.exit_code == 0, result.output
+    assert "Removed 1 domains (3 managed)" in result.output
+
+    result = runner.invoke(cli.cli, ["blocklist", "list", "example"])
+    assert result.output.split() == ["example.org", "track.example.net"]
+
+    result = runner.invoke(cli.cli, ["blocklist", "add", "^bad$"])
+    assert result.exit_code != 0
+    assert "Not a domain" in result.output
+
+
+def test_blocklist_cli_reports_write_errors(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+
+    def update_set(path, **kwargs):
+        raise OSError(28, "No space left on device", str(path))
+
+    monkeypatch.setattr("llmbox.blocklist_store.update_set", update_set)
+    runner = CliRunner()
+    for command in ("add", "remove"):
+        result = runner.invoke(cli.cli, ["blocklist", command, "example.org"])
+        assert result.exit_code == 1
+        assert "No space left on device" in result.output
+        assert not isinstance(result.exception, OSError)
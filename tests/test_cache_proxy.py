@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from llmbox.cache_proxy import CacheProxy, CacheProxyServer, CacheStore, is_immutable
+from llmbox.docker import bridge_gateway
+
+TARBALL = b"\x1f\x8b" + b"left-pad" * 4096
+
+
+class Registry(ThreadingHTTPServer):
+    """A stand-in npm registry that counts what it serves."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), RegistryHandler)
+        self.base = f"http://127.0.0.1:{self.server_address[1]}"
+        self.hits: Counter[str] = Counter()
+        self.not_modified = 0
+        self.delay = 0.0
+
+    def packument(self) -> bytes:
+        tarball = f"{self.base}/left-pad/-/left-pad-1.3.0.tgz"
+        return json.dumps({"name": "left-pad", "dist": {"tarball": tarball}}).encode()
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    server: Registry  # pyright: ignore[reportIncompatibleVariableOverride]
+
+    def do_GET(self) -> None:
+        self.server.hits[self.path] += 1
+        time.sleep(self.server.delay)
+        if self.path == "/left-pad":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.server.not_modified += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            body, content_type = self.server.packument(), "application/json"
+        elif self.path == "/left-pad/-/left-pad-1.3.0.tgz":
+            body, content_type = TARBALL, "application/octet-stream"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def _serve(server: ThreadingHTTPServer) -> None:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def registry() -> Iterator[Registry]:
+    server = Registry()
+    _serve(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _start_cache(tmp_path: Path, registry: Registry, **kwargs) -> tuple[CacheProxyServer, str]:
+    store = CacheStore(tmp_path / "cache", kwargs.pop("max_size", 10**9))
+    # Never go through a proxy from the environment.
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({})).open
+    proxy = CacheProxy(store, {"npm": registry.base}, opener=opener, **kwargs)
+    server = CacheProxyServer(("127.0.0.1", 0), proxy, quiet=True)
+    _serve(server)
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _get(url: str) -> tuple[bytes, str]:
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    with opener.open(url, timeout=10) as response:
+        return response.read(), response.headers.get("X-Cache", "")
+
+
+def test_tarball_fetched_once_and_metadata_rewritten(tmp_path: Path, registry: Registry) -> None:
+    server, base = _start_cache(tmp_path, registry)
+    try:
+        body, outcome = _get(f"{base}/npm/left-pad")
+        assert outcome == "MISS"
+        tarball_url = json.loads(body)["dist"]["tarball"]
+        assert tarball_url == f"{base}/npm/left-pad/-/left-pad-1.3.0.tgz"
+
+        results = [_get(tarball_url) for _ in range(3)]
+        assert [outcome for _, outcome in results] == ["MISS", "HIT", "HIT"]
+        assert all(body == TARBALL for body, _ in results)
+        assert registry.hits["/left-pad/-/left-pad-1.3.0.tgz"] == 1
+        assert _get(f"{base}/npm/left-pad")[1] == "HIT"
+        assert registry.hits["/left-pad"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_metadata_revalidated_and_served_stale_offline(tmp_path: Path, registry: Registry) -> None:
+    server, base = _start_cache(tmp_path, registry, metadata_ttl=0)
+    try:
+        _get(f"{base}/npm/left-pad")
+        assert _get(f"{base}/npm/left-pad")[1] == "REVALIDATED"
+        assert registry.not_modified == 1
+        _get(f"{base}/npm/left-pad/-/left-pad-1.3.0.tgz")
+
+        registry.shutdown()
+        registry.server_close()
+        body, outcome = _get(f"{base}/npm/left-pad")
+        assert outcome == "STALE"
+        assert json.loads(body)["name"] == "left-pad"
+        # Artifacts never need upstream once cached.
+        assert _get(f"{base}/npm/left-pad/-/left-pad-1.3.0.tgz") == (TARBALL, "HIT")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_concurrent_misses_share_one_fetch(tmp_path: Path, registry: Registry) -> None:
+    registry.delay = 0.2
+    server, base = _start_cache(tmp_path, registry)
+    url = f"{base}/npm/left-pad/-/left-pad-1.3.0.tgz"
+    bodies: list[bytes] = []
+    try:
+        threads = [threading.Thread(target=lambda: bodies.append(_get(url)[0])) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert bodies == [TARBALL] * 8
+    assert registry.hits["/left-pad/-/left-pad-1.3.0.tgz"] == 1
+
+
+def test_blob_evicted_while_serving_is_refetched(tmp_path: Path, registry: Registry) -> None:
+    server, base = _start_cache(tmp_path, registry)
+    proxy = server.proxy
+    url = f"{base}/npm/left-pad/-/left-pad-1.3.0.tgz"
+    fetch = proxy.fetch
+    evicted: list[bool] = []
+
+    def fetch_then_evict(*args, **kwargs):
+        result, outcome = fetch(*args, **kwargs)
+        if not evicted:
+            # As if another request's store() evicted it right after the lookup.
+            evicted.append(True)
+            proxy.store.evict(0)
+        return result, outcome
+
+    try:
+        _get(url)
+        proxy.fetch = fetch_then_evict
+        assert _get(url) == (TARBALL, "MISS")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert registry.hits["/left-pad/-/left-pad-1.3.0.tgz"] == 2
+
+
+def test_unknown_mirror_is_not_found(tmp_path: Path, registry: Registry) -> None:
+    server, base = _start_cache(tmp_path, registry)
+    try:
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _get(f"{base}/cargo/serde")
+        assert excinfo.value.code == 404
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _get(f"{base}/npm/missing")
+        assert excinfo.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_store_evicts_least_recently_used(tmp_path: Path) -> None:
+    store = CacheStore(tmp_path, max_size=350)
+    proxy = CacheProxy(store, {}, opener=lambda request, timeout: _Body(request.full_url))
+    for name in ("a", "b", "c"):
+        proxy.fetch(f"https://example.test/{name}.tgz", "*/*")
+        time.sleep(0.01)
+    assert proxy.fetch("https://example.test/a.tgz", "*/*")[1] == "hit"
+    proxy.fetch("https://example.test/d.tgz", "*/*")
+
+    assert store.usage() == (3, 300)
+    assert store.lookup("https://example.test/b.tgz") is None
+    assert store.lookup("https://example.test/a.tgz") is not None
+    assert store.evict(0) == (3, 300)
+    assert not [path for path in store.objects.rglob("*") if path.is_file()]
+    assert store.usage() == (0, 0)
+
+
+def test_store_size_is_counted_for_an_older_index(tmp_path: Path) -> None:
+    import sqlite3
+
+    # The first schema had no running total.
+    conn = sqlite3.connect(tmp_path / "index.db")
+    conn.execute("CREATE TABLE blobs (digest TEXT PRIMARY KEY, size INTEGER, accessed REAL)")
+    conn.execute("INSERT INTO blobs VALUES ('aa', 120, 0), ('bb', 30, 0)")
+    conn.commit()
+    conn.close()
+
+    store = CacheStore(tmp_path, max_size=1000)
+    assert store.usage() == (0, 150)
+    assert store.evict(100) == (1, 120)
+    assert store.usage() == (0, 30)
+
+
+class _Body:
+    """A 100-byte upstream response unique to *url*."""
+
+    def __init__(self, url: str) -> None:
+        import io
+        from email.message import Message
+
+        self._body = io.BytesIO(url.encode().ljust(100, b"."))
+        self.headers = Message()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._body.read(size)
+
+    def __enter__(self) -> _Body:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+
+def test_immutable_paths() -> None:
+    assert is_immutable("https://registry.npmjs.org/left-pad/-/left-pad-1.3.0.tgz")
+    assert is_immutable("https://files.pythonhosted.org/packages/ab/cd/pkg-1.0-py3-none-any.whl")
+    assert is_immutable("/fedora/updates/41/repodata/" + "0" * 64 + "-primary.xml.zst")
+    assert not is_immutable("https://pypi.org/simple/requests/")
+    assert not is_immutable("/fedora/updates/41/repodata/repomd.xml")
+
+
+def test_bridge_gateway_is_the_default_bind() -> None:
+    def docker(command, **kwargs):
+        return subprocess.CompletedProcess(command, 0, stdout="fd00::1 172.17.0.1 \n", stderr="")
+
+    assert bridge_gateway(runner=docker) == "172.17.0.1"
+    failed = subprocess.CompletedProcess([], 1, stdout="", stderr="no daemon")
+    assert bridge_gateway(runner=lambda command, **kwargs: failed) is None
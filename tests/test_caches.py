@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from llmbox import cli
+from llmbox.caches import CacheMount, list_files, parse_size, remove_files
+from llmbox.docker import build_run_command
+from llmbox.volumes import VolumeMount
+
+
+def test_build_run_command_mounts_caches(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    caches = [
+        CacheMount("dnf", "/var/cache/libdnf5", backend="volume", owner="root"),
+        CacheMount("uv", "/home/llm/.cache/uv", environment={"UV_LINK_MODE": "copy"}),
+        CacheMount("npm", "/home/llm/.npm"),
+    ]
+    cmd, _ = build_run_command(
+        image_name="llm",
+        profile="test",
+        global_volumes=[],
+        volumes=[VolumeMount(tmp_path / "npm", Path("/home/llm/.npm"))],
+        extra_args=[],
+        config_dir=tmp_path,
+        caches=caches,
+    )
+    uv_dir = tmp_path / "data" / "llmbox" / "caches" / "uv"
+    assert "llmbox-cache-dnf:/var/cache/libdnf5" in cmd
+    assert f"{uv_dir}:/home/llm/.cache/uv" in cmd
+    assert uv_dir.is_dir()
+    assert "UV_LINK_MODE=copy" in cmd
+    # The profile's volume takes the npm cache's place.
+    assert not any(arg.endswith("caches/npm:/home/llm/.npm") for arg in cmd)
+    assert "LLM_CACHE_DIRS=/home/llm/.cache/uv" in cmd
+
+
+def test_run_mounts_the_default_caches(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    launched: list[dict] = []
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: launched.append(kwargs))
+
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    assert [mount.name for mount in launched[0]["caches"]] == ["dnf", "uv", "npm"]
+
+
+def _write_cache(root: Path, files: dict[str, int]) -> None:
+    """Create 100-byte files whose use times are the given ages in seconds."""
+    now = 1_700_000_000
+    for relative, age in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now - age, now - age))
+
+
+def test_cache_prune_removes_least_recently_used(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    config_path = tmp_path / "config" / "llmbox" / "config.yaml"
+    config_path.parent.mkdir(parents=True)
+    config_path.write_text(
+        "caches:\n"
+        "  npm: {target: /home/llm/.npm, max_size: 250}\n"
+        "  uv: {target: /home/llm/.cache/uv}\n"
+    )
+    caches = tmp_path / "data" / "llmbox" / "caches"
+    _write_cache(caches / "npm", {"_cacache/old": 300, "_cacache/new": 10, "_logs/mid": 100})
+    _write_cache(caches / "uv", {"wheels/a": 5})
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ["cache", "ls"])
+    assert result.exit_code == 0, result.output
+    assert "300B of 250B" in result.output
+
+    result = runner.invoke(cli.cli, ["cache", "prune"])
+    assert result.exit_code == 0, result.output
+    assert "npm: removed 1 file(s), 100B" in result.output
+    assert "uv: no max_size set; skipped" in result.output
+    assert not (caches / "npm" / "_cacache" / "old").exists()
+    assert (caches / "npm" / "_logs" / "mid").exists()
+
+    result = runner.invoke(cli.cli, ["cache", "prune", "uv", "--all"])
+    assert "uv: removed 1 file(s)" in result.output
+    assert (caches / "npm" / "_cacache" / "new").exists()
+    assert runner.invoke(cli.cli, ["cache", "prune", "cargo"]).exit_code != 0
+
+
+def test_volume_caches_go_through_a_container() -> None:
+    calls: list[list[str]] = []
+    inputs: list[str | None] = []
+
+    def runner(command, check, capture_output, text, input=None):
+        calls.append(command)
+        inputs.append(input)
+        stdout = '["index/a", 10, 5.0]\n["pkgs/b.rpm", 20, 7.0]\n' if "-c" in command else ""
+        return subprocess.CompletedProcess(command, 0, stdout=stdout, stderr="")
+
+    cache = CacheMount("dnf", "/var/cache/libdnf5", backend="volume", owner="root")
+    files = list_files(cache, "llm", runner=runner)
+    assert calls[0] == ["docker", "volume", "inspect", "llmbox-cache-dnf"]
+    assert "llmbox-cache-dnf:/cache" in calls[1]
+    assert [(item.path, item.size) for item in files] == [("index/a", 10), ("pkgs/b.rpm", 20)]
+
+    remove_files(cache, files[:1], "llm", runner=runner)
+    assert "-i" in calls[2]
+    assert inputs[2] == "index/a"
+
+
+def test_parse_size() -> None:
+    assert parse_size("512M") == 512 * 1024**2
+    assert parse_size("20GiB") == 20 * 1024**3
+    assert parse_size("1000") == 1000
+    with pytest.raises(ValueError):
+        parse_size("big")
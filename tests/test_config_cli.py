@@ -130,3 +130,134 @@ def test_config_persist_dir_missing_profile_arg(tmp_path: Path, monkeypatch) ->
     result = runner.invoke(cli.cli, ["config", "persist-dir"], env=env)
     assert result.exit_code != 0
     assert "Missing argument" in result.output
+
+
+def test_config_update_ttl_reaches_the_container(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    launched: list[dict] = []
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: launched.append(kwargs))
+
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    assert runner.invoke(cli.cli, ["config", "update-ttl", "--global"]).output == "86400\n"
+    result = runner.invoke(cli.cli, ["config", "update-ttl", "--global", "3600"])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(cli.cli, ["config", "update-ttl", "dev", "0"])
+    assert "update-ttl for profile dev set to 0" in result.output
+
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    runner.invoke(cli.cli, ["config", "update-ttl", "dev", "--clear"])
+    assert runner.invoke(cli.cli, ["config", "update-ttl", "dev"]).output == "(not set)\n"
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    assert [kwargs["environment"]["LLM_UPDATE_TTL"] for kwargs in launched] == ["0", "3600"]
+
+
+def test_config_update_mode_reaches_the_container(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    launched: list[dict] = []
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: launched.append(kwargs))
+
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    assert runner.invoke(cli.cli, ["config", "update-mode", "-g"]).output == "foreground\n"
+    assert runner.invoke(cli.cli, ["config", "update-mode", "-g", "eventually"]).exit_code != 0
+    result = runner.invoke(cli.cli, ["config", "update-mode", "dev", "background"])
+    assert "update-mode for profile dev set to background" in result.output
+
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    runner.invoke(cli.cli, ["config", "update-mode", "dev", "--clear"])
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    modes = [kwargs["environment"]["LLM_UPDATE_MODE"] for kwargs in launched]
+    assert modes == ["background", "foreground"]
+
+
+def test_config_container_settings_reach_the_container(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    launched: list[dict] = []
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: launched.append(kwargs))
+    config_path = tmp_path / "config" / "llmbox" / "config.yaml"
+    config_path.parent.mkdir(parents=True)
+    config_path.write_text(
+        "docker_subnet: 172.17.0.0/16\ndocker_host_ip: 172.17.0.1\nhistory_shards: true\n"
+    )
+
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    result = runner.invoke(cli.cli, ["config", "update-ttl", "--global", "60"])
+    assert result.exit_code == 0, result.output
+    assert "docker_subnet: 172.17.0.0/16" in config_path.read_text()
+
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    environment = launched[0]["environment"]
+    assert environment["LLM_DOCKER_SUBNET"] == "172.17.0.0/16"
+    assert environment["LLM_DOCKER_HOST_IP"] == "172.17.0.1"
+    assert environment["LLM_PROFILE"] == "dev"
+    assert environment["LLM_HISTORY_SHARDS"] == "1"
+    assert "LLM_HISTORY_MAX_AGE_DAYS" not in environment
+
+    config_path.write_text("docker_subnet: not-a-network\n")
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code != 0
+
+
+def test_config_proxy_merges_profile_over_global(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    launched: list[dict] = []
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: launched.append(kwargs))
+
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    result = runner.invoke(
+        cli.cli, ["config", "proxy", "-g", "--max-clients", "400", "--engine", "llmproxy"]
+    )
+    assert "max_clients: 400" in result.output
+    result = runner.invoke(
+        cli.cli, ["config", "proxy", "dev", "--connect-port", "443", "--connect-port", "8443"]
+    )
+    assert "connect_ports: 443, 8443" in result.output
+    assert runner.invoke(cli.cli, ["config", "proxy", "dev", "--timeout", "0"]).exit_code != 0
+
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    environment = launched[0]["environment"]
+    assert environment["LLM_PROXY_MAX_CLIENTS"] == "400"
+    assert environment["LLM_PROXY_ENGINE"] == "llmproxy"
+    assert environment["LLM_PROXY_CONNECT_PORTS"] == "443,8443"
+    assert "LLM_PROXY_TIMEOUT" not in environment
+
+    runner.invoke(cli.cli, ["config", "proxy", "dev", "--clear"])
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    assert "LLM_PROXY_CONNECT_PORTS" not in launched[1]["environment"]
+
+
+def test_config_cache_proxy_points_containers_at_the_cache(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    launched: list[dict] = []
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: launched.append(kwargs))
+
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    assert "NPM_CONFIG_REGISTRY" not in launched[0]["environment"]
+
+    result = runner.invoke(
+        cli.cli, ["config", "cache-proxy", "--enable", "--port", "4000", "--max-size", "2G"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "enabled: True" in result.output
+    assert "max_size: 2.0GiB" in result.output
+    assert runner.invoke(cli.cli, ["config", "cache-proxy", "--max-size", "lots"]).exit_code != 0
+
+    assert runner.invoke(cli.cli, ["run", "dev"]).exit_code == 0
+    environment = launched[1]["environment"]
+    assert environment["LLM_CACHE_PROXY"] == "http://host.docker.internal:4000"
+    assert environment["NPM_CONFIG_REGISTRY"] == "http://host.docker.internal:4000/npm/"
+    assert environment["PIP_INDEX_URL"] == "http://host.docker.internal:4000/pypi/simple/"
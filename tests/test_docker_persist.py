@@ -58,3 +58,32 @@ def test_build_run_command_custom_persist(tmp_path: Path) -> None:
     )
     expected_spec = f"{persist}:/home/llm/.persist"
     assert expected_spec in cmd
+
+
+def test_build_run_command_mounts_blocklist_directory(tmp_path: Path) -> None:
+    cmd, _ = build_run_command(
+        image_name="llm",
+        profile="test",
+        global_volumes=[],
+        volumes=[],
+        extra_args=[],
+        config_dir=tmp_path,
+        persist_dir=str(tmp_path / "persist"),
+    )
+    assert f"{tmp_path / 'proxy'}:/etc/tinyproxy/filter:ro" in cmd
+    assert (tmp_path / "proxy" / "blocklist").is_file()
+
+
+def test_build_run_command_moves_legacy_blocklist(tmp_path: Path) -> None:
+    (tmp_path / "proxy_blocklist").write_text("example\\.com\n")
+    build_run_command(
+        image_name="llm",
+        profile="test",
+        global_volumes=[],
+        volumes=[],
+        extra_args=[],
+        config_dir=tmp_path,
+        persist_dir=str(tmp_path / "persist"),
+    )
+    assert (tmp_path / "proxy" / "blocklist").read_text() == "example\\.com\n"
+    assert not (tmp_path / "proxy_blocklist").exists()
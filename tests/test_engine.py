@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import socketserver
+import struct
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from llmbox import docker, engine, pool
+from llmbox.engine import DEFAULT_DOCKER_HOST, EngineClient, EngineError, _demultiplex
+
+CONTAINERS = [
+    {"Id": "aaaaaaaaaaaa1111", "Labels": {"llmbox.profile": "dev"}},
+    {"Id": "bbbbbbbbbbbb2222", "Labels": {"llmbox.profile": "dev"}},
+]
+
+
+def _frame(stream: int, data: bytes) -> bytes:
+    return struct.pack(">BxxxL", stream, len(data)) + data
+
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        self.connections = 0
+        self.requests: list[tuple[str, str, dict | None]] = []
+        self.exit_codes = {"aaaaaaaaaaaa": 0, "bbbbbbbbbbbb": 1}
+        self.execs: dict[str, str] = {}
+        self.events: list[dict] = [{"Action": "start"}, {"Action": "die"}]
+        self.version = {"ApiVersion": "1.41", "MinAPIVersion": "1.12"}
+        super().__init__(path, _Handler)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeDaemon  # pyright: ignore[reportIncompatibleVariableOverride]
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, payload: object) -> None:
+        self._send(status, json.dumps(payload).encode())
+
+    def _body(self) -> dict | None:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        self.server.requests.append(("GET", url.path, None))
+        query = parse_qs(url.query)
+        if url.path == "/version":
+            self._json(200, self.server.version)
+        elif url.path == "/v1.41/containers/json":
+            filters = json.loads(query["filters"][0])
+            wanted = filters["label"][0].split("=", 1)[1]
+            found = [c for c in CONTAINERS if c["Labels"]["llmbox.profile"] == wanted]
+            self._json(200, found)
+        elif url.path.startswith("/v1.41/containers/") and url.path.endswith("/json"):
+            name = url.path.split("/")[3]
+            if name == "missing":
+                self._json(404, {"message": "No such container: missing"})
+            else:
+                self._json(200, {"Id": name, "State": {"Running": True}})
+        elif url.path.startswith("/v1.41/exec/"):
+            exec_id = url.path.split("/")[3]
+            container = self.server.execs[exec_id]
+            self._json(200, {"ExitCode": self.server.exit_codes[container]})
+        elif url.path == "/v1.41/events":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            for event in self.server.events:
+                self.wfile.write(json.dumps(event).encode() + b"\n")
+            self.close_connection = True
+        else:
+            self._json(404, {"message": "not found"})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        body = self._body()
+        self.server.requests.append(("POST", url.path, body))
+        parts = url.path.split("/")
+        if url.path.endswith("/exec") and parts[2] == "containers":
+            exec_id = f"exec-{len(self.server.execs)}"
+            self.server.execs[exec_id] = parts[3]
+            self._json(201, {"Id": exec_id})
+        elif parts[2] == "exec" and parts[4] == "start":
+            container = self.server.execs[parts[3]]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.docker.raw-stream")
+            self.end_headers()
+            self.wfile.write(_frame(1, b"out "))
+            if self.server.exit_codes[container]:
+                self.wfile.write(_frame(2, b"no pid file"))
+            self.close_connection = True
+        else:
+            self._json(404, {"message": "not found"})
+
+
+@pytest.fixture
+def daemon() -> Iterator[FakeDaemon]:
+    # AF_UNIX paths are limited to ~100 bytes, which pytest's tmp_path can exceed.
+    with tempfile.TemporaryDirectory() as tmp:
+        server = FakeDaemon(str(Path(tmp) / "docker.sock"))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield server
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@pytest.fixture
+def client(daemon: FakeDaemon) -> Iterator[EngineClient]:
+    with EngineClient(f"unix://{daemon.server_address}", timeout=5) as engine:
+        yield engine
+
+
+def test_requests_reuse_one_connection(client: EngineClient, daemon: FakeDaemon) -> None:
+    assert len(client.ps(filters={"label": ["llmbox.profile=dev"]})) == 2
+    assert client.inspect("abc")["State"]["Running"] is True
+    assert client.ps(filters={"label": ["llmbox.profile=other"]}) == []
+    assert daemon.connections == 1
+
+
+def test_api_version_is_negotiated(client: EngineClient, daemon: FakeDaemon) -> None:
+    # An older daemon's version is used (the fixture's daemon speaks 1.41).
+    assert client.api_version() == "1.41"
+
+    daemon.version = {"ApiVersion": "1.52", "MinAPIVersion": "1.44"}
+    with EngineClient(f"unix://{daemon.server_address}", timeout=5) as newer:
+        assert newer.api_version() == "1.44"
+
+
+def test_default_client_needs_a_daemon_that_answers(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    not_a_socket = tmp_path / "docker.sock"
+    not_a_socket.touch()
+    monkeypatch.setenv("DOCKER_HOST", f"unix://{not_a_socket}")
+    engine.default_client.cache_clear()
+    try:
+        assert EngineClient.from_env() is not None
+        assert engine.default_client() is None
+    finally:
+        engine.default_client.cache_clear()
+
+
+def test_context_host_follows_the_current_context(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("DOCKER_CONFIG", str(tmp_path))
+    monkeypatch.delenv("DOCKER_CONTEXT", raising=False)
+    assert engine.context_host() == DEFAULT_DOCKER_HOST
+
+    (tmp_path / "config.json").write_text(json.dumps({"currentContext": "colima"}))
+    assert engine.context_host() is None
+
+    digest = hashlib.sha256(b"colima").hexdigest()
+    meta = tmp_path / "contexts" / "meta" / digest / "meta.json"
+    meta.parent.mkdir(parents=True)
+    host = "unix:///home/me/.colima/default/docker.sock"
+    meta.write_text(json.dumps({"Name": "colima", "Endpoints": {"docker": {"Host": host}}}))
+    assert engine.context_host() == host
+
+    monkeypatch.setenv("DOCKER_CONTEXT", "default")
+    assert engine.context_host() == DEFAULT_DOCKER_HOST
+
+    monkeypatch.delenv("DOCKER_CONTEXT")
+    (tmp_path / "contexts" / "tls" / digest).mkdir(parents=True)
+    assert engine.context_host() is None
+
+
+def test_failed_api_calls_fall_back_to_the_cli(tmp_path: Path) -> None:
+    calls: list[list[str]] = []
+
+    def runner(command, **kwargs):
+        calls.append(command)
+        return subprocess.CompletedProcess(command, 0, stdout="cccccccccccc\n", stderr="")
+
+    with EngineClient(f"unix://{tmp_path / 'gone.sock'}", timeout=5) as gone:
+        assert docker.list_profile_containers("dev", runner=runner, client=gone) == ["cccccccccccc"]
+    assert calls[0][:2] == ["docker", "ps"]
+
+
+def test_error_response_raises_engine_error(client: EngineClient) -> None:
+    with pytest.raises(EngineError, match="No such container") as excinfo:
+        client.inspect("missing")
+    assert excinfo.value.status == 404
+
+
+def test_exec_demultiplexes_output_and_reports_exit_code(client: EngineClient) -> None:
+    result = client.exec("bbbbbbbbbbbb", ["true"])
+    assert result.returncode == 1
+    assert result.stdout == "out "
+    assert result.stderr == "no pid file"
+
+
+def test_events_streams_json_lines(client: EngineClient) -> None:
+    actions = [event["Action"] for event in client.events(until="0")]
+    assert actions == ["start", "die"]
+
+
+def test_wait_ready_follows_health_events(client: EngineClient, daemon: FakeDaemon) -> None:
+    def health(name: str, action: str) -> dict:
+        return {"Action": action, "Actor": {"Attributes": {"name": name}}}
+
+    daemon.events = [
+        health("llmbox-pool-dev-a", "health_status: starting"),
+        health("llmbox-pool-dev-other", "health_status: healthy"),
+        health("llmbox-pool-dev-a", "health_status: healthy"),
+    ]
+    names = ["llmbox-pool-dev-a", "llmbox-pool-dev-b"]
+    assert pool.wait_ready("dev", names, since=0, timeout=5, client=client) == names[1:]
+
+    daemon.events.append(health("llmbox-pool-dev-b", "health_status: healthy"))
+    assert pool.wait_ready("dev", names, since=0, timeout=5, client=client) == []
+
+
+def test_reload_proxy_uses_engine_client(client: EngineClient, daemon: FakeDaemon) -> None:
+    def fail_runner(*args, **kwargs):
+        raise AssertionError("docker CLI should not be used")
+
+    containers, failures = docker.reload_proxy("dev", runner=fail_runner, client=client)
+    assert containers == ["aaaaaaaaaaaa", "bbbbbbbbbbbb"]
+    assert failures == [("bbbbbbbbbbbb", "no pid file")]
+    created = [body for method, path, body in daemon.requests if path.endswith("/exec")]
+    assert created[0] is not None
+    assert created[0]["Cmd"] == docker.RELOAD_PROXY_COMMAND
+
+
+def test_custom_runner_uses_docker_cli() -> None:
+    calls: list[list[str]] = []
+
+    def runner(command, **kwargs):
+        calls.append(command)
+        stdout = "abc123\n" if command[1] == "ps" else ""
+        return subprocess.CompletedProcess(command, 0, stdout=stdout, stderr="")
+
+    containers, failures = docker.reload_proxy("dev", runner=runner)
+    assert containers == ["abc123"]
+    assert failures == []
+    assert calls[1][:3] == ["docker", "exec", "abc123"]
+
+
+def test_from_env_falls_back_to_cli(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("DOCKER_HOST", f"unix://{tmp_path / 'absent.sock'}")
+    assert EngineClient.from_env() is None
+    monkeypatch.setenv("DOCKER_HOST", "ssh://example.com")
+    assert EngineClient.from_env() is None
+
+
+def test_demultiplex_splits_streams() -> None:
+    payload = _frame(1, b"a") + _frame(2, b"b") + _frame(1, b"c")
+    assert _demultiplex(payload) == (b"ac", b"b")
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from llmbox import cli
+from llmbox.fanout import fan_out
+
+
+def test_fan_out_bounds_concurrency_and_keeps_order() -> None:
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def operation(target: str, timeout: float | None) -> str:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        return target.upper()
+
+    outcomes = fan_out([f"c{i}" for i in range(10)], operation, max_workers=3)
+    assert [outcome.value for outcome in outcomes] == [f"C{i}" for i in range(10)]
+    assert all(outcome.ok for outcome in outcomes)
+    assert 1 < peak <= 3
+
+
+def test_fan_out_collects_failures_and_timeouts() -> None:
+    def operation(target: str, timeout: float | None) -> str:
+        if target == "slow":
+            raise subprocess.TimeoutExpired(["docker"], timeout or 0)
+        if target == "bad":
+            raise RuntimeError("no such container")
+        return "ok"
+
+    outcomes = fan_out(["good", "slow", "bad"], operation, timeout=2.5)
+    assert [(o.target, o.value, o.error) for o in outcomes] == [
+        ("good", "ok", None),
+        ("slow", None, "timed out after 2.5s"),
+        ("bad", None, "no such container"),
+    ]
+
+
+@pytest.fixture
+def cli_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
+    env = {
+        "XDG_CONFIG_HOME": str(tmp_path / "config"),
+        "XDG_STATE_HOME": str(tmp_path / "state"),
+    }
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return env
+
+
+def test_proxy_reload_all_targets_every_profile(cli_env, monkeypatch) -> None:
+    calls: list[str | None] = []
+
+    def fake_reload(profile):
+        calls.append(profile)
+        return ["abc123", "def456"], []
+
+    monkeypatch.setattr(cli, "reload_proxy", fake_reload)
+    result = CliRunner().invoke(cli.cli, ["proxy", "reload", "--all"], env=cli_env)
+    assert result.exit_code == 0, result.output
+    assert calls == [None]
+
+
+def test_proxy_reload_requires_profile_or_all(cli_env) -> None:
+    result = CliRunner().invoke(cli.cli, ["proxy", "reload"], env=cli_env)
+    assert result.exit_code != 0
+    assert "--all" in result.output
+
+
+def test_exec_reports_output_and_failures(cli_env, monkeypatch) -> None:
+    seen: dict[str, object] = {}
+
+    def fake_list(profile):
+        seen["profile"] = profile
+        return ["abc123", "def456"]
+
+    def fake_exec(containers, command, timeout, max_workers):
+        seen.update(command=command, timeout=timeout, jobs=max_workers)
+        return fan_out(
+            containers,
+            lambda target, _timeout: subprocess.CompletedProcess(
+                command, 0 if target == "abc123" else 2, stdout="hi\n", stderr=""
+            ),
+        )
+
+    monkeypatch.setattr(cli, "list_profile_containers", fake_list)
+    monkeypatch.setattr(cli, "exec_in_containers", fake_exec)
+    result = CliRunner().invoke(
+        cli.cli, ["exec", "--all", "-j", "4", "-t", "5", "--", "ls", "-la"], env=cli_env
+    )
+    assert result.exit_code != 0
+    assert seen == {"profile": None, "command": ("ls", "-la"), "timeout": 5.0, "jobs": 4}
+    assert "abc123: hi" in result.output
+    assert "def456: exited with status 2" in result.output
+    assert "Command failed in 1 of 2 containers" in result.output
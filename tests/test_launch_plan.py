@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from llmbox import cli
+
+
+@pytest.fixture
+def env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
+    values = {
+        "XDG_CONFIG_HOME": str(tmp_path / "config"),
+        "XDG_STATE_HOME": str(tmp_path / "state"),
+        "XDG_DATA_HOME": str(tmp_path / "data"),
+    }
+    for key, value in values.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(cli.time, "sleep", lambda seconds: None)
+    return values
+
+
+def test_repeat_launch_hits_plan_cache(tmp_path: Path, env: dict[str, str]) -> None:
+    runner = CliRunner()
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    runner.invoke(cli.cli, ["volume", "add", "dev", str(repo)])
+
+    first = runner.invoke(cli.cli, ["run", "--explain", "-n", "dev"])
+    assert first.exit_code == 0
+    assert "Launch plan: miss" in first.output
+
+    second = runner.invoke(cli.cli, ["run", "--explain", "-n", "dev"])
+    assert second.exit_code == 0
+    assert "Launch plan: hit" in second.output
+    assert f"{repo}:/home/llm/workspace/repo" in second.output
+
+    other_args = runner.invoke(cli.cli, ["run", "--explain", "-n", "dev", "--", "-e", "X=1"])
+    assert "Launch plan: miss" in other_args.output
+
+
+def test_profile_change_invalidates_plan(tmp_path: Path, env: dict[str, str]) -> None:
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    runner.invoke(cli.cli, ["run", "-n", "dev"])
+
+    extra = tmp_path / "extra"
+    extra.mkdir()
+    runner.invoke(cli.cli, ["volume", "add", "dev", str(extra)])
+
+    result = runner.invoke(cli.cli, ["run", "--explain", "-n", "dev"])
+    assert "Launch plan: miss" in result.output
+    assert f"{extra}:/home/llm/workspace/extra" in result.output
+
+
+def test_plan_hit_runs_cached_command_with_fresh_name(
+    env: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: ("container", []))
+    runner.invoke(cli.cli, ["run", "dev"])
+
+    launched: list[list[str]] = []
+    monkeypatch.setattr(cli, "run_command", launched.append)
+    monkeypatch.setattr(cli, "container_name", lambda profile: f"llmbox-{profile}-fresh")
+
+    result = runner.invoke(cli.cli, ["run", "dev"])
+    assert result.exit_code == 0
+    assert len(launched) == 1
+    command = launched[0]
+    assert command[command.index("--name") + 1] == "llmbox-dev-fresh"
+    assert command[-1] == "llm"
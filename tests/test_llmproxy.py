@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+from llmbox.blocklist import compile_patterns, parse_source
+
+ROOT = Path(__file__).resolve().parents[1]
+_spec = importlib.util.spec_from_file_location("llmproxy", ROOT / "llm" / "llmproxy.py")
+assert _spec is not None and _spec.loader is not None
+llmproxy = importlib.util.module_from_spec(_spec)
+sys.modules["llmproxy"] = llmproxy
+_spec.loader.exec_module(llmproxy)
+
+
+def _policy(tmp_path: Path, entries: list[str], default_deny: bool = False):
+    path = tmp_path / "blocklist"
+    path.write_text("".join(f"{line}\n" for line in compile_patterns(parse_source(entries))))
+    if default_deny:
+        (tmp_path / llmproxy.DEFAULT_DENY_MARKER).touch()
+    return llmproxy.Policy.load(path)
+
+
+def test_subject_host_drops_scheme_userinfo_and_port() -> None:
+    assert llmproxy.subject_host("http://ok.com@Blocked.com:80/x") == "blocked.com"
+    assert llmproxy.subject_host("http://u:p@blocked.com./?a@b") == "blocked.com"
+    assert llmproxy.subject_host("blocked.com:443") == "blocked.com"
+
+
+def test_policy_blocks_and_allows(tmp_path: Path) -> None:
+    policy = _policy(tmp_path, ["blocked.com", "*.sub.org", "re:^http://raw\\.net/"])
+    assert not policy.allows("blocked.com:443")
+    assert not policy.allows("http://www.blocked.com/")
+    assert not policy.allows("http://a.sub.org/")
+    assert not policy.allows("http://raw.net/x")
+    assert policy.allows("http://sub.org/")
+    assert policy.allows("http://notblocked.com/")
+
+    (tmp_path / "allow").mkdir()
+    allowlist = _policy(tmp_path / "allow", ["pypi.org"], default_deny=True)
+    assert allowlist.allows("pypi.org:443")
+    assert not allowlist.allows("example.com:443")
+
+
+def test_compiled_lines_parse_into_entries_and_skip_userinfo() -> None:
+    (line,) = compile_patterns(parse_source(["blocked.com"]))
+    assert llmproxy.parse_domain_line(line) == [("domain", "blocked.com")]
+    # As compiled before userinfo was skipped.
+    old = r"^([a-z][a-z0-9+.-]*://)?([^/:?]*\.)?blocked\.com\.?([:/?]|$)"
+    assert llmproxy.parse_domain_line(old) == [("domain", "blocked.com")]
+
+    regex = llmproxy.PosixRegex(line)
+    assert regex.search("http://ok.com@blocked.com/")
+    assert regex.search("blocked.com:443")
+    assert not regex.search("http://blocked.com:80@ok.com/")
+
+
+class Upstream:
+    """A plain HTTP server that records what it receives and answers once."""
+
+    def __init__(self) -> None:
+        self.received = bytearray()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.received += await reader.readuntil(b"\r\n\r\n")
+        # Give pipelined bytes a chance to arrive before answering.
+        await asyncio.sleep(0.05)
+        while True:
+            try:
+                self.received += await asyncio.wait_for(reader.read(65536), 0.05)
+            except asyncio.TimeoutError:
+                break
+            if reader.at_eof():
+                break
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Length: 5\r\n\r\nhello")
+        await writer.drain()
+        writer.close()
+
+
+def _exchange(tmp_path: Path, entries: list[str], request: bytes, connect_ports=frozenset()):
+    """Send *request* through a proxy with *entries* blocked; return (reply, upstream)."""
+
+    async def run() -> tuple[bytes, Upstream]:
+        upstream = Upstream()
+        server = await asyncio.start_server(upstream.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        path = tmp_path / "blocklist"
+        lines = compile_patterns(parse_source(entries))
+        path.write_text("".join(f"{line}\n" for line in lines))
+        proxy = llmproxy.Proxy(path, 10, 5.0, connect_ports)
+        loop = asyncio.get_running_loop()
+        front = await loop.create_server(lambda: llmproxy.Client(proxy), "127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection(*front.sockets[0].getsockname()[:2])
+        writer.write(request.replace(b"PORT", str(port).encode()))
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        front.close()
+        server.close()
+        return reply, upstream
+
+    return asyncio.run(run())
+
+
+def test_allowed_request_is_relayed(tmp_path: Path) -> None:
+    reply, upstream = _exchange(
+        tmp_path, ["blocked.com"], b"GET http://127.0.0.1:PORT/x?y HTTP/1.1\r\nHost: h\r\n\r\n"
+    )
+    assert reply.startswith(b"HTTP/1.0 200 OK") and reply.endswith(b"hello")
+    assert upstream.received.startswith(b"GET /x?y HTTP/1.1\r\n")
+    assert b"Connection: close" in upstream.received
+
+
+@pytest.mark.parametrize("userinfo", ["", "ok.com@", "ok.com:80@"])
+def test_blocked_request_is_filtered(tmp_path: Path, userinfo: str) -> None:
+    request = f"GET http://{userinfo}127.0.0.1:PORT/ HTTP/1.1\r\n\r\n".encode()
+    reply, upstream = _exchange(tmp_path, ["127.0.0.1"], request)
+    assert reply.startswith(b"HTTP/1.0 403 Filtered")
+    assert upstream.received == b""
+
+
+def test_pipelined_request_does_not_reach_the_first_upstream(tmp_path: Path) -> None:
+    request = (
+        b"POST http://127.0.0.1:PORT/a HTTP/1.1\r\nContent-Length: 4\r\n\r\nbody"
+        b"GET http://blocked.com/ HTTP/1.1\r\n\r\n"
+    )
+    reply, upstream = _exchange(tmp_path, ["blocked.com"], request)
+    assert reply.endswith(b"hello")
+    assert upstream.received.endswith(b"\r\n\r\nbody")
+    assert b"blocked.com" not in upstream.received
+
+
+def test_chunked_request_body_is_refused(tmp_path: Path) -> None:
+    request = b"POST http://127.0.0.1:PORT/ HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n0\r\n\r\n"
+    reply, upstream = _exchange(tmp_path, [], request)
+    assert reply.startswith(b"HTTP/1.0 411 Length Required")
+    assert upstream.received == b""
+
+
+def test_connect_port_limit(tmp_path: Path) -> None:
+    request = b"CONNECT 127.0.0.1:PORT HTTP/1.1\r\n\r\n"
+    reply, _ = _exchange(tmp_path, [], request, connect_ports=frozenset({443}))
+    assert reply.startswith(b"HTTP/1.0 403 Access violation")
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1:1", "a\0b"])
+def test_unreachable_upstream_gets_502(tmp_path: Path, host: str) -> None:
+    reply, _ = _exchange(tmp_path, [], f"GET http://{host}/ HTTP/1.1\r\n\r\n".encode())
+    assert reply.startswith(b"HTTP/1.0 502 Bad Gateway")
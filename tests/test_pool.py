@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from llmbox import cli, pool
+from llmbox.pool import claim, fill, fill_lock, pool_command, wait_ready
+
+NOW = 1_000_000.0
+
+
+class FakeDocker:
+    """Stands in for the docker CLI: ``ps`` rows, and records everything else."""
+
+    def __init__(self, rows: list[str], taken: frozenset[str] = frozenset()):
+        self.rows = rows
+        self.taken = taken
+        self.calls: list[list[str]] = []
+
+    def __call__(self, command, **kwargs):
+        self.calls.append(command)
+        stdout, returncode = "", 0
+        if command[1] == "ps":
+            stdout = "".join(f"{row}\n" for row in self.rows)
+        elif command[1] == "rename" and command[2] in self.taken:
+            returncode = 1
+        elif command[1] == "run":
+            stdout = "abc\n"
+        return subprocess.CompletedProcess(command, returncode, stdout=stdout, stderr="")
+
+    def commands(self, verb: str) -> list[list[str]]:
+        return [command for command in self.calls if command[1] == verb]
+
+
+def _row(container: str, name: str, status: str, key: str = "k1", expires: float = NOW + 600):
+    return "\t".join([container, name, status, "dev", key, str(int(expires))])
+
+
+def test_pool_command_starts_a_detached_member() -> None:
+    plan = ["docker", "run", "--rm", "-it", "--name", "llmbox-dev-1", "-v", "a:b", "llm"]
+    command = pool_command(plan, 5, "dev", "k1", 600, NOW)
+    name = command[5]
+    assert name.startswith("llmbox-pool-dev-")
+    assert command[6:9] == ["--detach", "--label", "llmbox.pool=dev"]
+    assert f"llmbox.pool.expires={int(NOW) + 600}" in command
+    assert "LLM_POOL_TTL=600" in command
+    assert command[-3:] == ["-v", "a:b", "llm"]
+
+
+def test_claim_renames_the_oldest_ready_member() -> None:
+    docker = FakeDocker(
+        [
+            _row("starting1", "llmbox-pool-dev-a", "Up 2 seconds (health: starting)"),
+            _row("stale0001", "llmbox-pool-dev-b", "Up 1 hour (healthy)", key="old"),
+            _row("expiring1", "llmbox-pool-dev-c", "Up (healthy)", expires=NOW + 10),
+            _row("claimed01", "llmbox-dev-20260101", "Up (healthy)"),
+            _row("raced0001", "llmbox-pool-dev-d", "Up (healthy)", expires=NOW + 100),
+            _row("ready0001", "llmbox-pool-dev-e", "Up (healthy)", expires=NOW + 200),
+        ],
+        taken=frozenset({"raced0001"}),
+    )
+    assert claim("dev", "k1", "llmbox-dev-new", NOW, runner=docker) == "ready0001"
+    assert [command[2] for command in docker.commands("rename")] == ["raced0001", "ready0001"]
+
+    empty = FakeDocker([_row("starting1", "llmbox-pool-dev-a", "Up (health: starting)")])
+    assert claim("dev", "k1", "llmbox-dev-new", NOW, runner=empty) is None
+
+
+def test_fill_retires_stale_members_and_tops_up() -> None:
+    docker = FakeDocker(
+        [
+            _row("keep00001", "llmbox-pool-dev-a", "Up (health: starting)"),
+            _row("stale0001", "llmbox-pool-dev-b", "Up (healthy)", key="old"),
+            _row("expired01", "llmbox-pool-dev-c", "Up (healthy)", expires=NOW - 1),
+        ]
+    )
+    plan = ["docker", "run", "--rm", "-it", "--name", "x", "llm"]
+    result = fill("dev", "k1", plan, 5, 3, 600, NOW, runner=docker)
+    assert sorted(result.retired) == ["llmbox-pool-dev-b", "llmbox-pool-dev-c"]
+    assert len(result.started) == 2
+    assert result.failures == []
+    assert sorted(command[-1] for command in docker.commands("stop")) == [
+        "expired01",
+        "stale0001",
+    ]
+    assert len(docker.commands("run")) == 2
+
+
+def test_wait_ready_polls_until_members_are_healthy(monkeypatch: pytest.MonkeyPatch) -> None:
+    docker = FakeDocker([_row("a", "llmbox-pool-dev-a", "Up (health: starting)")])
+
+    def sleep(seconds: float) -> None:
+        docker.rows = [_row("a", "llmbox-pool-dev-a", "Up (healthy)")]
+
+    monkeypatch.setattr(pool.time, "sleep", sleep)
+    assert wait_ready("dev", ["llmbox-pool-dev-a"], NOW, runner=docker) == []
+    assert len(docker.commands("ps")) == 2
+
+    # A member that exited is gone from docker ps, so it is not waited for.
+    assert wait_ready("dev", ["llmbox-pool-dev-b"], NOW, runner=docker) == ["llmbox-pool-dev-b"]
+
+
+def test_fill_lock_is_exclusive(tmp_path: Path) -> None:
+    path = tmp_path / "pool" / "dev.lock"
+    with fill_lock(path) as first:
+        with fill_lock(path) as second:
+            assert first and not second
+    with fill_lock(path) as again:
+        assert again
+
+
+def test_run_attaches_to_a_claimed_member(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in ("CONFIG", "STATE", "DATA"):
+        monkeypatch.setenv(f"XDG_{name}_HOME", str(tmp_path / name.lower()))
+    monkeypatch.setattr(cli.time, "sleep", lambda seconds: None)
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    assert runner.invoke(cli.cli, ["pool", "size", "dev", "2"]).exit_code == 0
+    assert runner.invoke(cli.cli, ["pool", "size", "dev"]).output == "2\n"
+
+    events: list[tuple[str, str]] = []
+    monkeypatch.setattr(pool, "claim", lambda profile, key, name, now: "abc123")
+    monkeypatch.setattr(pool, "run_session", lambda container: events.append(("run", container)))
+    monkeypatch.setattr(pool, "spawn_fill", lambda profile: events.append(("fill", profile)))
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: pytest.fail("cold start"))
+
+    result = runner.invoke(cli.cli, ["run", "--explain", "dev"])
+    assert result.exit_code == 0, result.output
+    assert "Warm pool: claimed abc123" in result.output
+    assert events == [("fill", "dev"), ("run", "abc123")]
+
+    # Extra docker args bypass the pool.
+    launched: list[object] = []
+    monkeypatch.setattr(cli, "run_container", lambda *args, **kwargs: launched.append(args))
+    result = runner.invoke(cli.cli, ["run", "dev", "--", "-e", "X=1"])
+    assert result.exit_code == 0, result.output
+    assert len(launched) == 1
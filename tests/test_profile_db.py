@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+from llmbox import cli
+from llmbox.profile_db import SqliteProfileManager
+from llmbox.profiles import ProfileData, resolve_profile_for_run
+from llmbox.settings import State
+from llmbox.volumes import VolumeMount
+
+
+def _env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> tuple[Path, Path]:
+    config_base = tmp_path / "config"
+    state_base = tmp_path / "state"
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(config_base))
+    monkeypatch.setenv("XDG_STATE_HOME", str(state_base))
+    return config_base / "llmbox", state_base / "llmbox"
+
+
+def test_sqlite_manager_crud(tmp_path: Path) -> None:
+    manager = SqliteProfileManager(tmp_path)
+    manager.create("beta")
+    manager.create("alpha")
+    with pytest.raises(FileExistsError):
+        manager.create("alpha")
+
+    data = ProfileData(
+        volumes=[VolumeMount(Path("/src"), Path("/home/llm/workspace/src"))], persist_dir="/p"
+    )
+    manager.save("alpha", data)
+    manager.copy("alpha", "gamma")
+    manager.rename("beta", "delta")
+
+    assert manager.list_profiles() == ["alpha", "delta", "gamma"]
+    assert manager.first_profile() == "alpha"
+    loaded = manager.load("gamma")
+    assert loaded.persist_dir == "/p"
+    assert loaded.volumes[0].spec() == "/src:/home/llm/workspace/src"
+
+    with pytest.raises(FileExistsError):
+        manager.rename("alpha", "gamma")
+    with pytest.raises(FileNotFoundError):
+        manager.load("beta")
+
+
+def test_sqlite_delete_is_all_or_nothing(tmp_path: Path) -> None:
+    manager = SqliteProfileManager(tmp_path)
+    manager.create("alpha")
+    with pytest.raises(FileNotFoundError):
+        manager.delete(["alpha", "missing"])
+    assert manager.exists("alpha")
+
+
+def test_sqlite_state_and_default_resolution(tmp_path: Path) -> None:
+    manager = SqliteProfileManager(tmp_path)
+    for name in ("zeta", "beta"):
+        manager.create(name)
+    manager.save_state(State(default_profile="gone"))
+
+    name, created, new_default, reassigned = resolve_profile_for_run(
+        manager, manager.load_state(), None
+    )
+    assert (name, created, new_default, reassigned) == ("beta", False, "beta", True)
+
+
+def test_sqlite_state_ignores_unknown_keys(tmp_path: Path) -> None:
+    manager = SqliteProfileManager(tmp_path)
+    manager.save_state(State(default_profile="alpha"))
+    with manager.conn:
+        manager.conn.execute("INSERT INTO state (key, value) VALUES ('last_pool', '\"x\"')")
+    assert manager.load_state() == State(default_profile="alpha")
+
+
+def test_switch_store_imports_and_exports(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    config_dir, state_dir = _env(tmp_path, monkeypatch)
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "alpha"])
+    runner.invoke(cli.cli, ["profile", "create", "beta"])
+
+    result = runner.invoke(cli.cli, ["config", "profile-store", "sqlite"])
+    assert result.exit_code == 0
+    assert "Imported 2 profile(s)" in result.output
+
+    # Changes now go to the database, not the YAML tree
+    runner.invoke(cli.cli, ["profile", "create", "gamma"])
+    assert not (config_dir / "profiles" / "gamma.yaml").exists()
+    listing = runner.invoke(cli.cli, ["profile", "list"])
+    assert listing.output.splitlines() == ["1. alpha", "2. beta", "3. gamma *"]
+
+    removed = runner.invoke(cli.cli, ["profile", "remove", "gamma"])
+    assert "new default profile is: alpha" in removed.output
+
+    result = runner.invoke(cli.cli, ["config", "profile-store", "yaml"])
+    assert result.exit_code == 0
+    assert "Exported 2 profile(s)" in result.output
+    state = yaml.safe_load((state_dir / "state.yaml").read_text())
+    assert state["default_profile"] == "alpha"
+    assert runner.invoke(cli.cli, ["config", "profile-store"]).output.strip() == "yaml"
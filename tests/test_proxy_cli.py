@@ -46,3 +46,30 @@ def test_proxy_reload_failure_exits_nonzero(tmp_path: Path, monkeypatch) -> None
     assert result.exit_code != 0
     assert "boom" in result.output
     assert "Proxy reload failed" in result.output
+
+
+def test_proxy_stats_lists_top_hosts(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    snapshot = {
+        "clients": 2,
+        "domain_entries": 3000,
+        "regexes": 3,
+        "hosts": {
+            "registry.npmjs.org": {"requests": 40, "denied": 0, "sent": 10, "received": 99},
+            "ads.example.com": {"requests": 2, "denied": 2},
+        },
+    }
+    monkeypatch.setattr(
+        cli,
+        "proxy_stats",
+        lambda profile: ({"abc123": snapshot}, [("def456", "llmproxy is not running")]),
+    )
+
+    result = CliRunner().invoke(cli.cli, ["proxy", "stats", "--all", "-n", "1"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0] == "abc123: 2 clients, 3000 domain entries, 3 regexes"
+    assert lines[2].split() == ["registry.npmjs.org", "40", "0", "0", "0", "10", "99"]
+    assert "ads.example.com" not in result.output
+    assert "Error: no proxy stats from container def456" in result.output
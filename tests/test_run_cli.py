@@ -22,7 +22,16 @@ def test_run_creates_default_profile(tmp_path: Path, monkeypatch) -> None:
     called = {}
 
     def fake_run(
-        image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir=None
+        image_name,
+        profile,
+        global_volumes,
+        volumes,
+        extra_args,
+        config_dir,
+        persist_dir=None,
+        filter_dir=None,
+        environment=None,
+        caches=(),
     ):
         called.update(
             {
@@ -74,7 +83,16 @@ def test_run_reassigns_missing_default(tmp_path: Path, monkeypatch) -> None:
     called = {}
 
     def fake_run(
-        image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir=None
+        image_name,
+        profile,
+        global_volumes,
+        volumes,
+        extra_args,
+        config_dir,
+        persist_dir=None,
+        filter_dir=None,
+        environment=None,
+        caches=(),
     ):
         called["profile"] = profile
         return "container", []
@@ -115,7 +133,7 @@ def test_run_does_not_change_default_when_running_other_profile(
     monkeypatch.setattr(
         cli,
         "run_container",
-        lambda image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir=None: (
+        lambda image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir=None, filter_dir=None, environment=None, caches=(): (
             "container",
             [],
         ),
@@ -156,7 +174,16 @@ def test_run_includes_global_volumes(tmp_path: Path, monkeypatch) -> None:
     called = {}
 
     def fake_run(
-        image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir=None
+        image_name,
+        profile,
+        global_volumes,
+        volumes,
+        extra_args,
+        config_dir,
+        persist_dir=None,
+        filter_dir=None,
+        environment=None,
+        caches=(),
     ):
         called["global_volumes"] = global_volumes
         called["volumes"] = volumes
@@ -192,7 +219,16 @@ def test_run_passes_persist_dir_from_profile(tmp_path: Path, monkeypatch) -> Non
     called = {}
 
     def fake_run(
-        image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir=None
+        image_name,
+        profile,
+        global_volumes,
+        volumes,
+        extra_args,
+        config_dir,
+        persist_dir=None,
+        filter_dir=None,
+        environment=None,
+        caches=(),
     ):
         called["persist_dir"] = persist_dir
         return "container", []
@@ -219,7 +255,16 @@ def test_run_persist_dir_defaults_to_none(tmp_path: Path, monkeypatch) -> None:
     called = {}
 
     def fake_run(
-        image_name, profile, global_volumes, volumes, extra_args, config_dir, persist_dir=None
+        image_name,
+        profile,
+        global_volumes,
+        volumes,
+        extra_args,
+        config_dir,
+        persist_dir=None,
+        filter_dir=None,
+        environment=None,
+        caches=(),
     ):
         called["persist_dir"] = persist_dir
         return "container", []
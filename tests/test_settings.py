@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 import pytest
@@ -76,3 +77,46 @@ def test_global_config_empty_volumes_default(tmp_path: Path) -> None:
     (config_dir / "config.yaml").write_text("image_name: llm\n")
     config = load_config(config_dir)
     assert config.volumes == []
+
+
+def test_config_parsed_once_per_process(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from llmbox import settings as settings_module
+
+    config_dir = tmp_path / "llmbox"
+    config_dir.mkdir()
+    (config_dir / "config.yaml").write_text("image_name: cached\nvolumes:\n- /a:/b\n")
+
+    calls = []
+    real_load = settings_module.yaml.load
+
+    def counting_load(stream, Loader):
+        calls.append(stream)
+        return real_load(stream, Loader=Loader)
+
+    monkeypatch.setattr(settings_module.yaml, "load", counting_load)
+
+    settings = Settings(config_dir=config_dir, state_dir=tmp_path / "state")
+    first = load_config(config_dir)
+    first.volumes.append("/c:/d")
+    second = load_config(config_dir)
+
+    assert settings.image_name == "cached"
+    assert second.volumes == ["/a:/b"]
+    assert len(calls) == 1
+
+
+def test_config_cache_invalidated_on_change(tmp_path: Path) -> None:
+    config_dir = tmp_path / "llmbox"
+    config_dir.mkdir()
+    cfg_path = config_dir / "config.yaml"
+    cfg_path.write_text("image_name: one\n")
+    assert load_config(config_dir).image_name == "one"
+
+    cfg_path.write_text("image_name: two\n")
+    # Same size as before, so force a distinct mtime to model a later edit
+    stat = cfg_path.stat()
+    os.utime(cfg_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_config(config_dir).image_name == "two"
+
+    save_config(config_dir, GlobalConfig(image_name="six"))
+    assert load_config(config_dir).image_name == "six"
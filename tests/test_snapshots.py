@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from llmbox import cli, snapshots
+from llmbox.snapshots import commit, commit_command, profile_containers, snapshot_tag
+
+
+def test_snapshot_command_and_containers() -> None:
+    assert snapshot_tag("dev") == "llmbox-snapshot:dev"
+    assert snapshot_tag(".hidden") == "llmbox-snapshot:_.hidden"
+    command = commit_command(
+        "abc", "llmbox-snapshot:dev", "sha256:1", {"LLM_POOL_TTL": "60", "PATH": "/bin"}, {}
+    )
+    assert command[-2:] == ["abc", "llmbox-snapshot:dev"]
+    assert 'ENV LLM_POOL_TTL=""' in command
+    assert 'ENV LLM_SNAPSHOT_UNSET="LLM_POOL_TTL PATH"' in command
+    assert "LABEL llmbox.snapshot.base=sha256:1" in command
+
+    # Committed from a snapshot: what that one blanked stays listed.
+    command = commit_command(
+        "abc",
+        "llmbox-snapshot:dev",
+        "sha256:1",
+        {"FOO": "", "BAR": "1", "PATH": "/bin", "LLM_SNAPSHOT_UNSET": "FOO"},
+        {"PATH": "/bin"},
+    )
+    changes = [command[i + 1] for i, arg in enumerate(command) if arg == "--change"]
+    assert changes[:-1] == ['ENV BAR=""', 'ENV LLM_SNAPSHOT_UNSET="BAR FOO"']
+
+    def docker(command, **kwargs):
+        stdout = "c2\tllmbox-pool-dev-x\nc1\tllmbox-dev-20260101\n"
+        return subprocess.CompletedProcess(command, 0, stdout=stdout, stderr="")
+
+    assert profile_containers("dev", runner=docker) == [("c1", "llmbox-dev-20260101")]
+
+
+def test_run_starts_from_snapshot_until_base_changes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for name in ("CONFIG", "STATE", "DATA"):
+        monkeypatch.setenv(f"XDG_{name}_HOME", str(tmp_path / name.lower()))
+    monkeypatch.setattr(cli.time, "sleep", lambda seconds: None)
+    images = {"llm": "sha256:base1"}
+    committed: list[tuple[str, str]] = []
+
+    def commit(container, tag, base_id):
+        committed.append((container, tag))
+        images[tag] = "sha256:snap"
+        return images[tag]
+
+    monkeypatch.setattr(snapshots, "image_id", lambda image, runner=None: images.get(image))
+    monkeypatch.setattr(snapshots, "profile_containers", lambda profile: [("c1", "llmbox-dev-1")])
+    monkeypatch.setattr(snapshots, "commit", commit)
+    monkeypatch.setattr(snapshots, "remove", lambda tag: images.pop(tag, None))
+
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    result = runner.invoke(cli.cli, ["profile", "commit", "dev"])
+    assert result.exit_code == 0, result.output
+    assert committed == [("c1", "llmbox-snapshot:dev")]
+
+    result = runner.invoke(cli.cli, ["run", "--dry-run", "dev"])
+    assert result.output.splitlines()[-1].endswith(" llmbox-snapshot:dev")
+    # A different image gets no snapshot.
+    result = runner.invoke(cli.cli, ["run", "--dry-run", "-i", "other", "dev"])
+    assert result.output.splitlines()[-1].endswith(" other")
+
+    images["llm"] = "sha256:base2"
+    result = runner.invoke(cli.cli, ["run", "--dry-run", "dev"])
+    assert result.exit_code == 0, result.output
+    assert "discarded snapshot llmbox-snapshot:dev" in result.output
+    assert result.output.splitlines()[-1].endswith(" llm")
+    assert "llmbox-snapshot:dev" not in images
+
+
+def test_commit_resets_every_launch_setting() -> None:
+    base = ["PATH=/usr/bin:/bin", "LLM_USER=llm", "LLM_HOME_DIR=/home/llm"]
+    launched = [
+        "PATH=/usr/bin:/bin",
+        "LLM_USER=llm",
+        "LLM_HOME_DIR=/home/llm",
+        "HTTP_PROXY=http://127.0.0.1:8888",
+        "LLM_PROFILE=dev",
+        "LLM_DOCKER_HOST_IP=172.17.0.1",
+        "LLM_DOCKER_SUBNET=172.17.0.0/16",
+        "LLM_HISTORY_SHARDS=1",
+        "LLM_HISTORY_MAX_AGE_DAYS=30",
+        "LLM_PROXY_ENGINE=llmproxy",
+        "LLM_PROXY_CONNECT_PORTS=443,8443",
+        "LLM_CACHE_PROXY=http://host.docker.internal:3143",
+        "NPM_CONFIG_REGISTRY=http://host.docker.internal:3143/npm/",
+        "PIP_INDEX_URL=http://host.docker.internal:3143/pypi/simple/",
+        "UV_DEFAULT_INDEX=http://host.docker.internal:3143/pypi/simple/",
+        "UV_LINK_MODE=copy",
+        "LLM_CACHE_DIRS=/home/llm/.cache/uv:/home/llm/.npm",
+        "LLM_POOL_TTL=1800",
+    ]
+    calls: list[list[str]] = []
+
+    def docker(command, **kwargs):
+        calls.append(command)
+        env = base if command[1] == "image" else launched
+        stdout = json.dumps(env) if command[1] in ("image", "container") else "sha256:snap\n"
+        return subprocess.CompletedProcess(command, 0, stdout=stdout, stderr="")
+
+    assert commit("c1", "llmbox-snapshot:dev", "sha256:base", runner=docker) == "sha256:snap"
+    command = calls[-1]
+    changes = {command[i + 1] for i, arg in enumerate(command) if arg == "--change"}
+    for entry in launched[3:]:
+        assert f'ENV {entry.partition("=")[0]}=""' in changes
+    assert not any("PATH" in change or "LLM_USER" in change for change in changes)
+    names = " ".join(sorted(entry.partition("=")[0] for entry in launched[3:]))
+    assert f'ENV LLM_SNAPSHOT_UNSET="{names}"' in changes
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+HEAVY_MODULES = ("pydantic", "pydantic_settings", "yaml", "http.client")
+
+
+def _run_fresh(code: str) -> str:
+    script = f"import sys\nsys.path.insert(0, {str(SRC)!r})\n{code}\n"
+    completed = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    )
+    return completed.stdout
+
+
+def _loaded_modules(code: str) -> set[str]:
+    output = _run_fresh(f"{code}\nprint('\\n'.join(sorted(sys.modules)))")
+    return set(output.split())
+
+
+def test_cli_import_is_lightweight() -> None:
+    loaded = _loaded_modules("import llmbox.cli")
+    for module in HEAVY_MODULES:
+        assert module not in loaded
+
+
+def test_help_does_not_load_settings() -> None:
+    code = """
+from llmbox.cli import cli
+try:
+    cli(["--help"])
+except SystemExit:
+    pass
+"""
+    loaded = _loaded_modules(code)
+    for module in HEAVY_MODULES:
+        assert module not in loaded
+
+
+def test_version_not_computed_at_import() -> None:
+    code = """
+import llmbox.cli
+from llmbox import version_with_commit
+print(version_with_commit.cache_info().misses)
+"""
+    assert _run_fresh(code).strip() == "0"
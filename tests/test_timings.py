@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from llmbox import cli, timings
+from llmbox.timings import HostTimings, breakdown, read_marks, run_timed, timed_command
+
+
+def test_timed_command_mounts_the_marks_directory(tmp_path: Path) -> None:
+    command = timed_command(["docker", "run", "--name", "c", "llm"], 3, tmp_path)
+    assert command == [
+        "docker",
+        "run",
+        "--name",
+        "c",
+        "-v",
+        f"{tmp_path}:/llmbox-timings",
+        "-e",
+        "LLM_TIMINGS_FILE=/llmbox-timings/entrypoint.jsonl",
+        "llm",
+    ]
+
+
+def test_run_timed_splits_create_and_start() -> None:
+    calls: list[list[str]] = []
+
+    def runner(command, **kwargs):
+        calls.append(command)
+        return subprocess.CompletedProcess(command, 3, stdout="abc123\n", stderr="")
+
+    host = run_timed(["docker", "run", "--rm", "-it", "llm"], runner=runner)
+    assert calls == [
+        ["docker", "create", "--rm", "-it", "llm"],
+        ["docker", "start", "--attach", "--interactive", "abc123"],
+    ]
+    assert host.created >= host.create_started
+    assert host.returncode == 3
+
+
+def test_breakdown_on_one_clock_and_across_clocks(tmp_path: Path) -> None:
+    path = tmp_path / "marks.jsonl"
+    now = timings.boottime()
+    path.write_text(
+        "".join(
+            json.dumps({"phase": phase, "t": now - offset}) + "\n"
+            for phase, offset in [("network-detect", 3.0), ("firewall", 2.5), ("session", 1.0)]
+        )
+        + "garbage\n"
+    )
+    marks = read_marks(path)
+    assert [phase for phase, _ in marks] == ["network-detect", "firewall", "session"]
+
+    rows = dict(breakdown(HostTimings(now - 4.0, now - 3.5, 0), marks))
+    assert rows["docker create"] == pytest.approx(0.5)
+    assert rows["docker start"] == pytest.approx(0.5)
+    assert rows["network-detect"] == pytest.approx(0.5)
+    assert rows["firewall"] == pytest.approx(1.5)
+    assert rows["total"] == pytest.approx(3.0)
+
+    # Marks from a VM's clock cannot be lined up with the host's.
+    rows = dict(breakdown(HostTimings(now + 10, now + 11, 0), marks))
+    assert "docker start" not in rows
+    assert rows["total (entrypoint only)"] == pytest.approx(2.0)
+
+
+def test_run_timings_prints_and_records_breakdown(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for name in ("CONFIG", "STATE", "DATA"):
+        monkeypatch.setenv(f"XDG_{name}_HOME", str(tmp_path / name.lower()))
+    monkeypatch.setattr(cli.time, "sleep", lambda seconds: None)
+
+    def fake_run_timed(command):
+        mount = next(arg for arg in command if arg.endswith(":/llmbox-timings"))
+        marks = Path(mount.split(":")[0]) / "entrypoint.jsonl"
+        now = timings.boottime()
+        marks.write_text(
+            json.dumps({"phase": "links", "t": now})
+            + "\n"
+            + json.dumps({"phase": "session", "t": now + 0.25})
+            + "\n"
+        )
+        return HostTimings(now - 0.2, now - 0.1, 0)
+
+    monkeypatch.setattr(timings, "run_timed", fake_run_timed)
+    runner = CliRunner()
+    runner.invoke(cli.cli, ["profile", "create", "dev"])
+    result = runner.invoke(cli.cli, ["run", "--timings", "dev"])
+    assert result.exit_code == 0, result.output
+    assert "links" in result.output
+    assert "250ms" in result.output
+
+    history = tmp_path / "state" / "llmbox" / "timings.jsonl"
+    (entry,) = [json.loads(line) for line in history.read_text().splitlines()]
+    assert entry["profile"] == "dev"
+    assert entry["phases"]["links"] == pytest.approx(0.25)
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from llmbox.docker import build_run_command
+from llmbox.launch_plan import plan_key
+from llmbox.toolchain import (
+    TOOLCHAIN_MOUNT,
+    current_generation,
+    generations,
+    prune,
+    toolchain_dir,
+    update,
+)
+
+
+class FakeInstaller:
+    """Stands in for ``docker run``: writes versions.json into the mounted generation."""
+
+    def __init__(self) -> None:
+        self.versions = {"claude": "2.0.0", "codex": "0.5.0", "copilot": "1.0.0"}
+        self.fail = False
+
+    def __call__(self, command, **kwargs):
+        if self.fail:
+            raise subprocess.CalledProcessError(1, command)
+        mount = command[command.index("-v") + 1]
+        host = Path(mount.rsplit(":", 1)[0])
+        (host / "versions.json").write_text(json.dumps(self.versions))
+        return subprocess.CompletedProcess(command, 0)
+
+
+def test_update_adds_generations_only_for_new_versions(tmp_path: Path) -> None:
+    root = tmp_path / "toolchain"
+    installer = FakeInstaller()
+
+    first, changed = update("llm", root, runner=installer)
+    assert changed and first.name == "1"
+    again, changed = update("llm", root, runner=installer)
+    assert not changed and again == first
+    assert [generation.name for generation in generations(root)] == ["1"]
+
+    installer.fail = True
+    with pytest.raises(subprocess.CalledProcessError):
+        update("llm", root, runner=installer)
+    assert current_generation(root) == first
+    assert [generation.name for generation in generations(root)] == ["1"]
+
+    installer.fail = False
+    installer.versions["codex"] = "0.6.0"
+    second, changed = update("llm", root, runner=installer)
+    assert changed and current_generation(root) == second
+    assert (root / "current").readlink() == Path("generations") / second.name
+
+
+def test_prune_keeps_current_previous_and_in_use(tmp_path: Path) -> None:
+    root = tmp_path / "toolchain"
+    installer = FakeInstaller()
+    for number in range(5):
+        installer.versions["codex"] = f"0.{number}.0"
+        update("llm", root, runner=installer)
+    assert current_generation(root) == root / "generations" / "5"
+
+    removed = prune(root, in_use={"2"})
+    assert sorted(generation.name for generation in removed) == ["1", "3"]
+    assert [generation.name for generation in generations(root)] == ["2", "4", "5"]
+
+
+def test_run_command_mounts_current_generation(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    config_dir = tmp_path / "config"
+    command, _ = build_run_command("llm", "dev", [], [], [], config_dir)
+    assert not any(TOOLCHAIN_MOUNT in part for part in command)
+    key_before = plan_key(config_dir, b"profile", "llm", ())
+
+    generation, _ = update("llm", toolchain_dir(), runner=FakeInstaller())
+    command, _ = build_run_command("llm", "dev", [], [], [], config_dir)
+    assert f"{generation}:{TOOLCHAIN_MOUNT}:ro" in command
+    assert "llmbox.toolchain=1" in command
+    assert f"LLM_TOOLCHAIN={TOOLCHAIN_MOUNT}" in command
+    assert command[-1] == "llm"
+    assert plan_key(config_dir, b"profile", "llm", ()) != key_before